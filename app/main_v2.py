@@ -1,16 +1,29 @@
 """Enhanced FastAPI application with WebSocket, metrics, evidence, and calibration UI."""
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import logging
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse, HTMLResponse, JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import threading
 import json
 import asyncio
-from typing import Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Union
 from pathlib import Path
 
-from app.services.processor_v2 import VideoProcessorV2
+# Only light modules here: the pipeline (cv2, supervision, ultralytics, torch) is imported by the
+# background preloader or on first use, so the API answers within a fraction of a second.
+from app.services.manager import DEFAULT_CAMERA_ID, ProcessorManager
+from app.services.metrics import MetricsCollector
+from app.services.preload import ModelPreloader, import_steps, model_steps
+from app.utils.roi import camera_config_path, load_roi_config
+from app.utils.settings import load_settings
+
+if TYPE_CHECKING:
+    from app.services.processor_v2 import VideoProcessorV2
 
 # Configure logging
 logging.basicConfig(
@@ -35,22 +48,34 @@ class SignalRequest(BaseModel):
     state: str  # "red" or "green"
 
 
-# Singleton processor
-_processor_lock = threading.Lock()
-_processor: Optional[VideoProcessorV2] = None
+# Camera processors (share one loaded model)
+_manager = ProcessorManager(load_settings())
+
+# Models are loaded and warmed up in the background at startup
+_preloader = ModelPreloader()
+
+# Cold-start breakdown reported by /ready
+_startup_timings: Dict[str, float] = {"imports_ms": round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)}
 
 # WebSocket clients
 _ws_clients: List[WebSocket] = []
 _ws_lock = threading.Lock()
 
 
-def get_processor() -> VideoProcessorV2:
-    global _processor
-    with _processor_lock:
-        if _processor is None:
-            _processor = VideoProcessorV2()
-            logger.info("Initialized VideoProcessorV2")
-        return _processor
+def get_processor(camera_id: str = DEFAULT_CAMERA_ID) -> "VideoProcessorV2":
+    """Get (or create) the processor for a camera."""
+    try:
+        return _manager.get(camera_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def require_processor(camera_id: str) -> "VideoProcessorV2":
+    """Get an existing camera processor or fail with 404."""
+    proc = _manager.find(camera_id)
+    if proc is None:
+        raise HTTPException(status_code=404, detail=f"Unknown camera: {camera_id}")
+    return proc
 
 
 async def broadcast_alert(alert: Dict):
@@ -452,11 +477,92 @@ async def index() -> str:
 """
 
 
+@app.get("/cameras")
+async def list_cameras() -> JSONResponse:
+    """List configured cameras."""
+    return JSONResponse({"cameras": _manager.list_cameras()})
+
+
+@app.post("/cameras/{camera_id}/start")
+async def start_camera(camera_id: str, req: StartRequest) -> Dict[str, Any]:
+    """Start video processing for a camera."""
+    # Opening the source / spawning the worker blocks, so it runs off the event loop
+    await run_in_threadpool(get_processor, camera_id)
+    ok = await run_in_threadpool(_manager.start, camera_id, req.source)
+    if not ok:
+        raise HTTPException(status_code=400, detail="Failed to open video source")
+    logger.info(f"Started camera {camera_id} from {req.source}")
+    return {"status": "started", "camera_id": camera_id, "source": req.source}
+
+
+@app.post("/cameras/{camera_id}/stop")
+async def stop_camera(camera_id: str) -> Dict[str, Any]:
+    """Stop video processing for a camera."""
+    require_processor(camera_id)
+    await run_in_threadpool(_manager.stop, camera_id)
+    logger.info(f"Stopped camera {camera_id}")
+    return {"status": "stopped", "camera_id": camera_id}
+
+
+@app.delete("/cameras/{camera_id}")
+async def remove_camera(camera_id: str) -> Dict[str, Any]:
+    """Stop a camera and release its processor."""
+    if not await run_in_threadpool(_manager.remove, camera_id):
+        raise HTTPException(status_code=404, detail=f"Unknown camera: {camera_id}")
+    return {"status": "removed", "camera_id": camera_id}
+
+
+@app.post("/cameras/{camera_id}/signal")
+async def set_camera_signal(camera_id: str, req: SignalRequest) -> Dict[str, Any]:
+    """Set traffic signal state for a camera."""
+    proc = require_processor(camera_id)
+    proc.set_signal_state(req.state)
+    return {"camera_id": camera_id, "state": proc.get_signal_state()}
+
+
+@app.get("/cameras/{camera_id}/alerts")
+async def camera_alerts(camera_id: str) -> JSONResponse:
+    """Get recent alerts for a camera."""
+    proc = require_processor(camera_id)
+    return JSONResponse(proc.get_recent_alerts())
+
+
+@app.get("/cameras/{camera_id}/metrics")
+async def camera_metrics(camera_id: str) -> JSONResponse:
+    """Get performance metrics for a camera."""
+    proc = require_processor(camera_id)
+    return JSONResponse(proc.get_metrics())
+
+
+@app.get("/cameras/{camera_id}/stream")
+async def camera_stream(camera_id: str) -> StreamingResponse:
+    """MJPEG video stream for a camera."""
+    proc = require_processor(camera_id)
+    return StreamingResponse(
+        proc.mjpeg_generator(),
+        media_type="multipart/x-mixed-replace; boundary=frame"
+    )
+
+
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness: 200 once the models are loaded and warmed up, 503 before; per-model timings."""
+    status = _preloader.get_status()
+    status["startup"] = _startup_timings
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/inference")
+async def inference_stats() -> JSONResponse:
+    """Get shared batched-inference statistics (batch latency and occupancy)."""
+    return JSONResponse({"services": await run_in_threadpool(_manager.models.get_inference_stats)})
+
+
 @app.post("/start")
 async def start(req: StartRequest) -> Dict[str, Any]:
     """Start video processing."""
-    proc = get_processor()
-    ok = proc.start(req.source)
+    await run_in_threadpool(get_processor)
+    ok = await run_in_threadpool(_manager.start, DEFAULT_CAMERA_ID, req.source)
     if not ok:
         raise HTTPException(status_code=400, detail="Failed to open video source")
     logger.info(f"Started processing from {req.source}")
@@ -466,8 +572,7 @@ async def start(req: StartRequest) -> Dict[str, Any]:
 @app.post("/stop")
 async def stop() -> Dict[str, Any]:
     """Stop video processing."""
-    proc = get_processor()
-    proc.stop()
+    await run_in_threadpool(_manager.stop, DEFAULT_CAMERA_ID)
     logger.info("Stopped processing")
     return {"status": "stopped"}
 
@@ -475,7 +580,8 @@ async def stop() -> Dict[str, Any]:
 @app.post("/signal")
 async def set_signal(req: SignalRequest) -> Dict[str, Any]:
     """Set traffic signal state."""
-    proc = get_processor()
+    # The first call builds the processor (and imports the pipeline), so it runs off the event loop
+    proc = await run_in_threadpool(get_processor)
     proc.set_signal_state(req.state)
     return {"state": proc.get_signal_state()}
 
@@ -483,21 +589,27 @@ async def set_signal(req: SignalRequest) -> Dict[str, Any]:
 @app.get("/alerts")
 async def alerts() -> JSONResponse:
     """Get recent alerts."""
-    proc = get_processor()
+    proc = _manager.find(DEFAULT_CAMERA_ID)
+    if proc is None:
+        # Still starting up: nothing to report yet
+        return JSONResponse({"alerts": [], "status": "starting"})
     return JSONResponse(proc.get_recent_alerts())
 
 
 @app.get("/metrics")
 async def metrics() -> JSONResponse:
     """Get performance metrics."""
-    proc = get_processor()
+    proc = _manager.find(DEFAULT_CAMERA_ID)
+    if proc is None:
+        # Still starting up: answer without waiting for the pipeline to load
+        return JSONResponse({**MetricsCollector().get_metrics(), "status": "starting"})
     return JSONResponse(proc.get_metrics())
 
 
 @app.get("/evidence/recent")
 async def recent_evidence(limit: int = 50) -> JSONResponse:
     """Get recent violation evidence."""
-    proc = get_processor()
+    proc = await run_in_threadpool(get_processor)
     violations = proc.evidence_manager.get_recent_violations(limit)
     return JSONResponse({"violations": violations})
 
@@ -505,7 +617,7 @@ async def recent_evidence(limit: int = 50) -> JSONResponse:
 @app.get("/evidence/{evidence_id}")
 async def get_evidence(evidence_id: str) -> JSONResponse:
     """Get specific evidence details."""
-    proc = get_processor()
+    proc = await run_in_threadpool(get_processor)
     meta_path = proc.evidence_manager.base_dir / "metadata" / f"{evidence_id}.json"
     
     if not meta_path.exists():
@@ -520,7 +632,7 @@ async def get_evidence(evidence_id: str) -> JSONResponse:
 @app.get("/stream")
 async def stream() -> StreamingResponse:
     """MJPEG video stream."""
-    proc = get_processor()
+    proc = await run_in_threadpool(get_processor)
     return StreamingResponse(
         proc.mjpeg_generator(), 
         media_type="multipart/x-mixed-replace; boundary=frame"
@@ -549,19 +661,31 @@ async def websocket_alerts(websocket: WebSocket):
 @app.on_event("startup")
 async def startup_event():
     """Initialize on startup."""
+    global _preloader
+    hook_started = time.perf_counter()
     logger.info("Road Tracker Pro v2.0.0 starting...")
     
-    # Pre-initialize processor
-    get_processor()
+    # Import the pipeline and load and warm up the default camera's models off the event loop,
+    # then pre-initialize its processor. Worker processes load their own models.
+    if _manager.settings.worker_mode != "process":
+        roi = load_roi_config(camera_config_path(DEFAULT_CAMERA_ID))
+        _preloader = ModelPreloader(import_steps(roi), plan=lambda: model_steps(_manager.models, roi))
+    else:
+        _preloader = ModelPreloader()
+    _preloader.start(on_done=lambda: _manager.get(DEFAULT_CAMERA_ID))
     
-    logger.info("Startup complete")
+    _startup_timings["startup_hook_ms"] = round((time.perf_counter() - hook_started) * 1000, 1)
+    _startup_timings["api_ready_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+    logger.info(
+        f"API ready in {_startup_timings['api_ready_ms']:.0f}ms "
+        f"(imports {_startup_timings['imports_ms']:.0f}ms); models loading in background, see /ready"
+    )
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down...")
-    if _processor:
-        _processor.stop()
+    _manager.shutdown()
     logger.info("Shutdown complete")
 
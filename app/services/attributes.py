@@ -0,0 +1,125 @@
+"""Per-track attributes (plate text, helmet) resolved from a few well-chosen crops."""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.services.track_state import TrackStateStore
+
+logger = logging.getLogger(__name__)
+
+# (value, confidence) returned by a secondary model handler; None = nothing seen
+Vote = Optional[Tuple[Any, float]]
+
+
+def crop_quality(crop: np.ndarray) -> float:
+    """Frame-selection score: sqrt(area) x sharpness (Laplacian variance at <= 128 px)."""
+    h, w = crop.shape[:2]
+    if h == 0 or w == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    scale = 128.0 / max(h, w)
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return float(np.sqrt(h * w) * cv2.Laplacian(gray, cv2.CV_32F).var())
+
+
+class TrackAttribute:
+    """Votes for one attribute of one track."""
+
+    __slots__ = ("attempts", "results", "best_score", "votes", "final", "reported")
+
+    def __init__(self):
+        self.attempts = 0
+        self.results = 0
+        self.best_score = 0.0
+        self.votes: Dict[Any, float] = {}
+        self.final = False
+        self.reported = False
+
+    @property
+    def value(self) -> Any:
+        """Value with the highest summed confidence so far (None without votes)."""
+        if not self.votes:
+            return None
+        return max(self.votes.items(), key=lambda kv: kv[1])[0]
+
+
+class TrackAttributeCache:
+    """Limits secondary inference to budget crops per track and attribute, and votes on the results.
+
+    A crop is only run when it scores better (crop_quality) than every crop already run for that
+    attribute by improve_ratio, so later, larger and sharper views replace early ones. Results are
+    combined by confidence-weighted voting; the attribute is final once the winner has
+    resolve_confidence summed confidence and resolve_share of all votes, or when the budget is
+    spent. Final attributes are never run again. State lives in the track store's slots, so it
+    expires with the track.
+    """
+
+    def __init__(self, store: TrackStateStore, budget: int = 3, resolve_confidence: float = 0.8,
+                 resolve_share: float = 0.6, improve_ratio: float = 1.25):
+        self.store = store
+        self.budget = max(1, int(budget))
+        self.resolve_confidence = resolve_confidence
+        self.resolve_share = resolve_share
+        self.improve_ratio = improve_ratio
+        self.runs = 0
+        self.resolved = 0
+
+    def _get(self, slot: int, kind: str) -> TrackAttribute:
+        attrs = self.store.attributes[slot]
+        if attrs is None:
+            attrs = self.store.attributes[slot] = {}
+        attr = attrs.get(kind)
+        if attr is None:
+            attr = attrs[kind] = TrackAttribute()
+        return attr
+
+    def wants(self, slot: int, kind: str) -> bool:
+        """Whether the attribute is still open and has budget left."""
+        attr = self._get(slot, kind)
+        return not attr.final and attr.attempts < self.budget
+
+    def better(self, slot: int, kind: str, score: float) -> bool:
+        attr = self._get(slot, kind)
+        return attr.attempts == 0 or score >= attr.best_score * self.improve_ratio
+
+    def started(self, slot: int, kind: str, score: float):
+        attr = self._get(slot, kind)
+        attr.attempts += 1
+        attr.best_score = max(attr.best_score, score)
+        self.runs += 1
+
+    def add_result(self, slot: int, kind: str, vote: Vote) -> Tuple[bool, Any]:
+        """Record a model result; returns (newly final, value)."""
+        attr = self._get(slot, kind)
+        attr.results += 1
+        if vote is not None:
+            value, conf = vote
+            attr.votes[value] = attr.votes.get(value, 0.0) + max(0.0, float(conf))
+
+        if not attr.final:
+            value = attr.value
+            total = sum(attr.votes.values())
+            if value is not None:
+                top = attr.votes[value]
+                if top >= self.resolve_confidence and top >= self.resolve_share * total:
+                    attr.final = True
+                    self.resolved += 1
+            if attr.attempts >= self.budget and attr.results >= attr.attempts:
+                attr.final = True
+
+        if attr.final and not attr.reported:
+            attr.reported = True
+            return True, attr.value
+        return False, attr.value
+
+    def value(self, slot: int, kind: str) -> Any:
+        attrs = self.store.attributes[slot]
+        if not attrs or kind not in attrs:
+            return None
+        return attrs[kind].value
+
+    def get_stats(self) -> Dict:
+        return {"budget": self.budget, "runs": self.runs, "resolved": self.resolved}
@@ -0,0 +1,157 @@
+"""Background video capture with a bounded frame buffer and drop policies."""
+import threading
+import time
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, NamedTuple, Optional, Union
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Buffer policies
+POLICY_LATEST = "latest"            # keep only the newest frame (live cameras)
+POLICY_DROP_OLDEST = "drop_oldest"  # ring buffer, overwrite the oldest frame when full
+POLICY_BLOCK = "block"              # capture waits for the consumer (files, no frame lost)
+BUFFER_POLICIES = {POLICY_LATEST, POLICY_DROP_OLDEST, POLICY_BLOCK}
+
+
+class CapturedFrame(NamedTuple):
+    """A frame read by the capture thread.
+
+    capture_ts is the wall-clock read time; media_ts is the frame's position in the stream
+    (seconds from the start for files, equal to capture_ts for live sources).
+    """
+    index: int
+    capture_ts: float
+    image: np.ndarray
+    media_ts: float
+
+
+def is_file_source(source: Union[int, str]) -> bool:
+    return isinstance(source, str) and Path(source).is_file()
+
+
+def default_policy_for(source: Union[int, str]) -> str:
+    """Files are processed frame by frame, everything else keeps only the latest frame."""
+    if is_file_source(source):
+        return POLICY_BLOCK
+    return POLICY_LATEST
+
+
+def media_timestamp(cap: cv2.VideoCapture, frame_no: int, fps: float) -> float:
+    """Timestamp in seconds of the frame just read from a file (frame_no is 1-based).
+
+    Uses the container timestamp, or frame_no / fps when the backend does not report one.
+    """
+    pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pos_ms > 0 or frame_no <= 1:
+        return pos_ms / 1000.0
+    return (frame_no - 1) / fps
+
+
+class FrameBuffer:
+    """Bounded frame buffer shared by the capture thread and the processing loop."""
+
+    def __init__(self, capacity: int = 4, policy: str = POLICY_LATEST,
+                 on_drop: Optional[Callable[[], None]] = None):
+        if policy not in BUFFER_POLICIES:
+            raise ValueError(f"Unknown buffer policy: {policy}")
+        self.policy = policy
+        self.capacity = 1 if policy == POLICY_LATEST else max(1, int(capacity))
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.closed = False
+        self._items: Deque[CapturedFrame] = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item: CapturedFrame) -> bool:
+        """Add a frame, applying the drop policy. Returns False once the buffer is closed."""
+        dropped = False
+        with self._cond:
+            if self.policy == POLICY_BLOCK:
+                while len(self._items) >= self.capacity and not self.closed:
+                    self._cond.wait(0.1)
+            if self.closed:
+                return False
+            if len(self._items) >= self.capacity:
+                self._items.popleft()
+                self.dropped += 1
+                dropped = True
+            self._items.append(item)
+            self._cond.notify_all()
+
+        if dropped and self.on_drop:
+            self.on_drop()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """Take the next frame, waiting up to timeout. Returns None on timeout or when closed and empty."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout):
+                return None
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Wake up any waiters; pending frames can still be drained with get()."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class CaptureThread:
+    """Reads frames from a VideoCapture on a dedicated thread into a FrameBuffer."""
+
+    def __init__(self, cap: cv2.VideoCapture, buffer: FrameBuffer, media_clock: bool = False):
+        self.cap = cap
+        self.buffer = buffer
+        # Stamp frames with the file's own timeline instead of the read time
+        self.media_clock = media_clock
+        self.running = False
+        self.frames_read = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop reading; the caller releases the VideoCapture afterwards."""
+        self.running = False
+        self.buffer.close()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _run(self):
+        logger.info(f"Capture thread started (policy={self.buffer.policy})")
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        try:
+            while self.running:
+                ret, frame = self.cap.read()
+                if not ret:
+                    logger.warning("Failed to read frame, capture ended")
+                    break
+
+                self.frames_read += 1
+                now = time.time()
+                media_ts = media_timestamp(self.cap, self.frames_read, fps) if self.media_clock else now
+                if not self.buffer.put(CapturedFrame(self.frames_read, now, frame, media_ts)):
+                    break
+        except Exception as e:
+            logger.error(f"Capture thread error: {e}")
+        finally:
+            self.running = False
+            self.buffer.close()
+            logger.info(f"Capture thread ended after {self.frames_read} frames")
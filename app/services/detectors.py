@@ -0,0 +1,269 @@
+"""Pluggable object detector backends (PyTorch, ONNX Runtime, OpenVINO) for CPU inference."""
+import ast
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.letterbox import stride_aligned
+
+logger = logging.getLogger(__name__)
+
+# (xyxy boxes, confidences, class ids) in the coordinates of the input image
+DetectionArrays = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+DETECTOR_BACKENDS = {"pytorch", "onnx", "openvino"}
+DEFAULT_DETECTOR_PATHS = {
+    "pytorch": "yolov8n.pt",
+    "onnx": "yolov8n.onnx",
+    "openvino": "yolov8n_openvino_model/yolov8n.xml",
+}
+
+
+def _empty() -> DetectionArrays:
+    return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32), np.zeros((0,), dtype=int)
+
+
+class Detector:
+    """Base detector. Class filtering and the confidence threshold are applied inside detect_batch."""
+
+    backend = ""
+    # Set when the model only accepts one square input size
+    fixed_input_size: Optional[int] = None
+
+    def __init__(self, path: str, allowed_names: Iterable[str], conf_threshold: float = 0.25,
+                 iou_threshold: float = 0.45, max_det: int = 300):
+        self.path = path
+        self.allowed_names = set(allowed_names)
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        self.names: Dict[int, str] = {}
+        self.allowed_ids: np.ndarray = np.zeros((0,), dtype=int)
+        self.lock = threading.Lock()
+
+    def _set_names(self, names: Dict[int, str]):
+        self.names = {int(k): str(v) for k, v in names.items()}
+        self.allowed_ids = np.array(sorted(k for k, v in self.names.items() if v in self.allowed_names), dtype=int)
+
+    def detect_batch(self, images: List[np.ndarray], imgsz: Optional[int] = None) -> List[DetectionArrays]:
+        raise NotImplementedError
+
+    def warmup(self, size: int = 640):
+        """Run one dummy inference so the first real frame does not pay for lazy init."""
+        self.detect_batch([np.zeros((size, size, 3), dtype=np.uint8)], imgsz=size)
+
+
+class UltralyticsDetector(Detector):
+    """PyTorch eager inference through ultralytics.YOLO."""
+
+    backend = "pytorch"
+
+    def __init__(self, path: str, allowed_names: Iterable[str], **kwargs):
+        super().__init__(path, allowed_names, **kwargs)
+        from ultralytics import YOLO
+        self.model = YOLO(path)
+        self._set_names(self.model.names)
+
+    def detect_batch(self, images: List[np.ndarray], imgsz: Optional[int] = None) -> List[DetectionArrays]:
+        options = {"imgsz": imgsz} if imgsz else {}
+        # Ultralytics predictors keep per-call state, so calls are serialized
+        with self.lock:
+            results = self.model(
+                images,
+                verbose=False,
+                conf=self.conf_threshold,
+                iou=self.iou_threshold,
+                max_det=self.max_det,
+                classes=self.allowed_ids.tolist(),
+                **options,
+            )
+
+        out: List[DetectionArrays] = []
+        for res in results:
+            if res.boxes is None or len(res.boxes) == 0:
+                out.append(_empty())
+                continue
+            out.append((
+                res.boxes.xyxy.cpu().numpy().astype(np.float32),
+                res.boxes.conf.cpu().numpy().astype(np.float32),
+                res.boxes.cls.cpu().numpy().astype(int),
+            ))
+        return out
+
+
+class ExportedDetector(Detector):
+    """Shared pre/post-processing for exported YOLOv8 graphs (output: batch x (4 + classes) x anchors).
+
+    Inputs must already be letterboxed squares of the model input size. Graphs with dynamic
+    shapes run at the requested imgsz (input_size when none is given); fixed-shape graphs always
+    run at their own size. The input tensor is written into a preallocated NCHW buffer, resized
+    when the input size changes, and only the allowed class rows of the raw output are scored,
+    so filtering happens before NMS.
+    """
+
+    def __init__(self, path: str, allowed_names: Iterable[str], input_size: int = 640, **kwargs):
+        super().__init__(path, allowed_names, **kwargs)
+        self.input_size = input_size
+        self._input = np.zeros((1, 3, input_size, input_size), dtype=np.float32)
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _input_size(self, imgsz: Optional[int]) -> int:
+        if self.fixed_input_size or not imgsz:
+            return self.input_size
+        return stride_aligned(imgsz)
+
+    def _prepare(self, images: List[np.ndarray], size: int) -> np.ndarray:
+        if self._input.shape[0] < len(images) or self._input.shape[2] != size:
+            self._input = np.zeros((max(len(images), self._input.shape[0]), 3, size, size), dtype=np.float32)
+        for i, img in enumerate(images):
+            if img.shape[:2] != (size, size):
+                img = cv2.resize(img, (size, size), interpolation=cv2.INTER_LINEAR)
+            # BGR HWC uint8 -> RGB CHW float in [0, 1]
+            np.multiply(img[..., ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=self._input[i])
+        return self._input[:len(images)]
+
+    def _postprocess(self, pred: np.ndarray, src_shape: Tuple[int, int], size: int) -> DetectionArrays:
+        if self.allowed_ids.size == 0:
+            return _empty()
+        scores = pred[4 + self.allowed_ids]            # (allowed classes, anchors)
+        best = scores.argmax(axis=0)
+        conf = scores[best, np.arange(scores.shape[1])]
+        keep = np.flatnonzero(conf >= self.conf_threshold)
+        if keep.size == 0:
+            return _empty()
+
+        cx, cy, bw, bh = pred[0, keep], pred[1, keep], pred[2, keep], pred[3, keep]
+        xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+        conf = conf[keep]
+        cls = self.allowed_ids[best[keep]]
+
+        idx = cv2.dnn.NMSBoxesBatched(xywh.tolist(), conf.tolist(), cls.tolist(),
+                                      self.conf_threshold, self.iou_threshold)
+        idx = np.asarray(idx, dtype=int).reshape(-1)[:self.max_det]
+        if idx.size == 0:
+            return _empty()
+
+        xyxy = xywh[idx].astype(np.float32)
+        xyxy[:, 2:] += xyxy[:, :2]
+        h, w = src_shape
+        if (h, w) != (size, size):
+            xyxy[:, [0, 2]] *= w / size
+            xyxy[:, [1, 3]] *= h / size
+        return xyxy, conf[idx].astype(np.float32), cls[idx]
+
+    def detect_batch(self, images: List[np.ndarray], imgsz: Optional[int] = None) -> List[DetectionArrays]:
+        size = self._input_size(imgsz)
+        with self.lock:
+            blob = self._prepare(images, size)
+            preds = self._infer(blob)
+            return [self._postprocess(preds[i], img.shape[:2], size) for i, img in enumerate(images)]
+
+
+class OnnxRuntimeDetector(ExportedDetector):
+    """ONNX Runtime CPU execution of an exported YOLOv8 model."""
+
+    backend = "onnx"
+
+    def __init__(self, path: str, allowed_names: Iterable[str], threads: int = 0, **kwargs):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        shape = session.get_inputs()[0].shape
+        static = isinstance(shape[2], int) and shape[2] > 0
+
+        super().__init__(path, allowed_names, input_size=shape[2] if static else 640, **kwargs)
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.fixed_input_size = shape[2] if static else None
+        self._batch_static = isinstance(shape[0], int) and shape[0] > 0
+
+        names = session.get_modelmeta().custom_metadata_map.get("names")
+        if not names:
+            raise ValueError(f"{path} has no class names metadata; export it with ultralytics")
+        self._set_names(ast.literal_eval(names))
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        if self._batch_static and blob.shape[0] > 1:
+            # Static batch-1 graph: run images one by one
+            return np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0]
+                                   for i in range(blob.shape[0])])
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVINODetector(ExportedDetector):
+    """OpenVINO CPU execution of an exported YOLOv8 model (.xml + metadata.yaml)."""
+
+    backend = "openvino"
+
+    def __init__(self, path: str, allowed_names: Iterable[str], threads: int = 0, **kwargs):
+        import openvino as ov
+        import yaml
+
+        core = ov.Core()
+        model = core.read_model(path)
+        shape = model.input(0).get_partial_shape()
+        static = shape[2].is_static
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+
+        super().__init__(path, allowed_names, input_size=shape[2].get_length() if static else 640, **kwargs)
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.fixed_input_size = shape[2].get_length() if static else None
+        self._batch_static = shape[0].is_static
+
+        meta_path = Path(path).with_name("metadata.yaml")
+        if not meta_path.exists():
+            raise ValueError(f"{meta_path} not found; export the model with ultralytics")
+        self._set_names(yaml.safe_load(meta_path.read_text())["names"])
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        if self._batch_static and blob.shape[0] > 1:
+            return np.concatenate([self.compiled([blob[i:i + 1]])[0] for i in range(blob.shape[0])])
+        return self.compiled([blob])[0]
+
+
+def exported_input_size(path: str) -> Optional[int]:
+    """Square input size an exported model is fixed to; None when it accepts any size and batch.
+
+    PyTorch weights and ONNX / OpenVINO exports with dynamic axes return None. Other exported
+    formats (TensorRT, TFLite, ...) are fixed-shape, but their size is not read here: 0.
+    """
+    p = Path(path)
+    if p.suffix == ".pt":
+        return None
+    if p.suffix == ".onnx":
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        shape = session.get_inputs()[0].shape
+        return shape[2] if isinstance(shape[0], int) and isinstance(shape[2], int) else None
+    if p.suffix == ".xml" or p.name.endswith("_openvino_model"):
+        import openvino as ov
+
+        xml = p if p.suffix == ".xml" else next(p.glob("*.xml"))
+        shape = ov.Core().read_model(str(xml)).input(0).get_partial_shape()
+        return shape[2].get_length() if shape[0].is_static and shape[2].is_static else None
+    return 0
+
+
+def create_detector(backend: str, path: str, allowed_names: Iterable[str],
+                    conf_threshold: float = 0.25, threads: int = 0) -> Detector:
+    """Build a detector for a backend name from the ROI config."""
+    if backend == "onnx":
+        return OnnxRuntimeDetector(path, allowed_names, threads=threads, conf_threshold=conf_threshold)
+    if backend == "openvino":
+        return OpenVINODetector(path, allowed_names, threads=threads, conf_threshold=conf_threshold)
+    if backend == "pytorch":
+        return UltralyticsDetector(path, allowed_names, conf_threshold=conf_threshold)
+    raise ValueError(f"Unknown detector backend: {backend}")
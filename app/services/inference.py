@@ -0,0 +1,164 @@
+"""Micro-batched detector inference shared by all camera processors."""
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.services.detectors import DetectionArrays, Detector
+
+logger = logging.getLogger(__name__)
+
+
+class _Request(NamedTuple):
+    frame: np.ndarray
+    options: Tuple[Tuple[str, Any], ...]
+    future: Future
+
+
+class BatchInferenceService:
+    """Collects frames from several processors and runs them as one model batch.
+
+    A batch is flushed when it is full, when every registered client has a frame
+    waiting, or when the oldest frame has waited batch_wait_ms.
+    """
+
+    def __init__(self, detector: "Detector", max_batch_size: int = 8, batch_wait_ms: float = 5.0):
+        self.detector = detector
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.batch_wait = max(0.0, batch_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._clients = 0
+        self._clients_lock = threading.Lock()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+        # Stats
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.frames = 0
+        self.batch_sizes: Deque[int] = deque(maxlen=100)
+        self.batch_latencies: Deque[float] = deque(maxlen=100)
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return self.detector.names
+
+    @property
+    def fixed_input_size(self) -> Optional[int]:
+        return self.detector.fixed_input_size
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+        # Fail anything still queued so callers do not wait forever
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            req.future.set_exception(RuntimeError("Inference service stopped"))
+
+    def register(self):
+        """Announce a processor that will submit frames."""
+        with self._clients_lock:
+            self._clients += 1
+        self.start()
+
+    def unregister(self):
+        with self._clients_lock:
+            self._clients = max(0, self._clients - 1)
+
+    def infer(self, frame: np.ndarray, **options) -> "DetectionArrays":
+        """Run the detector on one frame as part of a batch and return its boxes, confidences and class ids."""
+        future: Future = Future()
+        self._queue.put(_Request(frame, tuple(sorted(options.items())), future))
+        return future.result()
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            sizes = list(self.batch_sizes)
+            latencies = list(self.batch_latencies)
+            batches, frames = self.batches, self.frames
+
+        avg_size = sum(sizes) / len(sizes) if sizes else 0.0
+        return {
+            "model": self.detector.path,
+            "backend": self.detector.backend,
+            "max_batch_size": self.max_batch_size,
+            "batch_wait_ms": round(self.batch_wait * 1000, 2),
+            "clients": self._clients,
+            "batches": batches,
+            "frames": frames,
+            "avg_batch_size": round(avg_size, 2),
+            "avg_occupancy": round(avg_size / self.max_batch_size, 3),
+            "avg_batch_latency_ms": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+            "last_batch_latency_ms": round(1000 * latencies[-1], 1) if latencies else 0.0,
+        }
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch_size and len(batch) < max(1, self._clients):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        logger.info(f"Batch inference started for {self.detector.path} (max_batch={self.max_batch_size})")
+        while self.running:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = self._collect(first)
+
+            # Frames with different call options (e.g. imgsz) cannot share a batch
+            groups: Dict[Tuple, List[_Request]] = {}
+            for req in batch:
+                groups.setdefault(req.options, []).append(req)
+
+            for options, reqs in groups.items():
+                self._run_batch(reqs, dict(options))
+
+        logger.info(f"Batch inference stopped for {self.detector.path}")
+
+    def _run_batch(self, reqs: List[_Request], options: Dict):
+        t0 = time.perf_counter()
+        try:
+            results = self.detector.detect_batch([r.frame for r in reqs], **options)
+        except Exception as e:
+            for r in reqs:
+                r.future.set_exception(e)
+            return
+        latency = time.perf_counter() - t0
+
+        for r, res in zip(reqs, results):
+            r.future.set_result(res)
+
+        with self._stats_lock:
+            self.batches += 1
+            self.frames += len(reqs)
+            self.batch_sizes.append(len(reqs))
+            self.batch_latencies.append(latency)
@@ -0,0 +1,100 @@
+"""Incremental lane travel-direction estimation with a persisted warm start."""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LaneDirectionLearner:
+    """Exponentially decayed mean of unit travel vectors per lane.
+
+    Each update is O(1) per sample and memory is a few floats per lane. The confidence is the
+    length of the decayed mean vector (1 = all vehicles agree, ~0 = no consistent direction, e.g.
+    two-way traffic in one polygon); a lane only gets a direction once it has min_samples samples
+    and at least min_confidence.
+    """
+
+    def __init__(self, lanes: int, memory_samples: float = 600.0, min_samples: int = 20,
+                 min_confidence: float = 0.5):
+        self.lanes = lanes
+        self.decay = 1.0 - 1.0 / max(1.0, memory_samples)
+        self.min_samples = min_samples
+        self.min_confidence = min_confidence
+        self.sums = np.zeros((lanes, 2))
+        self.weights = np.zeros(lanes)
+        self.counts = np.zeros(lanes, dtype=np.int64)
+
+    def update(self, lane_ids: np.ndarray, unit_vectors: np.ndarray):
+        """Add one unit travel vector per sample; samples of one call are treated as simultaneous."""
+        if len(lane_ids) == 0:
+            return
+        k = np.bincount(lane_ids, minlength=self.lanes)
+        decay = self.decay ** k
+        self.sums *= decay[:, None]
+        self.sums[:, 0] += np.bincount(lane_ids, weights=unit_vectors[:, 0], minlength=self.lanes)
+        self.sums[:, 1] += np.bincount(lane_ids, weights=unit_vectors[:, 1], minlength=self.lanes)
+        self.weights = self.weights * decay + k
+        self.counts += k
+
+    def confidence(self) -> np.ndarray:
+        norms = np.hypot(self.sums[:, 0], self.sums[:, 1])
+        return np.divide(norms, self.weights, out=np.zeros(self.lanes), where=self.weights > 0)
+
+    def ready(self) -> np.ndarray:
+        return (self.counts >= self.min_samples) & (self.confidence() >= self.min_confidence)
+
+    def directions(self) -> np.ndarray:
+        """(L, 2) unit directions, (0, 0) for lanes that are not ready."""
+        out = np.zeros((self.lanes, 2))
+        ready = self.ready()
+        if ready.any():
+            norms = np.hypot(self.sums[ready, 0], self.sums[ready, 1])
+            out[ready] = self.sums[ready] / norms[:, None]
+        return out
+
+    def save(self, path: Path, lanes: List[List[Tuple[float, float]]]):
+        """Write the state atomically, tagged with the lane polygons it was learned for."""
+        state = {
+            "lanes": lanes,
+            "sums": self.sums.tolist(),
+            "weights": self.weights.tolist(),
+            "counts": self.counts.tolist(),
+            "confidence": [round(float(c), 3) for c in self.confidence()],
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
+
+    def load(self, path: Path, lanes: List[List[Tuple[float, float]]]) -> bool:
+        """Restore a saved state; ignored (False) if missing, unreadable or for other lane polygons."""
+        if not path.exists():
+            return False
+        try:
+            state = json.loads(path.read_text())
+            saved_lanes = [[tuple(pt) for pt in poly] for poly in state["lanes"]]
+            if saved_lanes != [[tuple(pt) for pt in poly] for poly in lanes]:
+                logger.info(f"Lane geometry changed, not restoring {path}")
+                return False
+            sums = np.array(state["sums"], dtype=np.float64).reshape(-1, 2)
+            weights = np.array(state["weights"], dtype=np.float64)
+            counts = np.array(state["counts"], dtype=np.int64)
+        except Exception as e:
+            logger.warning(f"Failed to load lane directions from {path}: {e}")
+            return False
+        if len(sums) != self.lanes or len(weights) != self.lanes or len(counts) != self.lanes:
+            return False
+        self.sums, self.weights, self.counts = sums, weights, counts
+        return True
+
+
+def load_learner(path: Optional[Path], lanes: List[List[Tuple[float, float]]]) -> Tuple[LaneDirectionLearner, bool]:
+    """A learner for the lanes, warm-started from path when it holds a state for the same lanes."""
+    learner = LaneDirectionLearner(len(lanes))
+    restored = path is not None and learner.load(path, lanes)
+    return learner, restored
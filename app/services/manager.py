@@ -0,0 +1,135 @@
+"""Multi-camera processor manager."""
+import re
+import threading
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+from app.utils.roi import camera_config_path, load_roi_config
+from app.utils.settings import AppSettings
+
+# The pipeline modules pull in cv2, supervision and ultralytics; they are imported on first use
+# so the API can answer requests while they load.
+if TYPE_CHECKING:
+    from app.services.models import ModelRegistry
+    from app.services.processor_v2 import VideoProcessorV2
+    from app.services.worker import ProcessCameraHandle
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAMERA_ID = "default"
+CAMERA_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+CameraProcessor = Union["VideoProcessorV2", "ProcessCameraHandle"]
+
+
+class ProcessorManager:
+    """Creates and owns named processors that share one model registry.
+
+    With worker_mode="process" each camera runs in its own worker process instead
+    (models are then loaded per process).
+
+    start(), stop() and remove() block while a source opens or a worker process spawns or
+    exits, so async callers run them in a thread; calls for one camera are serialized.
+    """
+
+    def __init__(self, settings: Optional[AppSettings] = None):
+        self.settings = settings or AppSettings()
+        self._models: Optional["ModelRegistry"] = None
+        self._models_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._processors: Dict[str, CameraProcessor] = {}
+        self._control_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def models(self) -> "ModelRegistry":
+        """The shared model registry, created (and its modules imported) on first use."""
+        with self._models_lock:
+            if self._models is None:
+                from app.services.models import ModelRegistry
+                self._models = ModelRegistry(self.settings.max_batch_size, self.settings.batch_wait_ms)
+            return self._models
+
+    def get(self, camera_id: str) -> CameraProcessor:
+        """Return the processor for camera_id, creating it on first use."""
+        if not CAMERA_ID_PATTERN.match(camera_id):
+            raise ValueError(f"Invalid camera id: {camera_id}")
+
+        with self._lock:
+            proc = self._processors.get(camera_id)
+            if proc is None:
+                proc = self._create(camera_id)
+                self._processors[camera_id] = proc
+            return proc
+
+    def find(self, camera_id: str) -> Optional[CameraProcessor]:
+        """Return an existing processor without creating one."""
+        with self._lock:
+            return self._processors.get(camera_id)
+
+    def _control_lock(self, camera_id: str) -> threading.Lock:
+        with self._lock:
+            return self._control_locks.setdefault(camera_id, threading.Lock())
+
+    def start(self, camera_id: str, source: Union[int, str]) -> bool:
+        """Start a camera on source, creating its processor on first use."""
+        proc = self.get(camera_id)
+        with self._control_lock(camera_id):
+            return proc.start(source)
+
+    def stop(self, camera_id: str) -> bool:
+        """Stop a camera; False if it does not exist."""
+        proc = self.find(camera_id)
+        if proc is None:
+            return False
+        with self._control_lock(camera_id):
+            proc.stop()
+        return True
+
+    def remove(self, camera_id: str) -> bool:
+        """Stop and forget a camera."""
+        with self._lock:
+            proc = self._processors.pop(camera_id, None)
+        if proc is None:
+            return False
+        with self._control_lock(camera_id):
+            proc.stop()
+        logger.info(f"Removed camera {camera_id}")
+        return True
+
+    def list_cameras(self) -> List[Dict]:
+        with self._lock:
+            procs = list(self._processors.values())
+        return [proc.get_status() for proc in procs]
+
+    def stop_all(self):
+        with self._lock:
+            procs = list(self._processors.values())
+        for proc in procs:
+            proc.stop()
+
+    def shutdown(self):
+        """Stop every camera and the shared inference services."""
+        self.stop_all()
+        if self._models is not None:
+            self._models.shutdown()
+
+    def _create(self, camera_id: str) -> CameraProcessor:
+        from app.services.evidence import EvidenceManager
+
+        roi = load_roi_config(camera_config_path(camera_id))
+        # The default camera keeps the top-level violations folder
+        base_dir = "violations" if camera_id == DEFAULT_CAMERA_ID else f"violations/{camera_id}"
+        evidence_manager = EvidenceManager(base_dir=base_dir)
+        if self.settings.worker_mode == "process":
+            from app.services.worker import ProcessCameraHandle
+            proc = ProcessCameraHandle(camera_id, evidence_manager, self.settings)
+        else:
+            from app.services.processor_v2 import VideoProcessorV2
+            proc = VideoProcessorV2(
+                camera_id=camera_id,
+                roi=roi,
+                model_registry=self.models,
+                evidence_manager=evidence_manager,
+            )
+        logger.info(f"Initialized {self.settings.worker_mode} processor for camera {camera_id}")
+        return proc
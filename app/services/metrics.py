@@ -1,7 +1,7 @@
 """Performance metrics tracking."""
 import time
 from collections import deque
-from typing import Dict
+from typing import Dict, Optional
 from threading import Lock
 
 
@@ -12,7 +12,10 @@ class MetricsCollector:
         self.lock = Lock()
         self.frame_times = deque(maxlen=60)
         self.detection_counts = deque(maxlen=100)
+        self.latencies = deque(maxlen=60)
         self.violation_counts: Dict[str, int] = {}
+        self.dropped_frames = 0
+        self.stale_frames = 0
         self.start_time = time.time()
         
     def record_frame(self, process_time: float, detections: int):
@@ -21,11 +24,34 @@ class MetricsCollector:
             self.frame_times.append(process_time)
             self.detection_counts.append(detections)
     
+    def record_latency(self, latency: float):
+        """Record capture-to-output latency of a frame in seconds."""
+        with self.lock:
+            self.latencies.append(latency)
+    
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Percentile (0-1) of recent frame latencies in seconds, None if no data."""
+        with self.lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
     def record_violation(self, kind: str):
         """Record a violation occurrence."""
         with self.lock:
             self.violation_counts[kind] = self.violation_counts.get(kind, 0) + 1
     
+    def record_dropped_frame(self):
+        """Record a captured frame discarded by the frame buffer policy."""
+        with self.lock:
+            self.dropped_frames += 1
+    
+    def record_stale_frame(self):
+        """Record a frame that was already old when processing started."""
+        with self.lock:
+            self.stale_frames += 1
+    
     def get_metrics(self) -> Dict:
         """Get current metrics snapshot."""
         with self.lock:
@@ -34,18 +60,25 @@ class MetricsCollector:
                     "fps": 0.0,
                     "avg_detections": 0.0,
                     "violations": dict(self.violation_counts),
+                    "dropped_frames": self.dropped_frames,
+                    "stale_frames": self.stale_frames,
                     "uptime_seconds": int(time.time() - self.start_time)
                 }
             
             avg_time = sum(self.frame_times) / len(self.frame_times)
             fps = 1.0 / avg_time if avg_time > 0 else 0.0
             avg_det = sum(self.detection_counts) / len(self.detection_counts) if self.detection_counts else 0
+            latencies = sorted(self.latencies)
             
             return {
                 "fps": round(fps, 2),
                 "avg_process_time_ms": round(avg_time * 1000, 1),
                 "avg_detections": round(avg_det, 1),
+                "latency_ms_avg": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "latency_ms_p90": round(1000 * latencies[min(len(latencies) - 1, int(0.9 * len(latencies)))], 1) if latencies else 0.0,
                 "violations": dict(self.violation_counts),
+                "dropped_frames": self.dropped_frames,
+                "stale_frames": self.stale_frames,
                 "uptime_seconds": int(time.time() - self.start_time)
             }
     
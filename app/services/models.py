@@ -0,0 +1,145 @@
+"""Shared model registry so every camera reuses the same loaded weights."""
+import threading
+import logging
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.services.detectors import DEFAULT_DETECTOR_PATHS, Detector, create_detector, exported_input_size
+from app.services.inference import BatchInferenceService
+
+logger = logging.getLogger(__name__)
+
+DETECTOR_MODEL_PATH = DEFAULT_DETECTOR_PATHS["pytorch"]
+
+
+class SharedModel:
+    """Thread-safe wrapper around one loaded model used by several processors.
+
+    input_size is None when the model takes any batch and input size (PyTorch weights, dynamic
+    exports); otherwise it is the fixed square size (0 if unknown) and calls take one image.
+    """
+
+    def __init__(self, path: str, model: Any, input_size: Optional[int] = None):
+        self.path = path
+        self.model = model
+        self.input_size = input_size
+        self.lock = threading.Lock()
+
+    @property
+    def dynamic(self) -> bool:
+        return self.input_size is None
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return self.model.names
+
+    def __call__(self, *args, **kwargs) -> Any:
+        # Ultralytics predictors keep per-call state, so calls are serialized
+        with self.lock:
+            return self.model(*args, **kwargs)
+
+
+class ModelRegistry:
+    """Loads each model once and hands out the shared instance.
+
+    Loading happens outside the registry lock, so stats and already-loaded models stay available
+    while a model loads; concurrent requests for the same model wait for the first load.
+    """
+
+    def __init__(self, max_batch_size: int = 8, batch_wait_ms: float = 5.0, detector_threads: int = 0):
+        self.max_batch_size = max_batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.detector_threads = detector_threads
+        self._lock = threading.Lock()
+        self._models: Dict[str, SharedModel] = {}
+        self._detectors: Dict[Tuple, Detector] = {}
+        self._services: Dict[Tuple, BatchInferenceService] = {}
+        # Model path or detector key -> event set once its load finished (or failed)
+        self._loading: Dict[Hashable, threading.Event] = {}
+        self._ocr_lock = threading.Lock()
+        self._ocr: Any = None
+
+    def _load_once(self, store: Dict, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Return store[key], calling load() for it once; the lock is only held around the dicts."""
+        while True:
+            with self._lock:
+                value = store.get(key)
+                if value is not None:
+                    return value
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    break
+            # Another thread is loading it; if that load fails, this one retries
+            event.wait()
+        try:
+            value = load()
+            with self._lock:
+                store[key] = value
+            return value
+        finally:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+
+    def get(self, path: str) -> SharedModel:
+        """Return the shared ultralytics model for path (helmet/plate models), loading it on first use."""
+        def load() -> SharedModel:
+            from ultralytics import YOLO
+
+            logger.info(f"Loading model {path}...")
+            model = SharedModel(path, YOLO(path), exported_input_size(path))
+            logger.info(f"Model {path} loaded")
+            return model
+
+        return self._load_once(self._models, path, load)
+
+    def detector(self, backend: str, path: Optional[str], allowed_names: Iterable[str],
+                 conf_threshold: float = 0.25) -> Detector:
+        """Return the shared detector for a backend/model/class filter, loading it on first use."""
+        path = path or DEFAULT_DETECTOR_PATHS.get(backend, DETECTOR_MODEL_PATH)
+        key = (backend, path, frozenset(allowed_names), conf_threshold)
+
+        def load() -> Detector:
+            logger.info(f"Loading {backend} detector {path}...")
+            detector = create_detector(backend, path, allowed_names, conf_threshold, self.detector_threads)
+            logger.info(f"Detector {path} loaded")
+            return detector
+
+        return self._load_once(self._detectors, key, load)
+
+    def batched(self, backend: str, path: Optional[str], allowed_names: Iterable[str],
+                conf_threshold: float = 0.25) -> BatchInferenceService:
+        """Return the micro-batching service for a detector, shared by all cameras."""
+        detector = self.detector(backend, path, allowed_names, conf_threshold)
+        key = (backend, detector.path, frozenset(allowed_names), conf_threshold)
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                service = BatchInferenceService(detector, self.max_batch_size, self.batch_wait_ms)
+                self._services[key] = service
+            return service
+
+    def ocr(self) -> Any:
+        """Return the shared EasyOCR reader (English, CPU), building it on first use."""
+        with self._ocr_lock:
+            if self._ocr is None:
+                import easyocr
+                logger.info("Loading OCR reader...")
+                self._ocr = easyocr.Reader(['en'], gpu=False)
+                logger.info("OCR reader loaded")
+            return self._ocr
+
+    def loaded_paths(self) -> List[str]:
+        with self._lock:
+            return list(self._models) + [d.path for d in self._detectors.values()]
+
+    def get_inference_stats(self) -> List[Dict]:
+        with self._lock:
+            services = list(self._services.values())
+        return [s.get_stats() for s in services]
+
+    def shutdown(self):
+        with self._lock:
+            services = list(self._services.values())
+        for service in services:
+            service.stop()
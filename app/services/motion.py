@@ -0,0 +1,99 @@
+"""Cheap motion gate that skips the detector on idle scenes."""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """Frame differencing on a downscaled grayscale image, restricted to the lane polygons.
+
+    The detector keeps running for hold_frames after the last motion so tracks can finish,
+    and at least every force_every frames so nothing is missed for long.
+    """
+
+    def __init__(
+        self,
+        lanes: List[List[Tuple[float, float]]],
+        threshold: float = 0.002,
+        hold_frames: int = 15,
+        force_every: int = 30,
+        width: int = 160,
+        diff_threshold: int = 25,
+    ):
+        self.lanes = lanes
+        self.threshold = threshold
+        self.hold_frames = hold_frames
+        self.force_every = force_every
+        self.width = width
+        self.diff_threshold = diff_threshold
+
+        self._prev: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        self._mask_area = 1
+        self._hold = 0
+        self._idle_run = 0
+
+        self.frames = 0
+        self.skipped = 0
+        self.last_motion_ratio = 0.0
+
+    def _build_mask(self, w: int, h: int):
+        if self.lanes:
+            self._mask = np.zeros((h, w), dtype=np.uint8)
+            polys = [np.array([(int(x * w), int(y * h)) for x, y in poly], dtype=np.int32) for poly in self.lanes]
+            cv2.fillPoly(self._mask, polys, 255)
+        else:
+            self._mask = np.full((h, w), 255, dtype=np.uint8)
+        self._mask_area = max(1, cv2.countNonZero(self._mask))
+
+    def check(self, frame: np.ndarray) -> bool:
+        """Return True when the detector should run on this frame."""
+        self.frames += 1
+        h, w = frame.shape[:2]
+        small_h = max(1, int(h * self.width / w))
+        small = cv2.resize(frame, (self.width, small_h), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self._mask is None or self._mask.shape != gray.shape:
+            self._build_mask(self.width, small_h)
+            self._prev = None
+
+        prev, self._prev = self._prev, gray
+        if prev is None:
+            self._hold = self.hold_frames
+            return True
+
+        diff = cv2.absdiff(gray, prev)
+        _, moving = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+        moving = cv2.bitwise_and(moving, self._mask)
+        self.last_motion_ratio = cv2.countNonZero(moving) / self._mask_area
+
+        if self.last_motion_ratio >= self.threshold:
+            self._hold = self.hold_frames
+        elif self._hold > 0:
+            self._hold -= 1
+
+        if self._hold > 0:
+            self._idle_run = 0
+            return True
+
+        self._idle_run += 1
+        if self.force_every and self._idle_run >= self.force_every:
+            self._idle_run = 0
+            return True
+
+        self.skipped += 1
+        return False
+
+    def get_stats(self) -> Dict:
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "hit_rate": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            "motion_ratio": round(self.last_motion_ratio, 4),
+            "active": self._hold > 0,
+        }
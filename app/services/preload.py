@@ -0,0 +1,155 @@
+"""Background model loading and warm-up at application startup."""
+import importlib
+import threading
+import time
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional
+
+from app.utils.roi import ROIConfig
+
+if TYPE_CHECKING:
+    from app.services.models import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class PreloadStep(NamedTuple):
+    """One module or model to load, then optionally warm up with a dummy inference."""
+    name: str
+    load: Callable[[], Any]
+    warmup: Optional[Callable[[Any], None]] = None
+    # Readiness waits for required steps to succeed; optional ones may fail
+    required: bool = True
+
+
+def import_steps(roi: ROIConfig) -> List[PreloadStep]:
+    """Import the heavy libraries one by one, so their import time shows up per library."""
+    modules = [("cv2", "cv2"), ("supervision", "supervision")]
+    if roi.detector_backend == "pytorch" or roi.helmet_model_path or roi.plate_model_path:
+        modules += [("torch", "torch"), ("ultralytics", "ultralytics")]
+    modules.append(("pipeline", "app.services.processor_v2"))
+    return [
+        PreloadStep(f"import:{name}", lambda module=module: importlib.import_module(module), required=name == "pipeline")
+        for name, module in modules
+    ]
+
+
+def model_steps(registry: "ModelRegistry", roi: ROIConfig) -> List[PreloadStep]:
+    """Steps for the models a camera with this ROI config uses, loaded into the shared registry.
+
+    The pipeline modules are only imported when the steps run (after import_steps).
+    """
+    size = roi.inference_size or 640
+
+    def load_detector():
+        from app.services.processor_v2 import ALLOWED_CLASS_NAMES
+        return registry.detector(roi.detector_backend, roi.detector_model_path, ALLOWED_CLASS_NAMES, roi.detector_conf)
+
+    def warm_detector(detector):
+        detector.warmup(detector.fixed_input_size or size)
+
+    def warm_yolo(model):
+        import numpy as np
+        kwargs = {"imgsz": model.input_size} if model.input_size else {}
+        model(np.zeros((320, 320, 3), dtype=np.uint8), verbose=False, **kwargs)
+
+    def warm_ocr(reader):
+        import numpy as np
+        reader.readtext(np.zeros((64, 256, 3), dtype=np.uint8))
+
+    steps = [PreloadStep("detector", load_detector, warm_detector)]
+    if roi.helmet_model_path:
+        steps.append(PreloadStep("helmet", lambda: registry.get(roi.helmet_model_path), warm_yolo, required=False))
+    if roi.plate_model_path:
+        steps.append(PreloadStep("plate", lambda: registry.get(roi.plate_model_path), warm_yolo, required=False))
+        steps.append(PreloadStep("ocr", registry.ocr, warm_ocr, required=False))
+    return steps
+
+
+class ModelPreloader:
+    """Runs preload steps in order on a background thread and records per-step timings.
+
+    steps run first; plan is then called on the same thread to build the remaining steps, so
+    building them may rely on modules the first steps imported.
+    """
+
+    def __init__(self, steps: Optional[List[PreloadStep]] = None,
+                 plan: Optional[Callable[[], List[PreloadStep]]] = None):
+        self.steps: List[PreloadStep] = list(steps or [])
+        self.plan = plan
+        self._lock = threading.Lock()
+        self._status: Dict[str, Dict] = {}
+        self._add_status(self.steps)
+        self.thread: Optional[threading.Thread] = None
+        self.done = False
+        self.elapsed = 0.0
+
+    def start(self, on_done: Optional[Callable[[], Any]] = None):
+        """Start loading; on_done runs on the same thread once every step has finished."""
+        self.thread = threading.Thread(target=self._run, args=(on_done,), name="model-preload", daemon=True)
+        self.thread.start()
+
+    def _add_status(self, steps: List[PreloadStep]):
+        with self._lock:
+            for step in steps:
+                self._status[step.name] = {"state": "pending", "required": step.required}
+
+    def _set(self, name: str, **fields):
+        with self._lock:
+            self._status[name].update(fields)
+
+    def _run_steps(self, steps: List[PreloadStep]):
+        for step in steps:
+            self._set(step.name, state="loading")
+            try:
+                t0 = time.perf_counter()
+                model = step.load()
+                t1 = time.perf_counter()
+                self._set(step.name, state="warming", load_ms=round((t1 - t0) * 1000, 1))
+                if step.warmup is not None:
+                    step.warmup(model)
+                self._set(step.name, state="ready", warmup_ms=round((time.perf_counter() - t1) * 1000, 1))
+                logger.info(f"Preloaded {step.name}")
+            except Exception as e:
+                self._set(step.name, state="failed", error=str(e))
+                log = logger.error if step.required else logger.warning
+                log(f"Preloading {step.name} failed: {e}")
+
+    def _run(self, on_done: Optional[Callable[[], Any]]):
+        started = time.perf_counter()
+        self._run_steps(self.steps)
+        if self.plan is not None:
+            try:
+                planned = self.plan()
+            except Exception as e:
+                logger.error(f"Planning model preload failed: {e}")
+                planned = []
+                with self._lock:
+                    self._status["plan"] = {"state": "failed", "required": True, "error": str(e)}
+            self._add_status(planned)
+            self.steps = self.steps + planned
+            self._run_steps(planned)
+        self.elapsed = time.perf_counter() - started
+
+        if on_done is not None:
+            try:
+                on_done()
+            except Exception as e:
+                logger.error(f"Post-preload hook failed: {e}")
+        self.done = True
+        with self._lock:
+            breakdown = ", ".join(
+                f"{name} {s.get('load_ms', 0) + s.get('warmup_ms', 0):.0f}ms" for name, s in self._status.items()
+            )
+        logger.info(f"Model preload finished in {self.elapsed:.1f}s ({breakdown})")
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            models = {name: dict(status) for name, status in self._status.items()}
+        ready = self.done and all(s["state"] == "ready" for s in models.values() if s["required"])
+        return {
+            "ready": ready,
+            "done": self.done,
+            "elapsed_ms": round(self.elapsed * 1000, 1) if self.done else None,
+            "models": models,
+        }
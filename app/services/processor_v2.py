@@ -5,27 +5,63 @@ import threading
 import time
 import logging
 from collections import deque
-from typing import Deque, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
 from datetime import datetime
 
-from ultralytics import YOLO
 import supervision as sv
 
-from app.utils.roi import ROIConfig, load_roi_config, denormalize_points
+from app.utils.roi import (
+    ROIConfig, load_roi_config, denormalize_points, detection_region, lane_state_path, lookup_lanes, rasterize_lanes,
+)
 from app.services.evidence import EvidenceManager
 from app.services.metrics import MetricsCollector
+from app.services.capture import POLICY_BLOCK, CaptureThread, FrameBuffer, default_policy_for, is_file_source
+from app.services.models import ModelRegistry, SharedModel
+from app.services.inference import BatchInferenceService
+from app.services.lane_learning import LaneDirectionLearner, load_learner
+from app.services.quality import QualityController
+from app.services.motion import MotionGate
+from app.services.rules import MIN_STEP_SECONDS, FrameTracks, evaluate_rules
+from app.services.secondary import SecondaryWorkerPool, size_buckets
+from app.services.stream import MJPEGBroadcaster
+from app.services.attributes import TrackAttributeCache, Vote, crop_quality
+from app.services.track_state import TrackStateStore
+from app.utils.letterbox import Letterbox, stride_aligned
 
 logger = logging.getLogger(__name__)
 
 ALLOWED_CLASS_NAMES = {"person", "car", "motorcycle", "bus", "truck", "bicycle"}
 VEHICLE_CLASS_NAMES = {"car", "bus", "truck", "motorcycle", "bicycle"}
+# Classes whose riders are checked for helmets
+TWO_WHEELER_CLASS_NAMES = {"motorcycle", "bicycle"}
+# Plate crops are resized to this (width, height) for batched OCR
+PLATE_OCR_SIZE = (256, 64)
+# Learned lane directions are also saved every this many frames, not only on stop
+LANE_STATE_SAVE_FRAMES = 1800
 
 
 class VideoProcessorV2:
     """Enhanced video processor with production-ready features."""
     
-    def __init__(self):
-        self.model: Optional[YOLO] = None
+    def __init__(
+        self,
+        camera_id: str = "default",
+        roi: Optional[ROIConfig] = None,
+        model_registry: Optional[ModelRegistry] = None,
+        evidence_manager: Optional[EvidenceManager] = None,
+    ):
+        self.camera_id = camera_id
+        self.source: Optional[Union[int, str]] = None
+        self.model_registry = model_registry or ModelRegistry()
+        self.inference: Optional[BatchInferenceService] = None
+        self.class_names: Dict[int, str] = {}
+        # Per class id: vehicle / two-wheeler (indexed by class_id; the extra last entry catches -1)
+        self._vehicle_classes = np.zeros(1, dtype=bool)
+        self._two_wheeler_classes = np.zeros(1, dtype=bool)
+        self.letterbox: Optional[Letterbox] = None
+        self._crop_region: Optional[Tuple[Tuple[int, int], Optional[Tuple[int, int, int, int]]]] = None
+        self.quality: Optional[QualityController] = None
+        self.motion_gate: Optional[MotionGate] = None
         self.tracker = sv.ByteTrack()
         self.box_annotator = sv.BoxAnnotator()
         self.label_annotator = sv.LabelAnnotator()
@@ -33,57 +69,93 @@ class VideoProcessorV2:
         self.signal_state: str = "green"
         self.alerts: Deque[Dict] = deque(maxlen=200)
         
+        # Output hooks (e.g. shared-memory transport in worker processes)
+        self.alert_callbacks: List[Callable[[Dict], None]] = []
+        self.frame_callbacks: List[Callable[[np.ndarray], None]] = []
+        
         # Alert debouncing (match with violation highlight duration)
-        self.alert_cooldown: Dict[Tuple[int, str], float] = {}
         self.cooldown_seconds = 5.0
         self.violation_highlight_seconds = 5.0  # How long red circle shows
         
         # Evidence and metrics
-        self.evidence_manager = EvidenceManager()
+        self.evidence_manager = evidence_manager or EvidenceManager()
         self.metrics = MetricsCollector()
         
         # Video capture
         self.cap: Optional[cv2.VideoCapture] = None
+        self.capture: Optional[CaptureThread] = None
+        self.frame_buffer: Optional[FrameBuffer] = None
         self.frame_lock = threading.Lock()
         self.running = False
         self.thread: Optional[threading.Thread] = None
         self.last_frame: Optional[np.ndarray] = None
+        # Encodes each new frame once for every /stream viewer
+        self.stream = MJPEGBroadcaster()
+        
+        # Offline runners turn these off to process files as fast as possible
+        self.paced = True
+        self.annotate = True
+        self.save_evidence = True
+        # Offline runners set this so secondary models wait for room instead of shedding crops
+        self.block_secondary = False
+        # Load and save learned lane directions (app/config/lane_state/<camera_id>.json)
+        self.persist_lane_state = True
+        
+        # Per-run frame state (reset by open_pipeline)
+        self.frame_idx = 0
+        self.media_ts = 0.0
+        self._frame_size: Optional[Tuple[int, int]] = None
+        self._stop_line_px: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
+        self._lane_contours: List[np.ndarray] = []
+        self._lane_raster: Optional[np.ndarray] = None
+        self._geometry_roi: Optional[ROIConfig] = None
+        self._tracked = sv.Detections.empty()
+        self._conf = np.zeros((0,))
+        self._alert_count = 0
         
         # ROI and calibration
-        self.roi: ROIConfig = load_roi_config()
+        self.roi: ROIConfig = roi or load_roi_config()
         self.m_per_px: Optional[float] = None
-        self.track_last: Dict[int, Tuple[float, Tuple[float, float]]] = {}
+        
+        # Per-track state (history, counters, cooldowns, highlights), bounded by TTL and capacity
+        self.track_state = TrackStateStore(
+            capacity=self.roi.track_state_capacity,
+            ttl_seconds=self.roi.track_state_ttl_seconds,
+        )
+        self.attributes = TrackAttributeCache(
+            self.track_state,
+            budget=self.roi.attribute_budget,
+            resolve_confidence=self.roi.attribute_resolve_confidence,
+        )
         
         # Wrong-way detection
-        self.track_history: Dict[int, Deque[Tuple[float, Tuple[float, float]]]] = {}
-        self.wrong_way_counter: Dict[int, int] = {}
-        self.lane_dirs_unit: List[Tuple[float, float]] = []
-        self.lane_dir_samples: List[Deque] = []
+        self.lane_dirs_unit = np.zeros((0, 2))
+        self.lane_learner: Optional[LaneDirectionLearner] = None
         self.auto_learning_complete = False
         
         # Violation marking
-        self.violation_until: Dict[int, float] = {}
         self.focus_track_id: Optional[int] = None
         self.focus_until: float = 0.0
         
         # Optional models
-        self.helmet_model: Optional[YOLO] = None
+        self.helmet_model: Optional[SharedModel] = None
         if self.roi.helmet_model_path:
             try:
-                self.helmet_model = YOLO(self.roi.helmet_model_path)
+                self.helmet_model = self.model_registry.get(self.roi.helmet_model_path)
                 logger.info(f"Loaded helmet model from {self.roi.helmet_model_path}")
             except Exception as e:
                 logger.warning(f"Failed to load helmet model: {e}")
         
-        self.plate_model: Optional[YOLO] = None
+        self.plate_model: Optional[SharedModel] = None
         if self.roi.plate_model_path:
             try:
-                self.plate_model = YOLO(self.roi.plate_model_path)
+                self.plate_model = self.model_registry.get(self.roi.plate_model_path)
                 logger.info(f"Loaded plate model from {self.roi.plate_model_path}")
             except Exception as e:
                 logger.warning(f"Failed to load plate model: {e}")
         
         self.ocr_reader = None
+        self.secondary: Optional[SecondaryWorkerPool] = None
     
     def start(self, source: Union[int, str]) -> bool:
         """Start processing video from source."""
@@ -91,31 +163,41 @@ class VideoProcessorV2:
             self.stop()
             self.cap = cv2.VideoCapture(source)
             if not self.cap.isOpened():
-                logger.error(f"Failed to open video source: {source}")
+                logger.error(f"[{self.camera_id}] Failed to open video source: {source}")
                 self.cap = None
                 return False
             
-            if self.model is None:
-                logger.info("Loading YOLOv8n model...")
-                self.model = YOLO("yolov8n.pt")
-                logger.info("Model loaded successfully")
+            self.open_pipeline()
+            
+            policy = self.roi.capture_policy or default_policy_for(source)
+            self.frame_buffer = FrameBuffer(
+                self.roi.capture_buffer_size, policy, on_drop=self.metrics.record_dropped_frame
+            )
+            self.capture = CaptureThread(self.cap, self.frame_buffer, media_clock=is_file_source(source))
+            self.capture.start()
             
             self.running = True
             self.thread = threading.Thread(target=self._run_loop, daemon=True)
             self.thread.start()
-            logger.info(f"Started processing from {source}")
+            self.source = source
+            logger.info(f"[{self.camera_id}] Started processing from {source}")
             return True
             
         except Exception as e:
-            logger.error(f"Error starting processor: {e}")
+            logger.error(f"[{self.camera_id}] Error starting processor: {e}")
             return False
     
     def stop(self):
         """Stop processing."""
         self.running = False
+        if self.capture:
+            self.capture.stop()
+            self.capture = None
         if self.thread:
             self.thread.join(timeout=2.0)
             self.thread = None
+        self.frame_buffer = None
+        self.close_pipeline()
         if self.cap:
             try:
                 self.cap.release()
@@ -124,15 +206,12 @@ class VideoProcessorV2:
             self.cap = None
         
         # Clear state
-        self.track_last.clear()
-        self.track_history.clear()
-        self.wrong_way_counter.clear()
-        self.violation_until.clear()
-        self.alert_cooldown.clear()
+        self.track_state.clear()
         self.focus_track_id = None
         self.focus_until = 0.0
         self.auto_learning_complete = False
-        logger.info("Stopped processing")
+        self.source = None
+        logger.info(f"[{self.camera_id}] Stopped processing")
     
     def set_signal_state(self, state: str):
         """Set traffic signal state."""
@@ -142,36 +221,56 @@ class VideoProcessorV2:
         self.signal_state = state
         logger.info(f"Signal state changed to {state}")
     
+    @property
+    def tracked(self) -> sv.Detections:
+        """Tracks from the last processed frame."""
+        return self._tracked
+    
     def get_signal_state(self) -> str:
         return self.signal_state
     
     def get_recent_alerts(self) -> Dict:
         return {"signal": self.signal_state, "alerts": list(self.alerts)}
     
+    def get_status(self) -> Dict:
+        """Get camera status summary."""
+        return {
+            "camera_id": self.camera_id,
+            "running": self.running,
+            "source": self.source,
+            "signal": self.signal_state,
+        }
+    
     def get_metrics(self) -> Dict:
         """Get performance metrics."""
-        return self.metrics.get_metrics()
+        metrics = self.metrics.get_metrics()
+        if self.quality is not None:
+            metrics["quality"] = self.quality.get_stats()
+        if self.motion_gate is not None:
+            metrics["motion_gate"] = self.motion_gate.get_stats()
+        metrics["track_state"] = self.track_state.get_stats()
+        metrics["stream"] = self.stream.get_stats()
+        if self.secondary is not None:
+            metrics["secondary"] = self.secondary.get_stats()
+            metrics["attributes"] = self.attributes.get_stats()
+        return metrics
     
     def _should_emit_alert(self, track_id: int, kind: str) -> bool:
         """Check if alert should be emitted (debouncing)."""
-        now = time.time()
-        key = (track_id, kind)
-        last_time = self.alert_cooldown.get(key, 0)
-        
-        if now - last_time < self.cooldown_seconds:
-            return False
-        
-        self.alert_cooldown[key] = now
-        return True
+        now = self.media_ts
+        slot = self.track_state.slot(track_id, now)
+        return self.track_state.cooldown_ready(slot, kind, now, self.cooldown_seconds)
     
     def _emit_alert(self, kind: str, track_id: int, info: Dict, frame: Optional[np.ndarray] = None, bbox: Optional[Tuple] = None, vehicle_class: str = "obj"):
         """Emit alert with debouncing and evidence saving."""
         if not self._should_emit_alert(track_id, kind):
             return
         
-        now = time.time()
+        now = self.media_ts
         alert = {
-            "ts": now,
+            "ts": time.time(),
+            "media_ts": round(now, 3),
+            "camera_id": self.camera_id,
             "type": kind,
             "track_id": track_id,
             "info": info,
@@ -179,7 +278,7 @@ class VideoProcessorV2:
         }
         
         # Save evidence for violations (not plate_read)
-        if kind != "plate_read" and frame is not None and bbox is not None:
+        if self.save_evidence and kind != "plate_read" and frame is not None and bbox is not None:
             evidence_id = self.evidence_manager.save_violation(
                 kind, track_id, frame, bbox, info
             )
@@ -187,148 +286,509 @@ class VideoProcessorV2:
                 alert["evidence_id"] = evidence_id
         
         self.alerts.appendleft(alert)
+        self._alert_count += 1
         self.metrics.record_violation(kind)
+        for callback in self.alert_callbacks:
+            try:
+                callback(alert)
+            except Exception as e:
+                logger.warning(f"Alert callback failed: {e}")
         
         # Set highlight (match with panel display time)
         if kind != "plate_read" and track_id >= 0:
-            self.violation_until[track_id] = now + self.violation_highlight_seconds
+            self.track_state.violation_until[self.track_state.slot(track_id, now)] = now + self.violation_highlight_seconds
         
         # Focus on wrong-way
         if kind == "wrong_way" and track_id >= 0:
             self.focus_track_id = track_id
             self.focus_until = now + 5.0
         
-        logger.info(f"Alert: {kind} by track {track_id} ({vehicle_class})")
+        logger.info(f"[{self.camera_id}] Alert: {kind} by track {track_id} ({vehicle_class})")
     
     def _ensure_ocr(self):
-        """Lazy load OCR reader."""
+        """Get the shared OCR reader (preloaded at startup, else built on first use)."""
         if self.ocr_reader is None:
             try:
-                import easyocr
-                self.ocr_reader = easyocr.Reader(['en'], gpu=False)
-                logger.info("OCR reader initialized")
+                self.ocr_reader = self.model_registry.ocr()
             except Exception as e:
                 logger.warning(f"Failed to initialize OCR: {e}")
     
-    def _try_read_plate(self, frame: np.ndarray, bbox: Tuple[int, int, int, int]) -> Optional[str]:
-        """Attempt to read license plate from vehicle crop."""
+    @staticmethod
+    def _run_on_crops(model: SharedModel, crops: List[np.ndarray]) -> List[Tuple[int, Any]]:
+        """(crop index, result) per crop. Models with dynamic shapes get one batched call per crop
+        size bucket; fixed-shape exports get one call per crop at their own input size.
+        """
+        if model.dynamic:
+            out = []
+            for size, idxs in size_buckets(crops).items():
+                out.extend(zip(idxs, model([crops[i] for i in idxs], verbose=False, imgsz=size)))
+            return out
+        kwargs = {"imgsz": model.input_size} if model.input_size else {}
+        return [(i, model(crop, verbose=False, **kwargs)[0]) for i, crop in enumerate(crops)]
+    
+    def _read_plates(self, veh_crops: List[np.ndarray]) -> List[Vote]:
+        """Detect the plate in each vehicle crop and OCR them: (text, OCR confidence) per crop.
+        
+        Runs on a secondary worker: plate-model calls batched by crop size where the model
+        allows it, one OCR batch.
+        """
+        votes: List[Vote] = [None] * len(veh_crops)
         if not self.plate_model:
-            return None
+            return votes
         
-        try:
-            x1, y1, x2, y2 = bbox
-            h, w = frame.shape[:2]
-            veh_crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
-            
-            if veh_crop.size == 0:
-                return None
-            
-            # Detect plate
-            pres = self.plate_model(veh_crop, verbose=False)[0]
+        plate_crops: List[np.ndarray] = []
+        owners: List[int] = []
+        for i, pres in self._run_on_crops(self.plate_model, veh_crops):
             if not pres.boxes or len(pres.boxes) == 0:
-                return None
-            
-            # Get best plate
+                continue
+            # Best plate of this vehicle
             idx = int(np.argmax(pres.boxes.conf.cpu().numpy()))
             px1, py1, px2, py2 = map(int, pres.boxes.xyxy.cpu().numpy()[idx])
-            plate_crop = veh_crop[max(0, py1):min(veh_crop.shape[0], py2), 
-                                  max(0, px1):min(veh_crop.shape[1], px2)]
-            
-            if plate_crop.size == 0:
-                return None
-            
-            # OCR
-            self._ensure_ocr()
-            if not self.ocr_reader:
-                return None
-            
-            ocr = self.ocr_reader.readtext(plate_crop)
+            veh_crop = veh_crops[i]
+            plate_crop = veh_crop[max(0, py1):min(veh_crop.shape[0], py2), max(0, px1):min(veh_crop.shape[1], px2)]
+            if plate_crop.size > 0:
+                plate_crops.append(plate_crop)
+                owners.append(i)
+        if not plate_crops:
+            return votes
+        
+        # OCR
+        self._ensure_ocr()
+        if not self.ocr_reader:
+            return votes
+        if len(plate_crops) > 1 and hasattr(self.ocr_reader, "readtext_batched"):
+            # Batched OCR resizes every plate to one shape
+            ocr_results = self.ocr_reader.readtext_batched(plate_crops, n_width=PLATE_OCR_SIZE[0], n_height=PLATE_OCR_SIZE[1])
+        else:
+            ocr_results = [self.ocr_reader.readtext(crop) for crop in plate_crops]
+        for i, ocr in zip(owners, ocr_results):
             if ocr:
-                text = sorted(ocr, key=lambda r: -r[2])[0][1]
-                return text.strip() if text else None
-        except Exception as e:
-            logger.debug(f"Plate read failed: {e}")
+                _, text, conf = sorted(ocr, key=lambda r: -r[2])[0]
+                text = text.strip() if text else ""
+                if text:
+                    votes[i] = (text, float(conf))
+        return votes
+    
+    def _check_helmets(self, head_crops: List[np.ndarray]) -> List[Vote]:
+        """Per head crop: (True if a rider has no helmet, box confidence), None if no head is found.
         
-        return None
+        Runs on a secondary worker, with helmet-model calls batched by crop size where the model
+        allows it.
+        """
+        votes: List[Vote] = [None] * len(head_crops)
+        for i, hres in self._run_on_crops(self.helmet_model, head_crops):
+            if not hres.boxes or len(hres.boxes) == 0:
+                continue
+            names_dict = hres.names
+            confs = hres.boxes.conf.cpu().numpy()
+            no_helmet = np.array([
+                "no-helmet" in names_dict[int(c)].lower() or "no_helmet" in names_dict[int(c)].lower()
+                for c in hres.boxes.cls.cpu().numpy().astype(int)
+            ], dtype=bool)
+            if no_helmet.any():
+                votes[i] = (True, float(confs[no_helmet].max()))
+            else:
+                votes[i] = (False, float(confs.max()))
+        return votes
     
-    def _run_loop(self):
-        """Main processing loop."""
-        assert self.cap is not None
+    def _detect(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Run the detector and return allowed-class boxes, confidences and class ids in frame coordinates."""
+        # Optionally look only at the road region
+        offset_x, offset_y = 0, 0
+        if self.roi.roi_crop:
+            h, w = frame.shape[:2]
+            if self._crop_region is None or self._crop_region[0] != (w, h):
+                self._crop_region = ((w, h), detection_region(self.roi, w, h))
+                if self._crop_region[1]:
+                    x1, y1, x2, y2 = self._crop_region[1]
+                    logger.info(f"[{self.camera_id}] Detection region {x2 - x1}x{y2 - y1} of {w}x{h}")
+            region = self._crop_region[1]
+            if region is not None:
+                offset_x, offset_y, x2, y2 = region
+                frame = frame[offset_y:y2, offset_x:x2]
         
-        stop_line_px = None
-        lane_polys_px: List[List[Tuple[int, int]]] = []
-        lane_contours: List[np.ndarray] = []
-        fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
-        frame_idx = 0
+        size = self.quality.level.inference_size if self.quality else self.roi.inference_size
+        if self.inference.fixed_input_size:
+            # Static-shape exported graphs accept only their export size
+            size = self.inference.fixed_input_size
+        elif not size and self.roi.detector_backend != "pytorch":
+            # Exported backends expect letterboxed squares
+            size = 640
+        if size:
+            # Letterbox once into a preallocated buffer at the configured detector resolution
+            if self.letterbox is None or self.letterbox.size != stride_aligned(size):
+                self.letterbox = Letterbox(size)
+            boxes, conf, cls = self.inference.infer(self.letterbox.apply(frame), imgsz=self.letterbox.size)
+        else:
+            boxes, conf, cls = self.inference.infer(frame)
         
-        logger.info("Processing loop started")
+        # Class filtering already happened inside the detector
+        if boxes.shape[0] == 0:
+            return boxes, conf, cls
+        if size:
+            boxes = self.letterbox.to_source(boxes)
+        if offset_x or offset_y:
+            boxes[:, [0, 2]] += offset_x
+            boxes[:, [1, 3]] += offset_y
+        return boxes, conf, cls
+    
+    def _class_lookup(self, names: set) -> np.ndarray:
+        """Boolean array indexed by class id: whether the class name is in names."""
+        lookup = np.zeros(max(self.class_names, default=-1) + 2, dtype=bool)
+        for cid, name in self.class_names.items():
+            lookup[cid] = name in names
+        return lookup
+    
+    def _evaluate_tracks(
+        self,
+        frame: np.ndarray,
+        tracked: sv.Detections,
+        stop_line_px: Optional[Tuple[Tuple[int, int], Tuple[int, int]]],
+        lane_raster: Optional[np.ndarray],
+    ):
+        """Run violation rules and secondary models for every tracked object."""
+        h, w = frame.shape[:2]
+        now = self.media_ts
+        n = len(tracked)
+        if n == 0:
+            return
         
-        while self.running and self.cap and self.cap.isOpened():
-            frame_start = time.time()
-            
-            ret, frame = self.cap.read()
-            if not ret:
-                logger.warning("Failed to read frame, stopping")
-                break
-            
-            frame_idx += 1
-            h, w = frame.shape[:2]
-            
-            # Initialize ROIs once
-            if stop_line_px is None:
-                stop_line_px = denormalize_points(self.roi.stop_line, w, h) if self.roi.stop_line else None
-                lane_polys_px = [denormalize_points(poly, w, h) for poly in self.roi.lanes]
-                lane_contours = [np.array(poly, dtype=np.int32).reshape((-1, 1, 2)) for poly in lane_polys_px]
-                
-                # Speed calibration
-                if self.roi.speed_calib_points and self.roi.speed_calib_distance_m:
-                    (ax, ay), (bx, by) = self.roi.speed_calib_points
-                    p1 = (ax * w, ay * h)
-                    p2 = (bx * w, by * h)
-                    px_dist = ((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2) ** 0.5
-                    if px_dist > 1e-3:
-                        self.m_per_px = float(self.roi.speed_calib_distance_m) / px_dist
-                        logger.info(f"Speed calibration: {self.m_per_px:.4f} m/px")
-                
-                # Lane directions setup
-                if self.roi.lane_directions:
-                    # Static directions
-                    for d in self.roi.lane_directions:
-                        (x1, y1), (x2, y2) = (int(d[0][0] * w), int(d[0][1] * h)), (int(d[1][0] * w), int(d[1][1] * h))
-                        vx, vy = (x2 - x1), (y2 - y1)
-                        norm = (vx*vx + vy*vy) ** 0.5
-                        if norm > 1e-6:
-                            self.lane_dirs_unit.append((vx / norm, vy / norm))
-                        else:
-                            self.lane_dirs_unit.append((0.0, 0.0))
-                    logger.info(f"Using {len(self.lane_dirs_unit)} static lane directions")
-                elif self.roi.auto_lane_direction:
-                    # Auto learning
-                    self.lane_dir_samples = [deque(maxlen=600) for _ in lane_contours]
-                    self.lane_dirs_unit = [(0.0, 0.0) for _ in lane_contours]
-                    logger.info(f"Auto lane direction learning enabled for {len(lane_contours)} lanes")
-            
-            # Inference
-            results = self.model(frame, verbose=False)[0]
-            boxes = results.boxes.xyxy.cpu().numpy() if results.boxes is not None else np.zeros((0, 4))
-            conf = results.boxes.conf.cpu().numpy() if results.boxes is not None else np.zeros((0,))
-            cls = results.boxes.cls.cpu().numpy().astype(int) if results.boxes is not None else np.zeros((0,), dtype=int)
-            class_names = [results.names[int(c)] for c in cls]
-            
-            mask = np.array([name in ALLOWED_CLASS_NAMES for name in class_names], dtype=bool)
-            if mask.size == 0:
-                boxes = np.zeros((0, 4))
-                conf = np.zeros((0,))
-                cls = np.zeros((0,), dtype=int)
+        track_ids = tracked.tracker_id.astype(int) if tracked.tracker_id is not None else np.full(n, -1)
+        class_ids = tracked.class_id.astype(int) if tracked.class_id is not None else np.full(n, -1)
+        class_ids = np.where(class_ids < len(self._vehicle_classes) - 1, class_ids, -1)
+        vehicle = self._vehicle_classes[class_ids]
+        boxes = tracked.xyxy.astype(int)
+        centers = (tracked.xyxy[:, :2] + tracked.xyxy[:, 2:]) / 2
+        lane_ids = lookup_lanes(lane_raster, centers) if lane_raster is not None else np.full(n, -1)
+        slots = self.track_state.touch(track_ids, now)
+        
+        prev_centers = self.track_state.last_pos[slots]
+        has_prev = self.track_state.has_last[slots]
+        velocities, velocity_valid, step_dist, step_dt = self._update_kinematics(
+            slots, centers, lane_ids >= 0, now
+        )
+        learner = self.lane_learner
+        hits = evaluate_rules(
+            FrameTracks(
+                centers=centers,
+                prev_centers=prev_centers,
+                has_prev=has_prev,
+                lane_ids=lane_ids,
+                vehicle=vehicle,
+                velocities=velocities,
+                velocity_valid=velocity_valid,
+                step_dist=step_dist,
+                step_dt=step_dt,
+                wrong_way_counts=self.track_state.wrong_way[slots],
+            ),
+            red_signal=self.signal_state == "red",
+            stop_line=stop_line_px,
+            lanes_configured=lane_raster is not None,
+            lane_dirs=self.lane_dirs_unit,
+            m_per_px=self.m_per_px,
+            speed_limit_kmh=self.roi.speed_limit_kmh,
+            learn_directions=learner is not None,
+            learn_slots=learner.lanes if learner is not None else 0,
+        )
+        self.track_state.wrong_way[slots] = hits.wrong_way_counts
+        
+        # Auto lane direction sampling (vehicles only for robustness)
+        sample = hits.lane_sample
+        if learner is not None and sample.any():
+            learner.update(lane_ids[sample], velocities[sample] / hits.speed_pxps[sample, None])
+        
+        def info_for(i: int, info: Dict) -> Dict:
+            plate = self.attributes.value(int(slots[i]), "plate")
+            if plate:
+                info["plate"] = plate
+            return info
+        
+        def emit(kind: str, i: int, info: Dict):
+            bbox = tuple(boxes[i].tolist())
+            self._emit_alert(kind, int(track_ids[i]), info, frame, bbox, self.class_names.get(int(class_ids[i]), "obj"))
+        
+        # Emit alerts only for the tracks whose rule mask is set
+        for i in np.flatnonzero(hits.red_light):
+            cx, cy = int(centers[i, 0]), int(centers[i, 1])
+            info = info_for(i, {"cx": cx, "cy": cy, "crossing": int(hits.crossing_dir[i])})
+            emit("red_light_violation", i, info)
+            self._put_label(frame, "RED LIGHT", (cx, max(0, cy - 12)), 0.6, (0, 0, 255))
+        
+        for i in np.flatnonzero(hits.wrong_way):
+            cx, cy = float(centers[i, 0]), float(centers[i, 1])
+            info = info_for(i, {"lane": int(lane_ids[i]), "speed_pxps": round(float(hits.speed_pxps[i]), 1)})
+            emit("wrong_way", i, info)
+            self._put_label(frame, "WRONG WAY", (int(cx), max(0, int(cy) - 44)), 0.7, (0, 0, 255))
+            if self.annotate:
+                vx, vy = velocities[i]
+                cv2.arrowedLine(frame, (int(cx - vx * 0.2), int(cy - vy * 0.2)), (int(cx), int(cy)), (0, 0, 255), 2, tipLength=0.4)
+        
+        for i in np.flatnonzero(hits.lane_violation):
+            cx, cy = int(centers[i, 0]), int(centers[i, 1])
+            emit("lane_violation", i, info_for(i, {"cx": cx, "cy": cy}))
+            self._put_label(frame, "LANE VIOLATION", (cx, min(h - 4, cy + 16)), 0.6, (0, 165, 255))
+        
+        for i in np.flatnonzero(hits.speeding):
+            kmh = float(hits.speed_kmh[i])
+            cx, cy = int(centers[i, 0]), int(centers[i, 1])
+            emit("speeding", i, info_for(i, {"speed_kmh": round(kmh, 1)}))
+            self._put_label(frame, f"SPEED {kmh:.0f}", (cx, max(0, cy - 28)), 0.6, (255, 0, 0))
+        
+        # Secondary models run in the background, on a few of the best crops of each track
+        if self.secondary is not None:
+            if self.helmet_model:
+                for i in np.flatnonzero(self._two_wheeler_classes[class_ids]).tolist():
+                    x1, y1, x2, y2 = boxes[i].tolist()
+                    head_crop = frame[max(0, y1):int(y1 + (y2 - y1) * 0.4), max(0, x1):min(w, x2)]
+                    self._submit_attribute("helmet", int(slots[i]), int(track_ids[i]), head_crop)
+            if self.plate_model:
+                for i in np.flatnonzero(vehicle).tolist():
+                    x1, y1, x2, y2 = boxes[i].tolist()
+                    veh_crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
+                    self._submit_attribute("plate", int(slots[i]), int(track_ids[i]), veh_crop)
+    
+    def _submit_attribute(self, kind: str, slot: int, track_id: int, crop: np.ndarray):
+        """Queue crop for a secondary model if the attribute is open and the crop beats earlier ones."""
+        if crop.size == 0 or not self.attributes.wants(slot, kind):
+            return
+        score = crop_quality(crop)
+        if self.attributes.better(slot, kind, score) and self.secondary.submit(kind, track_id, crop):
+            self.attributes.started(slot, kind, score)
+    
+    def _apply_secondary_results(self, frame: np.ndarray, tracked: sv.Detections):
+        """Vote finished results into the track attributes; report plates and helmets once final."""
+        results = self.secondary.poll()
+        if not results:
+            return
+        h = frame.shape[0]
+        current = {}
+        if tracked.tracker_id is not None:
+            current = {int(t): i for i, t in enumerate(tracked.tracker_id)}
+        
+        for res in results:
+            slot = int(self.track_state.lookup(np.array([res.track_id]))[0])
+            if slot < 0:
+                # Track expired while the model ran
+                continue
+            final, value = self.attributes.add_result(slot, res.kind, res.value)
+            if not final or not value:
+                continue
+            i = current.get(res.track_id)
+            bbox = tuple(map(int, tracked.xyxy[i])) if i is not None else None
+            cid = int(tracked.class_id[i]) if i is not None and tracked.class_id is not None else -1
+            name = self.class_names.get(cid, "obj")
+            
+            if res.kind == "plate":
+                logger.info(f"Plate read for track {res.track_id}: {value}")
+                self._emit_alert("plate_read", res.track_id, {"text": value})
+                if bbox is not None:
+                    self._put_label(frame, value, (bbox[0], min(h - 4, bbox[3] + 18)), 0.6, (50, 200, 50))
+            elif res.kind == "helmet":
+                info = {}
+                plate = self.attributes.value(slot, "plate")
+                if plate:
+                    info["plate"] = plate
+                # Evidence uses the current frame; the track may have left it already
+                self._emit_alert("no_helmet", res.track_id, info, frame if bbox else None, bbox, name)
+                if bbox is not None:
+                    self._put_label(frame, "NO HELMET", (bbox[0], max(0, bbox[1] - 8)), 0.6, (0, 0, 255))
+    
+    def _update_kinematics(
+        self,
+        slots: np.ndarray,
+        centers: np.ndarray,
+        in_lane: np.ndarray,
+        now: float,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Update per-track history and return velocities, their validity, and the last step distance/time."""
+        n = len(slots)
+        velocities = np.zeros((n, 2))
+        velocity_valid = np.zeros(n, dtype=bool)
+        
+        # Lane history (for direction) is only kept while the track is inside a lane
+        lane_slots = slots[in_lane]
+        self.track_state.push_history(lane_slots, centers[in_lane], now)
+        velocities[in_lane], velocity_valid[in_lane] = self.track_state.history_velocity(lane_slots)
+        
+        # Previous position (stop-line crossing) and speed step, kept for every track
+        step_dist, step_dt = self.track_state.step(slots, centers, now, MIN_STEP_SECONDS)
+        return velocities, velocity_valid, step_dist, step_dt
+    
+    def _put_label(self, frame: np.ndarray, text: str, org: Tuple[int, int], scale: float, color: Tuple[int, int, int]):
+        """Draw a rule label on the frame (skipped when annotation is off)."""
+        if self.annotate:
+            cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+    
+    def open_pipeline(self):
+        """Acquire the shared detector and reset per-run state.
+        
+        start() calls this for live sources; offline runners call it directly and then feed
+        frames to process_frame().
+        """
+        if self.inference is None:
+            self.inference = self.model_registry.batched(
+                self.roi.detector_backend,
+                self.roi.detector_model_path,
+                ALLOWED_CLASS_NAMES,
+                self.roi.detector_conf,
+            )
+            self.inference.register()
+            self.class_names = self.inference.names
+            self._vehicle_classes = self._class_lookup(VEHICLE_CLASS_NAMES)
+            self._two_wheeler_classes = self._class_lookup(TWO_WHEELER_CLASS_NAMES)
+        
+        self.motion_gate = None
+        if self.roi.motion_gate:
+            self.motion_gate = MotionGate(
+                self.roi.lanes,
+                threshold=self.roi.motion_threshold,
+                hold_frames=self.roi.motion_hold_frames,
+            )
+        
+        self.quality = None
+        if self.roi.latency_target_ms:
+            self.quality = QualityController(
+                self.roi.latency_target_ms,
+                base_size=self.roi.inference_size or 640,
+                min_size=self.roi.quality_min_inference_size,
+                max_stride=self.roi.quality_max_stride,
+            )
+        
+        self.frame_idx = 0
+        self.media_ts = 0.0
+        self._frame_size = None
+        self._stop_line_px = None
+        self._lane_contours = []
+        self._lane_raster = None
+        self._geometry_roi = None
+        self._tracked = sv.Detections.empty()
+        self._conf = np.zeros((0,))
+        
+        if self.secondary is None and (self.helmet_model or self.plate_model):
+            handlers = {}
+            if self.plate_model:
+                handlers["plate"] = self._read_plates
+            if self.helmet_model:
+                handlers["helmet"] = self._check_helmets
+            self.secondary = SecondaryWorkerPool(
+                handlers,
+                workers=self.roi.secondary_workers,
+                queue_size=self.roi.secondary_queue_size,
+                max_batch=self.roi.secondary_max_batch,
+                block=self.block_secondary,
+            )
+            self.secondary.start()
+        
+        # Auto lane directions, warm-started from the last run of this camera
+        self.lane_learner = None
+        self.lane_dirs_unit = np.zeros((0, 2))
+        if self.roi.auto_lane_direction and not self.roi.lane_directions and self.roi.lanes:
+            path = lane_state_path(self.camera_id) if self.persist_lane_state else None
+            self.lane_learner, restored = load_learner(path, self.roi.lanes)
+            self.auto_learning_complete = restored
+            if restored:
+                logger.info(f"[{self.camera_id}] Restored lane directions from {path}")
             else:
-                boxes = boxes[mask]
-                conf = conf[mask]
-                cls = cls[mask]
+                logger.info(f"Auto lane direction learning enabled for {len(self.roi.lanes)} lanes")
+    
+    def drain_secondary(self, frame: np.ndarray, timeout: Optional[float] = None):
+        """Wait for queued secondary-model work and apply its results to the last processed frame.
+
+        Offline runners call this before close_pipeline(), which drops whatever is still queued.
+        """
+        if self.secondary is None:
+            return
+        if not self.secondary.drain(timeout):
+            logger.warning(f"[{self.camera_id}] Secondary models did not finish within {timeout}s")
+        self._apply_secondary_results(frame, self._tracked)
+    
+    def close_pipeline(self):
+        """Release the shared detector acquired by open_pipeline()."""
+        self._save_lane_state()
+        if self.secondary is not None:
+            self.secondary.stop()
+            self.secondary = None
+        if self.inference:
+            self.inference.unregister()
+            self.inference = None
+    
+    def _save_lane_state(self):
+        if self.lane_learner is None or not self.persist_lane_state or not self.lane_learner.counts.any():
+            return
+        try:
+            self.lane_learner.save(lane_state_path(self.camera_id), self.roi.lanes)
+        except Exception as e:
+            logger.warning(f"[{self.camera_id}] Failed to save lane directions: {e}")
+    
+    def process_frame(self, frame: np.ndarray, media_ts: Optional[float] = None) -> Dict:
+        """Run detection, tracking and the rules on one frame; returns per-frame stats.
+        
+        media_ts is the frame's timestamp in seconds on the source timeline (defaults to now).
+        Speeds, track histories, cooldowns and highlights all run on this clock, so files give
+        the same results whether they are processed faster or slower than real time.
+        The frame is annotated in place when self.annotate is set.
+        """
+        frame_start = time.time()
+        self.media_ts = frame_start if media_ts is None else media_ts
+        self.frame_idx += 1
+        frame_idx = self.frame_idx
+        h, w = frame.shape[:2]
+        alerts_before = self._alert_count
+        
+        # Initialize ROIs once per frame size (and again if the ROI config is replaced)
+        if (w, h) != self._frame_size or self.roi is not self._geometry_roi:
+            self._frame_size = (w, h)
+            self._geometry_roi = self.roi
+            self._stop_line_px = denormalize_points(self.roi.stop_line, w, h) if self.roi.stop_line else None
+            lane_polys_px = [denormalize_points(poly, w, h) for poly in self.roi.lanes]
+            self._lane_contours = [np.array(poly, dtype=np.int32).reshape((-1, 1, 2)) for poly in lane_polys_px]
+            self._lane_raster = rasterize_lanes(self.roi.lanes, w, h)
+            
+            # Speed calibration
+            if self.roi.speed_calib_points and self.roi.speed_calib_distance_m:
+                (ax, ay), (bx, by) = self.roi.speed_calib_points
+                p1 = (ax * w, ay * h)
+                p2 = (bx * w, by * h)
+                px_dist = ((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2) ** 0.5
+                if px_dist > 1e-3:
+                    self.m_per_px = float(self.roi.speed_calib_distance_m) / px_dist
+                    logger.info(f"Speed calibration: {self.m_per_px:.4f} m/px")
+            
+            # Lane directions setup
+            if self.roi.lane_directions:
+                # Static directions
+                dirs = []
+                for d in self.roi.lane_directions:
+                    (x1, y1), (x2, y2) = (int(d[0][0] * w), int(d[0][1] * h)), (int(d[1][0] * w), int(d[1][1] * h))
+                    vx, vy = (x2 - x1), (y2 - y1)
+                    norm = (vx*vx + vy*vy) ** 0.5
+                    if norm > 1e-6:
+                        dirs.append((vx / norm, vy / norm))
+                    else:
+                        dirs.append((0.0, 0.0))
+                self.lane_dirs_unit = np.array(dirs, dtype=np.float64).reshape(-1, 2)
+                logger.info(f"Using {len(self.lane_dirs_unit)} static lane directions")
+        
+        # Inference (under load only every `stride` frames; skipped frames keep the last tracks)
+        run_detection = self.quality is None or frame_idx % self.quality.level.stride == 0
+        detections_count = 0
+        if run_detection:
+            if self.motion_gate is not None and not self.motion_gate.check(frame):
+                # Idle scene: the tracker still runs, with no detections
+                boxes, conf, cls = np.zeros((0, 4)), np.zeros((0,)), np.zeros((0,), dtype=int)
+            else:
+                boxes, conf, cls = self._detect(frame)
+            detections_count = len(boxes)
             
             detections = sv.Detections(xyxy=boxes, confidence=conf, class_id=cls)
             detections.tracker_id = None
-            tracked = self.tracker.update_with_detections(detections)
-            
+            self._tracked = self.tracker.update_with_detections(detections)
+            self._conf = conf
+        tracked = self._tracked
+        stop_line_px = self._stop_line_px
+        lane_contours = self._lane_contours
+        
+        if self.annotate:
             # Draw ROIs
             if stop_line_px is not None:
                 pt1, pt2 = stop_line_px
@@ -340,343 +800,215 @@ class VideoProcessorV2:
             if self.roi.auto_lane_direction and not self.auto_learning_complete:
                 warmup_progress = min(100, int(100 * frame_idx / self.roi.auto_lane_warmup_frames))
                 cv2.putText(frame, f"Learning: {warmup_progress}%", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-            
-            now = time.time()
-            
-            # Process each tracked object
+        
+        if run_detection:
+            self._evaluate_tracks(frame, tracked, stop_line_px, self._lane_raster)
+        if self.secondary is not None:
+            self._apply_secondary_results(frame, tracked)
+        self.track_state.evict_expired(self.media_ts)
+        
+        # Auto lane directions (a restored state is trusted without a new warm-up)
+        if self.lane_learner is not None:
+            if not self.auto_learning_complete and frame_idx >= self.roi.auto_lane_warmup_frames:
+                self.auto_learning_complete = True
+                logger.info("Auto lane direction learning complete")
+            if self.auto_learning_complete:
+                self.lane_dirs_unit = self.lane_learner.directions()
+            if frame_idx % LANE_STATE_SAVE_FRAMES == 0:
+                self._save_lane_state()
+        
+        if self.annotate:
+            frame = self._annotate_frame(frame, tracked, self._conf)
+        
+        # Metrics
+        frame_time = time.time() - frame_start
+        self.metrics.record_frame(frame_time, len(tracked))
+        
+        if self.annotate:
+            # FPS overlay
+            metrics = self.metrics.get_metrics()
+            cv2.putText(frame, f"FPS: {metrics['fps']:.1f}", (w - 150, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        
+        return {
+            "frame": frame_idx,
+            "detector_ran": run_detection,
+            "detections": detections_count,
+            "tracks": len(tracked),
+            "alerts": self._alert_count - alerts_before,
+            "process_ms": round(frame_time * 1000, 2),
+        }
+    
+    def _annotate_frame(self, frame: np.ndarray, tracked: sv.Detections, conf: np.ndarray) -> np.ndarray:
+        """Draw boxes, labels, violation highlights and the violator picture-in-picture."""
+        h, w = frame.shape[:2]
+        
+        # Annotate boxes
+        labels = []
+        for i in range(len(tracked)):
+            cid = int(tracked.class_id[i]) if tracked.class_id is not None else -1
+            conf_i = float(conf[i]) if i < len(conf) else 0.0
+            labels.append(f"{self.class_names.get(cid, 'obj')} {conf_i:.2f}")
+        
+        frame = self.box_annotator.annotate(scene=frame, detections=tracked)
+        frame = self.label_annotator.annotate(scene=frame, detections=tracked, labels=labels)
+        
+        # Overlay VIOLATED on recent violators with red circle
+        now2 = self.media_ts
+        if tracked.tracker_id is not None:
+            slots = self.track_state.lookup(tracked.tracker_id.astype(int))
+            highlighted = (slots >= 0) & (self.track_state.violation_until[slots] > now2)
+        else:
+            highlighted = np.zeros(len(tracked), dtype=bool)
+        for i in np.flatnonzero(highlighted):
+            x1, y1, x2, y2 = map(int, tracked.xyxy[i])
+            # Draw red circle around violator
+            center_x = (x1 + x2) // 2
+            center_y = (y1 + y2) // 2
+            radius = max(abs(x2 - x1), abs(y2 - y1)) // 2 + 20
+            cv2.circle(frame, (center_x, center_y), radius, (0, 0, 255), 4)
+            # Red rectangle
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
+            # "VIOLATED" label
+            cv2.putText(frame, "VIOLATED", (x1, max(0, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        
+        # Enhanced zoom + focus for violated objects (Picture-in-Picture)
+        if self.focus_track_id and self.focus_until > now2 and tracked.tracker_id is not None:
+            focus_bbox = None
+            focus_class = "obj"
             for i in range(len(tracked)):
-                xyxy = tracked.xyxy[i]
-                track_id = int(tracked.tracker_id[i]) if tracked.tracker_id is not None else -1
-                cid = int(tracked.class_id[i]) if tracked.class_id is not None else -1
-                name = results.names.get(cid, "obj")
-                
-                cx = float((xyxy[0] + xyxy[2]) / 2)
-                cy = float((xyxy[1] + xyxy[3]) / 2)
-                bbox_tuple = tuple(map(int, xyxy))
-                
-                # Try to read plate for vehicles (on first detection)
-                plate_number = None
-                if name in VEHICLE_CLASS_NAMES and track_id not in self.track_last:
-                    plate_number = self._try_read_plate(frame, bbox_tuple)
-                    if plate_number:
-                        logger.info(f"Plate read for track {track_id}: {plate_number}")
-                
-                # Red-light violation
-                if self.signal_state == "red" and stop_line_px is not None:
-                    p = np.array([int(cx), int(cy)], dtype=np.int32)
-                    if _point_crossed_line(p, stop_line_px):
-                        info = {"cx": int(cx), "cy": int(cy)}
-                        if plate_number:
-                            info["plate"] = plate_number
-                        self._emit_alert("red_light_violation", track_id, info, frame, bbox_tuple, name)
-                        cv2.putText(frame, "RED LIGHT", (int(cx), max(0, int(cy) - 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                
-                # Lane containment + wrong-way
-                lane_index = -1
-                for idx, cnt in enumerate(lane_contours):
-                    if cv2.pointPolygonTest(cnt, (cx, cy), False) >= 0:
-                        lane_index = idx
-                        break
-                
-                if lane_index == -1:
-                    self.wrong_way_counter[track_id] = 0
-                else:
-                    # Maintain track history
-                    hist = self.track_history.get(track_id)
-                    if hist is None:
-                        hist = deque(maxlen=12)
-                        self.track_history[track_id] = hist
-                    hist.append((now, (cx, cy)))
-                    
-                    # Compute velocity
-                    if len(hist) >= 4:
-                        t0, (x0, y0) = hist[0]
-                        tn, (xn, yn) = hist[-1]
-                        dt = tn - t0
-                        if dt > 0.1:
-                            vx = (xn - x0) / dt
-                            vy = (yn - y0) / dt
-                            speed_pxps = (vx*vx + vy*vy) ** 0.5
-                            
-                            # Auto lane direction sampling (vehicles only for robustness)
-                            if (self.roi.auto_lane_direction and 
-                                len(self.roi.lane_directions) == 0 and
-                                name in VEHICLE_CLASS_NAMES and
-                                speed_pxps >= 30.0 and
-                                lane_index < len(self.lane_dir_samples)):
-                                mag = (vx*vx + vy*vy) ** 0.5
-                                if mag > 1e-6:
-                                    self.lane_dir_samples[lane_index].append((vx/mag, vy/mag))
-                            
-                            # Wrong-way check
-                            if lane_index < len(self.lane_dirs_unit):
-                                dx, dy = self.lane_dirs_unit[lane_index]
-                                dot = vx * dx + vy * dy
-                                speed_min = 30.0
-                                
-                                if speed_pxps >= speed_min and dot < -0.5 * speed_pxps:
-                                    self.wrong_way_counter[track_id] = self.wrong_way_counter.get(track_id, 0) + 1
-                                else:
-                                    self.wrong_way_counter[track_id] = 0
-                                
-                                if self.wrong_way_counter.get(track_id, 0) >= 10:
-                                    info = {"lane": lane_index, "speed_pxps": round(speed_pxps, 1)}
-                                    if plate_number:
-                                        info["plate"] = plate_number
-                                    self._emit_alert("wrong_way", track_id, info, frame, bbox_tuple, name)
-                                    cv2.putText(frame, "WRONG WAY", (int(cx), max(0, int(cy) - 44)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                                    x_prev = int(xn - vx * 0.2)
-                                    y_prev = int(yn - vy * 0.2)
-                                    cv2.arrowedLine(frame, (x_prev, y_prev), (int(xn), int(yn)), (0, 0, 255), 2, tipLength=0.4)
-                
-                # Lane violation (outside all lanes)
-                if lane_contours and lane_index == -1:
-                    inside_any = any(cv2.pointPolygonTest(cnt, (cx, cy), False) >= 0 for cnt in lane_contours)
-                    if not inside_any:
-                        info = {"cx": int(cx), "cy": int(cy)}
-                        if plate_number:
-                            info["plate"] = plate_number
-                        self._emit_alert("lane_violation", track_id, info, frame, bbox_tuple, name)
-                        cv2.putText(frame, "LANE VIOLATION", (int(cx), min(h - 4, int(cy) + 16)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 2)
-                
-                # Speed check
-                if self.m_per_px and self.roi.speed_limit_kmh:
-                    prev = self.track_last.get(track_id)
-                    if prev:
-                        prev_t, (px, py) = prev
-                        dt = now - prev_t
-                        if dt > 0.05:
-                            dp = ((cx - px)**2 + (cy - py)**2) ** 0.5
-                            kmh = (dp * self.m_per_px / dt) * 3.6
-                            if kmh > self.roi.speed_limit_kmh:
-                                info = {"speed_kmh": round(kmh, 1)}
-                                if plate_number:
-                                    info["plate"] = plate_number
-                                self._emit_alert("speeding", track_id, info, frame, bbox_tuple, name)
-                                cv2.putText(frame, f"SPEED {kmh:.0f}", (int(cx), max(0, int(cy) - 28)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-                    self.track_last[track_id] = (now, (cx, cy))
-                
-                # Helmet check (optional)
-                if self.helmet_model and name in {"motorcycle", "bicycle"} and (frame_idx % 5 == 0):
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    head_crop = frame[max(0, y1):int(y1 + (y2-y1)*0.4), max(0, x1):min(w, x2)]
-                    if head_crop.size > 0:
-                        try:
-                            hres = self.helmet_model(head_crop, verbose=False)[0]
-                            names_dict = hres.names
-                            labels = [names_dict[int(c)] for c in (hres.boxes.cls.cpu().numpy().astype(int) if hres.boxes else [])]
-                            if any("no-helmet" in l.lower() or "no_helmet" in l.lower() for l in labels):
-                                info = {}
-                                if plate_number:
-                                    info["plate"] = plate_number
-                                self._emit_alert("no_helmet", track_id, info, frame, bbox_tuple, name)
-                                cv2.putText(frame, "NO HELMET", (x1, max(0, y1 - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                        except Exception:
-                            pass
-                
-                # Plate OCR (optional)
-                if self.plate_model and name in VEHICLE_CLASS_NAMES and (frame_idx % 7 == 0):
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    veh_crop = frame[max(0, y1):min(h, y2), max(0, x1):min(w, x2)]
-                    if veh_crop.size > 0:
-                        try:
-                            pres = self.plate_model(veh_crop, verbose=False)[0]
-                            if pres.boxes and len(pres.boxes) > 0:
-                                idx = int(np.argmax(pres.boxes.conf.cpu().numpy()))
-                                px1, py1, px2, py2 = map(int, pres.boxes.xyxy.cpu().numpy()[idx])
-                                plate_crop = veh_crop[max(0, py1):min(veh_crop.shape[0], py2), max(0, px1):min(veh_crop.shape[1], px2)]
-                                if plate_crop.size > 0:
-                                    self._ensure_ocr()
-                                    if self.ocr_reader:
-                                        try:
-                                            ocr = self.ocr_reader.readtext(plate_crop)
-                                            if ocr:
-                                                text = sorted(ocr, key=lambda r: -r[2])[0][1]
-                                                if text:
-                                                    self._emit_alert("plate_read", track_id, {"text": text})
-                                                    cv2.putText(frame, text, (x1, min(h - 4, y2 + 18)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (50, 200, 50), 2)
-                                        except Exception:
-                                            pass
-                        except Exception:
-                            pass
-            
-            # Auto lane direction update (median-based for robustness)
-            if (self.roi.auto_lane_direction and 
-                len(self.roi.lane_directions) == 0 and 
-                frame_idx % 60 == 0 and 
-                frame_idx >= self.roi.auto_lane_warmup_frames):
+                if int(tracked.tracker_id[i]) == self.focus_track_id:
+                    focus_bbox = tracked.xyxy[i]
+                    cid = int(tracked.class_id[i]) if tracked.class_id is not None else -1
+                    focus_class = self.class_names.get(cid, "obj")
+                    break
+            
+            if focus_bbox is not None:
+                x1, y1, x2, y2 = map(int, focus_bbox)
+                x1, y1 = max(0, x1), max(0, y1)
+                x2, y2 = min(w-1, x2), min(h-1, y2)
                 
-                for idx in range(len(lane_contours)):
-                    if idx < len(self.lane_dir_samples) and len(self.lane_dir_samples[idx]) >= 20:
-                        samples = np.array(self.lane_dir_samples[idx], dtype=np.float32)
-                        # Use median for robustness
-                        median_dir = np.median(samples, axis=0)
-                        norm = np.linalg.norm(median_dir) + 1e-6
-                        self.lane_dirs_unit[idx] = (float(median_dir[0]/norm), float(median_dir[1]/norm))
+                # Dim background
+                overlay = np.zeros_like(frame)
+                overlay[:] = (30, 30, 30)
+                mask = np.ones((h, w), dtype=np.float32) * 0.6
+                mask[y1:y2, x1:x2] = 1.0
+                mask = cv2.GaussianBlur(mask, (21, 21), 0)
                 
-                if not self.auto_learning_complete:
-                    self.auto_learning_complete = True
-                    logger.info("Auto lane direction learning complete")
-            
-            # Annotate boxes
-            labels = []
-            for i in range(len(tracked)):
-                cid = int(tracked.class_id[i]) if tracked.class_id is not None else -1
-                conf_i = float(conf[i]) if i < len(conf) else 0.0
-                labels.append(f"{results.names.get(cid, 'obj')} {conf_i:.2f}")
-            
-            frame = self.box_annotator.annotate(scene=frame, detections=tracked)
-            frame = self.label_annotator.annotate(scene=frame, detections=tracked, labels=labels)
-            
-            # Overlay VIOLATED on recent violators with red circle
-            now2 = time.time()
-            for i in range(len(tracked)):
-                if tracked.tracker_id is None:
-                    continue
-                tid = int(tracked.tracker_id[i])
-                if self.violation_until.get(tid, 0) > now2:
-                    x1, y1, x2, y2 = map(int, tracked.xyxy[i])
-                    # Draw red circle around violator
-                    center_x = (x1 + x2) // 2
-                    center_y = (y1 + y2) // 2
-                    radius = max(abs(x2 - x1), abs(y2 - y1)) // 2 + 20
-                    cv2.circle(frame, (center_x, center_y), radius, (0, 0, 255), 4)
-                    # Red rectangle
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
-                    # "VIOLATED" label
-                    cv2.putText(frame, "VIOLATED", (x1, max(0, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            
-            # Enhanced zoom + focus for violated objects (Picture-in-Picture)
-            if self.focus_track_id and self.focus_until > now2 and tracked.tracker_id is not None:
-                focus_bbox = None
-                focus_class = "obj"
-                for i in range(len(tracked)):
-                    if int(tracked.tracker_id[i]) == self.focus_track_id:
-                        focus_bbox = tracked.xyxy[i]
-                        cid = int(tracked.class_id[i]) if tracked.class_id is not None else -1
-                        focus_class = results.names.get(cid, "obj")
-                        break
+                for c in range(3):
+                    frame[:, :, c] = (frame[:, :, c] * mask + overlay[:, :, c] * (1 - mask)).astype(np.uint8)
                 
-                if focus_bbox is not None:
-                    x1, y1, x2, y2 = map(int, focus_bbox)
-                    x1, y1 = max(0, x1), max(0, y1)
-                    x2, y2 = min(w-1, x2), min(h-1, y2)
-                    
-                    # Dim background
-                    overlay = np.zeros_like(frame)
-                    overlay[:] = (30, 30, 30)
-                    mask = np.ones((h, w), dtype=np.float32) * 0.6
-                    mask[y1:y2, x1:x2] = 1.0
-                    mask = cv2.GaussianBlur(mask, (21, 21), 0)
-                    
-                    for c in range(3):
-                        frame[:, :, c] = (frame[:, :, c] * mask + overlay[:, :, c] * (1 - mask)).astype(np.uint8)
+                # Extract violator crop and create zoomed PIP
+                crop = frame[y1:y2, x1:x2].copy()
+                if crop.size > 0:
+                    # Zoom 3x
+                    crop_h, crop_w = crop.shape[:2]
+                    zoom_scale = 3.0
+                    zoomed_w = min(int(crop_w * zoom_scale), w // 2)
+                    zoomed_h = min(int(crop_h * zoom_scale), h // 2)
                     
-                    # Extract violator crop and create zoomed PIP
-                    crop = frame[y1:y2, x1:x2].copy()
-                    if crop.size > 0:
-                        # Zoom 3x
-                        crop_h, crop_w = crop.shape[:2]
-                        zoom_scale = 3.0
-                        zoomed_w = min(int(crop_w * zoom_scale), w // 2)
-                        zoomed_h = min(int(crop_h * zoom_scale), h // 2)
+                    if zoomed_w > 0 and zoomed_h > 0:
+                        zoomed = cv2.resize(crop, (zoomed_w, zoomed_h), interpolation=cv2.INTER_LINEAR)
                         
-                        if zoomed_w > 0 and zoomed_h > 0:
-                            zoomed = cv2.resize(crop, (zoomed_w, zoomed_h), interpolation=cv2.INTER_LINEAR)
-                            
-                            # Add thick red border to zoomed crop
-                            border_thickness = 8
-                            zoomed_bordered = cv2.copyMakeBorder(
-                                zoomed,
-                                border_thickness, border_thickness, border_thickness, border_thickness,
-                                cv2.BORDER_CONSTANT,
-                                value=(0, 0, 255)
+                        # Add thick red border to zoomed crop
+                        border_thickness = 8
+                        zoomed_bordered = cv2.copyMakeBorder(
+                            zoomed,
+                            border_thickness, border_thickness, border_thickness, border_thickness,
+                            cv2.BORDER_CONSTANT,
+                            value=(0, 0, 255)
+                        )
+                        
+                        # Position PIP in top-right corner
+                        pip_h, pip_w = zoomed_bordered.shape[:2]
+                        pip_x = w - pip_w - 20
+                        pip_y = 60
+                        
+                        # Ensure PIP fits in frame
+                        if pip_x > 0 and pip_y + pip_h < h:
+                            # Add semi-transparent background for PIP
+                            pip_bg = frame[pip_y:pip_y+pip_h, pip_x:pip_x+pip_w].copy()
+                            alpha = 0.95
+                            frame[pip_y:pip_y+pip_h, pip_x:pip_x+pip_w] = cv2.addWeighted(
+                                zoomed_bordered, alpha, pip_bg, 1-alpha, 0
                             )
                             
-                            # Position PIP in top-right corner
-                            pip_h, pip_w = zoomed_bordered.shape[:2]
-                            pip_x = w - pip_w - 20
-                            pip_y = 60
+                            # Add text banner above PIP
+                            banner_text = f"VIOLATOR #{self.focus_track_id} - {focus_class.upper()}"
+                            text_size = cv2.getTextSize(banner_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+                            text_x = pip_x + (pip_w - text_size[0]) // 2
+                            text_y = pip_y - 10
                             
-                            # Ensure PIP fits in frame
-                            if pip_x > 0 and pip_y + pip_h < h:
-                                # Add semi-transparent background for PIP
-                                pip_bg = frame[pip_y:pip_y+pip_h, pip_x:pip_x+pip_w].copy()
-                                alpha = 0.95
-                                frame[pip_y:pip_y+pip_h, pip_x:pip_x+pip_w] = cv2.addWeighted(
-                                    zoomed_bordered, alpha, pip_bg, 1-alpha, 0
-                                )
-                                
-                                # Add text banner above PIP
-                                banner_text = f"VIOLATOR #{self.focus_track_id} - {focus_class.upper()}"
-                                text_size = cv2.getTextSize(banner_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-                                text_x = pip_x + (pip_w - text_size[0]) // 2
-                                text_y = pip_y - 10
-                                
-                                # Text background
-                                cv2.rectangle(frame, 
-                                            (text_x - 8, text_y - text_size[1] - 6),
-                                            (text_x + text_size[0] + 8, text_y + 6),
-                                            (0, 0, 255), -1)
-                                cv2.putText(frame, banner_text, (text_x, text_y), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    
-                    # Red border on original location
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 5)
-                    cv2.putText(frame, "FOCUS", (x1, max(0, y1 - 24)), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                            # Text background
+                            cv2.rectangle(frame, 
+                                        (text_x - 8, text_y - text_size[1] - 6),
+                                        (text_x + text_size[0] + 8, text_y + 6),
+                                        (0, 0, 255), -1)
+                            cv2.putText(frame, banner_text, (text_x, text_y), 
+                                      cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                
+                # Red border on original location
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 5)
+                cv2.putText(frame, "FOCUS", (x1, max(0, y1 - 24)), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        
+        return frame
+    
+    def _run_loop(self):
+        """Main processing loop."""
+        assert self.cap is not None and self.frame_buffer is not None
+        frame_buffer = self.frame_buffer
+        
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        playback_start: Optional[float] = None
+        
+        logger.info("Processing loop started")
+        
+        while self.running:
+            captured = frame_buffer.get(timeout=0.5)
+            if captured is None:
+                if frame_buffer.closed:
+                    logger.warning("Capture ended, stopping")
+                    break
+                continue
             
-            # Metrics
-            frame_time = time.time() - frame_start
-            self.metrics.record_frame(frame_time, len(tracked))
+            frame_start = time.time()
+            # File frames wait in the buffer by design: they are never stale and their latency
+            # starts at dequeue
+            if frame_buffer.policy == POLICY_BLOCK:
+                latency_origin = frame_start
+            else:
+                latency_origin = captured.capture_ts
+                if frame_start - captured.capture_ts > self.roi.stale_frame_seconds:
+                    self.metrics.record_stale_frame()
+            frame = captured.image
             
-            # FPS overlay
-            metrics = self.metrics.get_metrics()
-            cv2.putText(frame, f"FPS: {metrics['fps']:.1f}", (w - 150, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            self.process_frame(frame, captured.media_ts)
             
             with self.frame_lock:
                 self.last_frame = frame.copy()
-            
-            time.sleep(max(0.0, 1.0 / fps / 4))
+            self.stream.publish(self.last_frame)
+            for callback in self.frame_callbacks:
+                try:
+                    callback(frame)
+                except Exception as e:
+                    logger.warning(f"Frame callback failed: {e}")
+            
+            self.metrics.record_latency(time.time() - latency_origin)
+            if self.quality is not None:
+                self.quality.update(self.metrics)
+            
+            # Files play back at their own frame rate; live sources already wait on the buffer
+            if self.paced and frame_buffer.policy == POLICY_BLOCK:
+                now = time.time()
+                frame_idx = self.frame_idx
+                if playback_start is None or now - (playback_start + frame_idx / fps) > 1.0:
+                    playback_start = now - frame_idx / fps
+                delay = playback_start + frame_idx / fps - now
+                if delay > 0:
+                    time.sleep(delay)
         
         self.running = False
         logger.info("Processing loop ended")
     
     def mjpeg_generator(self):
-        """Generate MJPEG stream."""
-        boundary = b"--frame"
-        while True:
-            if not self.running and self.last_frame is None:
-                time.sleep(0.1)
-                continue
-            
-            with self.frame_lock:
-                frame = None if self.last_frame is None else self.last_frame.copy()
-            
-            if frame is None:
-                time.sleep(0.03)
-                continue
-            
-            ret, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-            if not ret:
-                continue
-            
-            jpg = buf.tobytes()
-            yield boundary + b"\r\n" + b"Content-Type: image/jpeg\r\n\r\n" + jpg + b"\r\n"
-
-
-def _point_crossed_line(p: np.ndarray, line: Tuple[Tuple[int, int], Tuple[int, int]]) -> bool:
-    """Check if point is near line segment."""
-    (x1, y1), (x2, y2) = line
-    px, py = p
-    vx, vy = x2 - x1, y2 - y1
-    wx, wy = px - x1, py - y1
-    c1 = vx * wx + vy * vy
-    if c1 <= 0:
-        return (px - x1)**2 + (py - y1)**2 < 25
-    c2 = vx * vx + vy * vy
-    if c2 <= c1:
-        return (px - x2)**2 + (py - y2)**2 < 25
-    b = c1 / c2
-    xp, yp = x1 + b * vx, y1 + b * vy
-    return (px - xp)**2 + (py - yp)**2 < 25
-
+        """Async MJPEG stream (frames are encoded once and shared by all viewers)."""
+        return self.stream.aframes()
@@ -0,0 +1,107 @@
+"""Adaptive quality control to hold a capture-to-output latency target."""
+import time
+import logging
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+from app.services.metrics import MetricsCollector
+from app.utils.letterbox import stride_aligned
+
+logger = logging.getLogger(__name__)
+
+
+class QualityLevel(NamedTuple):
+    """Detector workload: run detection every `stride` frames at `inference_size` pixels."""
+    stride: int
+    inference_size: int
+
+
+def build_quality_ladder(base_size: int, min_size: int, max_stride: int) -> List[QualityLevel]:
+    """Levels from best to cheapest: shrink the detector input first, then skip frames."""
+    sizes = [stride_aligned(base_size)]
+    while True:
+        smaller = stride_aligned(int(sizes[-1] * 0.75))
+        if smaller >= sizes[-1] or smaller < stride_aligned(min_size):
+            break
+        sizes.append(smaller)
+
+    ladder = [QualityLevel(1, size) for size in sizes]
+    ladder += [QualityLevel(stride, sizes[-1]) for stride in range(2, max(1, max_stride) + 1)]
+    return ladder
+
+
+class QualityController:
+    """Steps detection stride and inference size up or down from measured frame latency.
+
+    Every eval_frames frames the p90 latency is compared with the target: above it the
+    controller degrades one level, below relax_ratio * target it recovers one level.
+    """
+
+    def __init__(
+        self,
+        target_ms: float,
+        base_size: int = 640,
+        min_size: int = 320,
+        max_stride: int = 3,
+        eval_frames: int = 30,
+        relax_ratio: float = 0.6,
+    ):
+        self.target = target_ms / 1000.0
+        self.ladder = build_quality_ladder(base_size, min_size, max_stride)
+        self.index = 0
+        self.eval_frames = eval_frames
+        self.relax_ratio = relax_ratio
+        self._frames_since_eval = 0
+        self.changes: Deque[Dict] = deque(maxlen=20)
+        self.change_count = 0
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.ladder[self.index]
+
+    def update(self, metrics: MetricsCollector) -> Optional[QualityLevel]:
+        """Call once per processed frame; returns the new level when it changes."""
+        self._frames_since_eval += 1
+        if self._frames_since_eval < self.eval_frames:
+            return None
+        self._frames_since_eval = 0
+
+        p90 = metrics.latency_percentile(0.9)
+        if p90 is None:
+            return None
+
+        new_index = self.index
+        if p90 > self.target and self.index < len(self.ladder) - 1:
+            new_index += 1
+        elif p90 < self.target * self.relax_ratio and self.index > 0:
+            new_index -= 1
+        if new_index == self.index:
+            return None
+
+        old = self.level
+        degraded = new_index > self.index
+        self.index = new_index
+        self.change_count += 1
+        self.changes.appendleft({
+            "ts": time.time(),
+            "p90_latency_ms": round(p90 * 1000, 1),
+            "from": old._asdict(),
+            "to": self.level._asdict(),
+        })
+        logger.info(
+            f"Quality {'degraded' if degraded else 'restored'}: "
+            f"stride {old.stride}->{self.level.stride}, size {old.inference_size}->{self.level.inference_size} "
+            f"(p90 {p90 * 1000:.0f} ms, target {self.target * 1000:.0f} ms)"
+        )
+        return self.level
+
+    def get_stats(self) -> Dict:
+        return {
+            "target_latency_ms": round(self.target * 1000, 1),
+            "level": self.index,
+            "levels": len(self.ladder),
+            "stride": self.level.stride,
+            "inference_size": self.level.inference_size,
+            "changes": self.change_count,
+            "recent_changes": list(self.changes),
+        }
@@ -0,0 +1,172 @@
+"""Vectorized traffic rules evaluated for all tracks of a frame at once."""
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Shortest time a speed step may span; shorter steps amplify detection jitter
+MIN_STEP_SECONDS = 0.05
+
+
+class FrameTracks(NamedTuple):
+    """Struct-of-arrays view of the tracks in one frame (N tracks)."""
+    centers: np.ndarray          # (N, 2) pixel centroids
+    prev_centers: np.ndarray     # (N, 2) centroids at the previous evaluation of each track
+    has_prev: np.ndarray         # (N,) bool, prev_centers is set
+    lane_ids: np.ndarray         # (N,) lane index, -1 outside all lanes
+    vehicle: np.ndarray          # (N,) bool, vehicle classes
+    velocities: np.ndarray       # (N, 2) px/s over the track history
+    velocity_valid: np.ndarray   # (N,) bool, history long enough for a velocity
+    step_dist: np.ndarray        # (N,) px moved since the start of the speed step
+    step_dt: np.ndarray          # (N,) seconds since the start of the speed step (0 = none)
+    wrong_way_counts: np.ndarray  # (N,) consecutive wrong-way frames so far
+
+
+class RuleHits(NamedTuple):
+    """Per-track results; alerts are emitted only where a mask is set."""
+    red_light: np.ndarray        # (N,) bool
+    crossing_dir: np.ndarray     # (N,) +1 / -1 side change across the stop line, 0 = none
+    lane_violation: np.ndarray   # (N,) bool
+    wrong_way: np.ndarray        # (N,) bool
+    wrong_way_counts: np.ndarray  # (N,) updated counters
+    speeding: np.ndarray         # (N,) bool
+    speed_pxps: np.ndarray       # (N,) px/s from the history velocity
+    speed_kmh: np.ndarray        # (N,) km/h from the last step (0 without calibration)
+    lane_sample: np.ndarray      # (N,) bool, usable for auto lane direction learning
+
+
+def point_segment_distance_sq(points: np.ndarray, segment: Tuple[Tuple[float, float], Tuple[float, float]]) -> np.ndarray:
+    """Squared distance from each point to a line segment."""
+    a = np.asarray(segment[0], dtype=np.float64)
+    b = np.asarray(segment[1], dtype=np.float64)
+    ab = b - a
+    denom = float(ab @ ab)
+    if denom <= 1e-12:
+        return ((points - a) ** 2).sum(axis=1)
+    t = np.clip(((points - a) @ ab) / denom, 0.0, 1.0)
+    closest = a + t[:, None] * ab
+    return ((points - closest) ** 2).sum(axis=1)
+
+
+def line_side(points: np.ndarray, segment: Tuple[Tuple[float, float], Tuple[float, float]]) -> np.ndarray:
+    """Signed area of (a, b, p); with y pointing down, > 0 is to the right of a->b as seen on screen."""
+    a = np.asarray(segment[0], dtype=np.float64)
+    ab = np.asarray(segment[1], dtype=np.float64) - a
+    ap = points - a
+    return ab[0] * ap[:, 1] - ab[1] * ap[:, 0]
+
+
+def segment_crossings(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    segment: Tuple[Tuple[float, float], Tuple[float, float]],
+    tolerance_px: float = 5.0,
+) -> np.ndarray:
+    """Direction in which each start->end move crosses the segment: +1, -1, or 0 for no crossing.
+
+    Points exactly on the line count as being on its positive side, so a move that ends on the
+    line and continues is counted once. The crossing point may lie up to tolerance_px beyond the
+    segment ends.
+    """
+    side_start = line_side(starts, segment)
+    side_end = line_side(ends, segment)
+    before = side_start >= 0
+    after = side_end >= 0
+    changed = before != after
+    direction = np.zeros(len(starts), dtype=np.int8)
+    if not changed.any():
+        return direction
+
+    idx = np.flatnonzero(changed)
+    t = side_start[idx] / (side_start[idx] - side_end[idx])
+    hit = starts[idx] + t[:, None] * (ends[idx] - starts[idx])
+    near = point_segment_distance_sq(hit, segment) <= tolerance_px ** 2
+    direction[idx[near]] = np.where(after[idx[near]], 1, -1)
+    return direction
+
+
+def evaluate_rules(
+    tracks: FrameTracks,
+    red_signal: bool,
+    stop_line: Optional[Tuple[Tuple[int, int], Tuple[int, int]]],
+    lanes_configured: bool,
+    lane_dirs: np.ndarray,
+    m_per_px: Optional[float],
+    speed_limit_kmh: Optional[float],
+    learn_directions: bool = False,
+    learn_slots: int = 0,
+    stop_line_tolerance_px: float = 5.0,
+    min_speed_pxps: float = 30.0,
+    wrong_way_cos: float = -0.5,
+    wrong_way_frames: int = 10,
+    min_step_seconds: float = MIN_STEP_SECONDS,
+) -> RuleHits:
+    """Compute every rule mask for all tracks with array math.
+
+    A red-light hit is a move from prev_centers to centers that crosses the stop line, so it does
+    not depend on the processing rate; tracks without a previous position fall back to being
+    within stop_line_tolerance_px of the line.
+
+    lane_dirs is (L, 2) unit travel directions per lane ((0, 0) while unknown). Tracks in a lane
+    with a direction and a valid velocity increment their wrong-way counter when moving against
+    it and reset it otherwise; tracks outside all lanes reset it.
+
+    Speed is measured over steps of at least min_step_seconds (TrackStateStore.step keeps the
+    step start until then), so it is only evaluated on the frames that complete a step.
+    """
+    n = len(tracks.centers)
+    lane_ids = tracks.lane_ids
+    in_lane = lane_ids >= 0
+
+    # Red light: the move since the previous observation crosses the stop line
+    crossing_dir = np.zeros(n, dtype=np.int8)
+    if red_signal and stop_line is not None and n:
+        crossing_dir = segment_crossings(tracks.prev_centers, tracks.centers, stop_line, stop_line_tolerance_px)
+        crossing_dir[~tracks.has_prev] = 0
+        red_light = crossing_dir != 0
+        first = ~tracks.has_prev
+        red_light[first] = point_segment_distance_sq(tracks.centers[first], stop_line) < stop_line_tolerance_px ** 2
+    else:
+        red_light = np.zeros(n, dtype=bool)
+
+    lane_violation = ~in_lane if lanes_configured else np.zeros(n, dtype=bool)
+
+    # Wrong way against the lane direction
+    speed_pxps = np.hypot(tracks.velocities[:, 0], tracks.velocities[:, 1]) if n else np.zeros(0)
+    moving = tracks.velocity_valid & in_lane
+    has_dir = moving & (lane_ids < len(lane_dirs))
+    dirs = np.zeros((n, 2))
+    if len(lane_dirs):
+        dirs[has_dir] = lane_dirs[lane_ids[has_dir]]
+    dot = (tracks.velocities * dirs).sum(axis=1) if n else np.zeros(0)
+    against = has_dir & (speed_pxps >= min_speed_pxps) & (dot < wrong_way_cos * speed_pxps)
+
+    counts = tracks.wrong_way_counts.copy()
+    counts[~in_lane] = 0
+    counts[has_dir & ~against] = 0
+    counts[against] += 1
+    wrong_way = has_dir & (counts >= wrong_way_frames)
+
+    # Speeding over the last step
+    speed_kmh = np.zeros(n)
+    speeding = np.zeros(n, dtype=bool)
+    if m_per_px and speed_limit_kmh:
+        stepped = tracks.step_dt >= min_step_seconds
+        speed_kmh[stepped] = tracks.step_dist[stepped] * m_per_px / tracks.step_dt[stepped] * 3.6
+        speeding = stepped & (speed_kmh > speed_limit_kmh)
+
+    if learn_directions:
+        lane_sample = moving & tracks.vehicle & (speed_pxps >= min_speed_pxps) & (lane_ids < learn_slots)
+    else:
+        lane_sample = np.zeros(n, dtype=bool)
+
+    return RuleHits(
+        red_light=red_light,
+        crossing_dir=crossing_dir,
+        lane_violation=lane_violation,
+        wrong_way=wrong_way,
+        wrong_way_counts=counts,
+        speeding=speeding,
+        speed_pxps=speed_pxps,
+        speed_kmh=speed_kmh,
+        lane_sample=lane_sample,
+    )
@@ -0,0 +1,208 @@
+"""Background worker pool for secondary models (plate detection + OCR, helmet check)."""
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Square model input sizes crops are grouped into (a crop goes to the smallest that fits it)
+CROP_BUCKETS = (160, 320, 640)
+
+
+def size_buckets(crops: Sequence[np.ndarray], sizes: Sequence[int] = CROP_BUCKETS) -> Dict[int, List[int]]:
+    """Group crop indices by the smallest bucket size covering their longer side."""
+    groups: Dict[int, List[int]] = {}
+    for i, crop in enumerate(crops):
+        longest = max(crop.shape[:2])
+        size = next((s for s in sizes if longest <= s), sizes[-1])
+        groups.setdefault(size, []).append(i)
+    return groups
+
+
+class SecondaryTask(NamedTuple):
+    """A crop to run one secondary model on, for one track."""
+    kind: str
+    track_id: int
+    crop: np.ndarray
+    submitted: float
+
+
+class SecondaryResult(NamedTuple):
+    kind: str
+    track_id: int
+    value: Any
+    latency: float
+
+
+class SecondaryWorkerPool:
+    """Runs secondary-model handlers on worker threads, fed through a bounded queue.
+
+    submit() never blocks: when the queue is full the task is shed and counted, and at most
+    one task per (kind, track) is pending at a time. With block=True (offline runs) submit()
+    waits for room instead, so no crop is lost. A worker collects up to max_batch tasks
+    (waiting at most batch_wait_ms after the first) and calls each kind's handler once with all
+    of its crops. Results are collected with poll() on the caller's thread, so alerts and track
+    state are only touched by the frame loop.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[List[np.ndarray]], List[Any]]], workers: int = 1,
+                 queue_size: int = 16, max_batch: int = 8, batch_wait_ms: float = 5.0,
+                 block: bool = False):
+        self.handlers = handlers
+        self.block = block
+        self.workers = max(1, int(workers))
+        self.max_batch = max(1, int(max_batch))
+        self.batch_wait = max(0.0, batch_wait_ms) / 1000.0
+        self._tasks: "queue.Queue[Optional[SecondaryTask]]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._results: "queue.Queue[SecondaryResult]" = queue.Queue()
+        self._pending: Set[Tuple[str, int]] = set()
+        self._lock = threading.Lock()
+        # Notified when the last pending task finished
+        self._idle = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self.running = False
+
+        # Stats
+        self.submitted = 0
+        self.completed = 0
+        self.shed = 0
+        self.failed = 0
+        self.batches = 0
+        self.latencies: Deque[float] = deque(maxlen=100)
+        self.batch_sizes: Deque[int] = deque(maxlen=100)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"secondary-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        # Drop queued work, then wake every worker with a sentinel
+        while True:
+            try:
+                self._tasks.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            try:
+                self._tasks.put_nowait(None)
+            except queue.Full:
+                pass
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        with self._lock:
+            self._pending.clear()
+            self._idle.notify_all()
+
+    def submit(self, kind: str, track_id: int, crop: np.ndarray) -> bool:
+        """Queue a copy of crop for the kind handler; False if shed or already pending."""
+        key = (kind, track_id)
+        with self._lock:
+            if not self.running or key in self._pending:
+                return False
+            self._pending.add(key)
+        # Outside the lock: a blocking put waits for workers, which need it to finish tasks
+        try:
+            self._tasks.put(SecondaryTask(kind, track_id, crop.copy(), time.time()), block=self.block)
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(key)
+                self.shed += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted task has a result ready for poll(); False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending or not self.running, timeout)
+
+    def poll(self) -> List[SecondaryResult]:
+        """Results that arrived since the last call."""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def _collect(self, first: SecondaryTask) -> Tuple[List[SecondaryTask], bool]:
+        """Tasks for one batch, and whether a stop sentinel was seen."""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                task = self._tasks.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if task is None:
+                return batch, True
+            batch.append(task)
+        return batch, False
+
+    def _run(self):
+        while self.running:
+            first = self._tasks.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+
+            groups: Dict[str, List[SecondaryTask]] = {}
+            for task in batch:
+                groups.setdefault(task.kind, []).append(task)
+            for kind, tasks in groups.items():
+                try:
+                    values = self.handlers[kind]([task.crop for task in tasks])
+                except Exception as e:
+                    logger.debug(f"Secondary {kind} batch of {len(tasks)} failed: {e}")
+                    values = [None] * len(tasks)
+                    with self._lock:
+                        self.failed += len(tasks)
+                done = time.time()
+                with self._lock:
+                    self.batches += 1
+                    self.batch_sizes.append(len(tasks))
+                    for task in tasks:
+                        self.completed += 1
+                        self.latencies.append(done - task.submitted)
+                # Results go out before the tasks stop pending, so drain() sees them in poll()
+                for task, value in zip(tasks, values):
+                    self._results.put(SecondaryResult(kind, task.track_id, value, done - task.submitted))
+                with self._lock:
+                    for task in tasks:
+                        self._pending.discard((task.kind, task.track_id))
+                    if not self._pending:
+                        self._idle.notify_all()
+            if stopping:
+                break
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            latencies = list(self.latencies)
+            sizes = list(self.batch_sizes)
+            return {
+                "workers": self.workers,
+                "queued": self._tasks.qsize(),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "shed": self.shed,
+                "failed": self.failed,
+                "batches": self.batches,
+                "avg_batch_size": round(float(np.mean(sizes)), 2) if sizes else 0.0,
+                "avg_latency_ms": round(float(np.mean(latencies)) * 1000, 1) if latencies else 0.0,
+            }
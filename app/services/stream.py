@@ -0,0 +1,187 @@
+"""Encode-once MJPEG fan-out shared by every viewer of a camera."""
+import asyncio
+import threading
+from concurrent.futures import Future
+import time
+import logging
+from typing import AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = b"--frame"
+MEDIA_TYPE = "multipart/x-mixed-replace; boundary=frame"
+
+
+def mjpeg_part(jpeg: bytes) -> bytes:
+    """One multipart chunk of an MJPEG stream."""
+    return BOUNDARY + b"\r\n" + b"Content-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
+
+
+def _set_all(events: Set[asyncio.Event]):
+    for event in events:
+        event.set()
+
+
+class MJPEGBroadcaster:
+    """Hands the newest frame, JPEG-encoded once, to any number of stream subscribers.
+
+    publish() only stores a reference to the frame and bumps a sequence number, so the frame
+    loop pays nothing per viewer (and nothing is encoded without viewers). The first subscriber
+    asking for a new sequence number encodes it; every other one gets the same bytes.
+    Subscribers always receive the newest frame, so a slow client skips frames instead of
+    queueing them.
+
+    Subscribers are async generators (aframes()) and hold no thread while waiting: publish()
+    wakes their event loop with call_soon_threadsafe, and only encoding runs in the loop's
+    executor, once per frame: the first subscriber starts the encode and everyone else awaits
+    the same future, so the number of viewers is bounded by bandwidth rather than by threadpool
+    size.
+
+    With fetch (frames produced in another process), a single pump thread polls
+    fetch(last_source_seq) -> (source_seq, frame) every poll_interval seconds and publishes what
+    it gets, while there are subscribers.
+    """
+
+    def __init__(self, quality: int = 80,
+                 fetch: Optional[Callable[[int], Optional[Tuple[int, np.ndarray]]]] = None,
+                 poll_interval: float = 0.03):
+        self.quality = quality
+        self.fetch = fetch
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._frame: Optional[np.ndarray] = None
+        self._seq = 0
+        self._source_seq = 0
+        self._pump: Optional[threading.Thread] = None
+        # (seq, JPEG bytes) of the last encoded frame, replaced as a whole
+        self._encoded: Tuple[int, Optional[bytes]] = (0, None)
+        # (seq, future of (seq, JPEG bytes)) of the newest encode started
+        self._encoding: Tuple[int, Optional[Future]] = (0, None)
+        self._async_waiters: Dict[asyncio.AbstractEventLoop, Set[asyncio.Event]] = {}
+
+        # Stats
+        self.subscribers = 0
+        self.published = 0
+        self.encoded = 0
+        self.delivered = 0
+        self.skipped = 0
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def publish(self, frame: np.ndarray):
+        """Make frame the newest one; the caller must not modify it afterwards."""
+        with self._lock:
+            self._frame = frame
+            self._seq += 1
+            self.published += 1
+            for loop, events in self._async_waiters.items():
+                try:
+                    loop.call_soon_threadsafe(_set_all, events)
+                except RuntimeError:
+                    # Loop already closed; its subscribers are gone
+                    pass
+
+    def _subscribe(self, delta: int):
+        with self._lock:
+            self.subscribers += delta
+            if delta > 0 and self.fetch is not None and self._pump is None:
+                self._pump = threading.Thread(target=self._run_pump, name="mjpeg-pump", daemon=True)
+                self._pump.start()
+
+    def _run_pump(self):
+        while True:
+            with self._lock:
+                if self.subscribers == 0:
+                    self._pump = None
+                    return
+            try:
+                latest = self.fetch(self._source_seq)
+                if latest is not None:
+                    self._source_seq = latest[0]
+                    self.publish(latest[1])
+            except Exception as e:
+                logger.debug(f"Stream frame fetch failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def _encode(self, seq: int, frame: np.ndarray, future: Future):
+        try:
+            ret, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            encoded = (seq, buf.tobytes() if ret else None)
+        except Exception as e:
+            logger.debug(f"Stream frame encode failed: {e}")
+            encoded = (seq, None)
+        with self._lock:
+            if encoded[0] > self._encoded[0]:
+                self._encoded = encoded
+            self.encoded += 1
+        future.set_result(encoded)
+
+    def _encode_future(self, loop: asyncio.AbstractEventLoop, seq: int, frame: np.ndarray) -> Future:
+        """Future of the JPEG for seq (or a newer frame), starting the encode if nobody has yet."""
+        with self._lock:
+            if self._encoding[0] >= seq:
+                return self._encoding[1]
+            future: Future = Future()
+            # Running futures cannot be cancelled, so one subscriber leaving never fails the others
+            future.set_running_or_notify_cancel()
+            self._encoding = (seq, future)
+        loop.run_in_executor(None, self._encode, seq, frame, future)
+        return future
+
+    def _delivered(self, seq: int, last_seq: int):
+        with self._lock:
+            self.delivered += 1
+            if last_seq > 0:
+                self.skipped += seq - last_seq - 1
+
+    async def aframes(self) -> AsyncIterator[bytes]:
+        """Async generator of MJPEG parts for one subscriber; unsubscribes as soon as it is closed."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with self._lock:
+            self._async_waiters.setdefault(loop, set()).add(event)
+        self._subscribe(1)
+        try:
+            last_seq = 0
+            while True:
+                # Clear before checking so a publish in between still wakes us
+                event.clear()
+                with self._lock:
+                    seq, frame = self._seq, self._frame
+                if seq <= last_seq:
+                    await event.wait()
+                    continue
+
+                encoded = self._encoded
+                if encoded[0] < seq:
+                    encoded = await asyncio.wrap_future(self._encode_future(loop, seq, frame))
+                seq, jpeg = encoded
+                if jpeg is None:
+                    last_seq = seq
+                    continue
+                self._delivered(seq, last_seq)
+                last_seq = seq
+                yield mjpeg_part(jpeg)
+        finally:
+            with self._lock:
+                waiters = self._async_waiters.get(loop)
+                if waiters is not None:
+                    waiters.discard(event)
+                    if not waiters:
+                        del self._async_waiters[loop]
+            self._subscribe(-1)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "subscribers": self.subscribers,
+                "published": self.published,
+                "encoded": self.encoded,
+                "delivered": self.delivered,
+                "skipped": self.skipped,
+            }
@@ -0,0 +1,197 @@
+"""Bounded per-track state for the rule engine."""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TrackStateStore:
+    """Per-track state in preallocated arrays, one slot per tracker id.
+
+    A slot is freed ttl_seconds after its track was last seen. When every slot is taken the
+    least recently seen track is evicted, so memory stays fixed however many ids the tracker
+    hands out.
+    """
+
+    def __init__(self, capacity: int = 1024, ttl_seconds: float = 30.0, history: int = 12):
+        self.capacity = max(1, int(capacity))
+        self.ttl = ttl_seconds
+        self.history = history
+
+        cap = self.capacity
+        self._slot_of: Dict[int, int] = {}
+        # Active track ids in sorted order with their slots, for vectorized lookups (None = stale)
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._free: List[int] = list(range(cap - 1, -1, -1))
+        self.active = np.zeros(cap, dtype=bool)
+        self.track_ids = np.full(cap, -1, dtype=np.int64)
+        self.last_seen = np.zeros(cap)
+
+        # Last observed position (stop-line crossing)
+        self.has_last = np.zeros(cap, dtype=bool)
+        self.last_t = np.zeros(cap)
+        self.last_pos = np.zeros((cap, 2))
+
+        # Start of the current speed step, kept until the step is long enough
+        self.has_ref = np.zeros(cap, dtype=bool)
+        self.ref_t = np.zeros(cap)
+        self.ref_pos = np.zeros((cap, 2))
+
+        # Ring buffer of (t, x, y) while inside a lane (direction / wrong-way)
+        self.hist = np.zeros((cap, history, 3))
+        self.hist_len = np.zeros(cap, dtype=np.int32)
+        self.hist_head = np.zeros(cap, dtype=np.int32)
+
+        self.wrong_way = np.zeros(cap, dtype=np.int32)
+        self.violation_until = np.zeros(cap)
+        # Secondary-model attributes (dict kind -> TrackAttribute), see attributes.py
+        self.attributes = np.full(cap, None, dtype=object)
+        self._cooldowns: Dict[str, np.ndarray] = {}
+
+        self.evicted_expired = 0
+        self.evicted_capacity = 0
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def _reset(self, slot: int):
+        self.has_last[slot] = False
+        self.has_ref[slot] = False
+        self.hist_len[slot] = 0
+        self.hist_head[slot] = 0
+        self.wrong_way[slot] = 0
+        self.violation_until[slot] = 0.0
+        self.attributes[slot] = None
+        for until in self._cooldowns.values():
+            until[slot] = 0.0
+
+    def _release(self, slot: int):
+        del self._slot_of[int(self.track_ids[slot])]
+        self._sorted = None
+        self.active[slot] = False
+        self.track_ids[slot] = -1
+        self._free.append(slot)
+
+    def _allocate(self, track_id: int) -> int:
+        if not self._free:
+            # Full: drop the least recently seen track
+            oldest = int(np.argmin(np.where(self.active, self.last_seen, np.inf)))
+            self._release(oldest)
+            self.evicted_capacity += 1
+        slot = self._free.pop()
+        self._reset(slot)
+        self._slot_of[track_id] = slot
+        self._sorted = None
+        self.active[slot] = True
+        self.track_ids[slot] = track_id
+        return slot
+
+    def lookup(self, track_ids: np.ndarray) -> np.ndarray:
+        """Slots for known tracks, -1 for unknown ones (no allocation)."""
+        if self._sorted is None:
+            active = np.flatnonzero(self.active)
+            order = np.argsort(self.track_ids[active], kind="stable")
+            self._sorted = (self.track_ids[active][order], active[order])
+        ids, id_slots = self._sorted
+        slots = np.full(len(track_ids), -1, dtype=np.intp)
+        if len(ids) == 0 or len(track_ids) == 0:
+            return slots
+        pos = np.minimum(np.searchsorted(ids, track_ids), len(ids) - 1)
+        found = ids[pos] == track_ids
+        slots[found] = id_slots[pos[found]]
+        return slots
+
+    def touch(self, track_ids: np.ndarray, now: float) -> np.ndarray:
+        """Slots for the tracks of this frame, allocating slots for new ones."""
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        slots = self.lookup(track_ids)
+        known = slots >= 0
+        # Set before allocating so a capacity eviction never picks a track of this frame
+        self.last_seen[slots[known]] = now
+        for i in np.flatnonzero(~known).tolist():
+            track_id = int(track_ids[i])
+            slot = self._slot_of.get(track_id)
+            if slot is None:
+                slot = self._allocate(track_id)
+                self.last_seen[slot] = now
+            slots[i] = slot
+        return slots
+
+    def slot(self, track_id: int, now: float) -> int:
+        return int(self.touch(np.array([track_id]), now)[0])
+
+    def evict_expired(self, now: float) -> int:
+        """Free the slots of tracks not seen for ttl_seconds."""
+        expired = np.flatnonzero(self.active & (self.last_seen < now - self.ttl))
+        for slot in expired:
+            self._release(int(slot))
+        self.evicted_expired += len(expired)
+        return len(expired)
+
+    def push_history(self, slots: np.ndarray, points: np.ndarray, now: float):
+        """Append (now, x, y) to each slot's history ring."""
+        if len(slots) == 0:
+            return
+        head = self.hist_head[slots]
+        self.hist[slots, head, 0] = now
+        self.hist[slots, head, 1:] = points
+        self.hist_head[slots] = (head + 1) % self.history
+        self.hist_len[slots] = np.minimum(self.hist_len[slots] + 1, self.history)
+
+    def history_velocity(self, slots: np.ndarray, min_points: int = 4, min_seconds: float = 0.1) -> Tuple[np.ndarray, np.ndarray]:
+        """Velocity (px/s) from the oldest to the newest history entry, and whether it is valid."""
+        length = self.hist_len[slots]
+        newest = self.hist[slots, (self.hist_head[slots] - 1) % self.history]
+        oldest = self.hist[slots, (self.hist_head[slots] - length) % self.history]
+        dt = newest[:, 0] - oldest[:, 0]
+        valid = (length >= min_points) & (dt > min_seconds)
+        velocities = np.zeros((len(slots), 2))
+        velocities[valid] = (newest[valid, 1:] - oldest[valid, 1:]) / dt[valid, None]
+        return velocities, valid
+
+    def step(self, slots: np.ndarray, points: np.ndarray, now: float,
+             min_seconds: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Distance and time since each slot's speed reference, then record the new position.
+
+        The reference only moves to the new position once at least min_seconds have passed, so
+        at high frame rates the step spans several frames instead of never reaching min_seconds.
+        last_pos always holds the previous observation.
+        """
+        had = self.has_ref[slots]
+        dist = np.where(had, np.hypot(*(points - self.ref_pos[slots]).T), 0.0)
+        dt = np.where(had, now - self.ref_t[slots], 0.0)
+        done = ~had | (dt >= min_seconds)
+        restart = slots[done]
+        self.ref_pos[restart] = points[done]
+        self.ref_t[restart] = now
+        self.has_ref[restart] = True
+
+        self.last_pos[slots] = points
+        self.last_t[slots] = now
+        self.has_last[slots] = True
+        return dist, dt
+
+    def cooldown_ready(self, slot: int, kind: str, now: float, seconds: float) -> bool:
+        """True (and restart the cooldown) if kind was not alerted for this slot in the last seconds."""
+        until = self._cooldowns.get(kind)
+        if until is None:
+            until = self._cooldowns[kind] = np.zeros(self.capacity)
+        if now < until[slot]:
+            return False
+        until[slot] = now + seconds
+        return True
+
+    def clear(self):
+        for slot in list(self._slot_of.values()):
+            self._release(slot)
+
+    def get_stats(self) -> Dict:
+        return {
+            "tracks": len(self._slot_of),
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl,
+            "evicted_expired": self.evicted_expired,
+            "evicted_capacity": self.evicted_capacity,
+        }
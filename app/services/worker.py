@@ -0,0 +1,423 @@
+"""Process-per-camera execution with shared-memory transport back to the API process."""
+import json
+import os
+import queue
+import logging
+import multiprocessing as mp
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from app.services.evidence import EvidenceManager
+from app.services.stream import MJPEGBroadcaster
+from app.utils.settings import AppSettings
+
+logger = logging.getLogger(__name__)
+
+_INT64 = 8
+
+
+def _align(n: int) -> int:
+    return (n + _INT64 - 1) // _INT64 * _INT64
+
+
+class SharedFrameRing:
+    """Fixed-slot frame ring in shared memory (one writer, any number of readers).
+
+    Layout: [latest_seq] then per slot [seq, h, w, c] + pixel bytes. A reader copies
+    a slot and re-checks its seq afterwards, so torn reads are discarded.
+    """
+
+    def __init__(self, name: Optional[str] = None, slots: int = 3,
+                 max_width: int = 1920, max_height: int = 1080, create: bool = False):
+        self.slots = slots
+        self.max_width = max_width
+        self.max_height = max_height
+        self.frame_bytes = max_width * max_height * 3
+        self.slot_bytes = _align(4 * _INT64 + self.frame_bytes)
+        size = _INT64 + slots * self.slot_bytes
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+
+        self._latest = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self._headers: List[np.ndarray] = []
+        self._data: List[np.ndarray] = []
+        for i in range(slots):
+            offset = _INT64 + i * self.slot_bytes
+            self._headers.append(np.ndarray((4,), dtype=np.int64, buffer=self.shm.buf, offset=offset))
+            self._data.append(np.ndarray((self.frame_bytes,), dtype=np.uint8, buffer=self.shm.buf,
+                                         offset=offset + 4 * _INT64))
+        if create:
+            self._latest[0] = 0
+            for header in self._headers:
+                header[:] = 0
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self._latest[0])
+
+    def write(self, frame: np.ndarray):
+        """Publish a BGR frame, downscaling it if it exceeds the slot size."""
+        h, w = frame.shape[:2]
+        if h > self.max_height or w > self.max_width:
+            scale = min(self.max_height / h, self.max_width / w)
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            h, w = frame.shape[:2]
+        c = frame.shape[2] if frame.ndim == 3 else 1
+
+        seq = self.latest_seq + 1
+        header = self._headers[seq % self.slots]
+        header[0] = -1
+        self._data[seq % self.slots][:h * w * c] = np.ascontiguousarray(frame).reshape(-1)
+        header[1], header[2], header[3] = h, w, c
+        header[0] = seq
+        self._latest[0] = seq
+
+    def read(self, last_seq: int = 0) -> Optional[Tuple[int, np.ndarray]]:
+        """Copy the newest frame if it is newer than last_seq."""
+        if self._latest is None:
+            return None
+        seq = self.latest_seq
+        if seq == 0 or seq == last_seq:
+            return None
+        header = self._headers[seq % self.slots]
+        if int(header[0]) != seq:
+            return None
+        h, w, c = int(header[1]), int(header[2]), int(header[3])
+        frame = self._data[seq % self.slots][:h * w * c].copy().reshape((h, w, c))
+        if int(header[0]) != seq:
+            return None
+        return seq, frame
+
+    def close(self):
+        # Views into the buffer must be released before closing it
+        self._latest = None
+        self._headers = []
+        self._data = []
+        try:
+            self.shm.close()
+        except BufferError:
+            # A reader still holds a view; the mapping is released with it
+            pass
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedRecordRing:
+    """Fixed-slot ring of JSON records in shared memory (one writer, sequential readers)."""
+
+    def __init__(self, name: Optional[str] = None, slots: int = 256, slot_size: int = 8192,
+                 create: bool = False):
+        self.slots = slots
+        self.slot_size = _align(slot_size)
+        self.payload_size = self.slot_size - 2 * _INT64
+        size = _INT64 + slots * self.slot_size
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+
+        self._write_seq = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self._headers: List[np.ndarray] = []
+        self._data: List[np.ndarray] = []
+        for i in range(slots):
+            offset = _INT64 + i * self.slot_size
+            self._headers.append(np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf, offset=offset))
+            self._data.append(np.ndarray((self.payload_size,), dtype=np.uint8, buffer=self.shm.buf,
+                                         offset=offset + 2 * _INT64))
+        if create:
+            self._write_seq[0] = 0
+            for header in self._headers:
+                header[:] = 0
+
+    def append(self, record: Dict):
+        payload = json.dumps(record, default=str).encode("utf-8")
+        if len(payload) > self.payload_size:
+            logger.warning(f"Dropping {len(payload)}-byte record larger than slot")
+            return
+        seq = int(self._write_seq[0]) + 1
+        header = self._headers[seq % self.slots]
+        header[0] = -1
+        self._data[seq % self.slots][:len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+        header[1] = len(payload)
+        header[0] = seq
+        self._write_seq[0] = seq
+
+    def read_since(self, last_seq: int) -> Tuple[List[Dict], int]:
+        """Return records written after last_seq (oldest first) and the new cursor."""
+        if self._write_seq is None:
+            return [], last_seq
+        write_seq = int(self._write_seq[0])
+        records: List[Dict] = []
+        for seq in range(max(last_seq + 1, write_seq - self.slots + 1), write_seq + 1):
+            header = self._headers[seq % self.slots]
+            if int(header[0]) != seq:
+                continue
+            payload = self._data[seq % self.slots][:int(header[1])].tobytes()
+            if int(header[0]) != seq:
+                continue
+            try:
+                records.append(json.loads(payload))
+            except ValueError:
+                continue
+        return records, write_seq
+
+    def close(self):
+        self._write_seq = None
+        self._headers = []
+        self._data = []
+        try:
+            self.shm.close()
+        except BufferError:
+            # A reader still holds a view; the mapping is released with it
+            pass
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def limit_process_threads(threads: int):
+    """Keep a worker process to its own core(s); must run before torch/cv2 spin up pools."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _put_latest(q: "mp.Queue", event: Dict):
+    """Put event on a maxsize=1 queue, replacing an unread one, so a slow reader never backs it up."""
+    try:
+        q.put_nowait(event)
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            # The reader refilled it in between; this status is superseded by the next one
+            pass
+
+
+def _camera_worker_main(
+    camera_id: str,
+    source: Union[int, str],
+    evidence_dir: str,
+    frame_ring: Tuple[str, int, int, int],
+    alert_ring: str,
+    threads: int,
+    control: "mp.Queue",
+    status: "mp.Queue",
+):
+    """Entry point of a camera worker process."""
+    limit_process_threads(threads)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from app.utils.roi import camera_config_path, load_roi_config
+    from app.services.processor_v2 import VideoProcessorV2
+    from app.services.models import ModelRegistry
+
+    frame_name, slots, max_width, max_height = frame_ring
+    frames = SharedFrameRing(frame_name, slots, max_width, max_height)
+    alerts = SharedRecordRing(alert_ring)
+
+    proc = VideoProcessorV2(
+        camera_id=camera_id,
+        roi=load_roi_config(camera_config_path(camera_id)),
+        model_registry=ModelRegistry(detector_threads=threads),
+        evidence_manager=EvidenceManager(evidence_dir),
+    )
+    proc.frame_callbacks.append(frames.write)
+    proc.alert_callbacks.append(alerts.append)
+
+    if not proc.start(source):
+        status.put({"event": "failed"})
+    else:
+        status.put({"event": "started"})
+        while True:
+            try:
+                cmd, arg = control.get(timeout=1.0)
+            except queue.Empty:
+                cmd, arg = None, None
+            if cmd == "stop":
+                break
+            if cmd == "signal":
+                proc.set_signal_state(arg)
+            _put_latest(status, {
+                "event": "status",
+                "running": proc.running,
+                "signal": proc.get_signal_state(),
+                "metrics": proc.get_metrics(),
+            })
+
+    proc.stop()
+    frames.close()
+    alerts.close()
+
+
+class ProcessCameraHandle:
+    """Runs one camera pipeline in a worker process and mirrors the VideoProcessorV2 API."""
+
+    def __init__(self, camera_id: str, evidence_manager: EvidenceManager, settings: AppSettings):
+        self.camera_id = camera_id
+        self.evidence_manager = evidence_manager
+        self.settings = settings
+        self.source: Optional[Union[int, str]] = None
+        self.signal_state = "green"
+        self.alerts: Deque[Dict] = deque(maxlen=200)
+
+        self._ctx = mp.get_context("spawn")
+        self.process: Optional[mp.Process] = None
+        self._control: Optional["mp.Queue"] = None
+        self._status: Optional["mp.Queue"] = None
+        self._frames: Optional[SharedFrameRing] = None
+        self._alert_ring: Optional[SharedRecordRing] = None
+        self._alert_seq = 0
+        self._worker_running = False
+        self._metrics: Dict = {}
+        # Stream viewers share one reader of the frame ring and one JPEG per frame
+        self.stream = MJPEGBroadcaster(fetch=self._read_frame)
+
+    @property
+    def running(self) -> bool:
+        self._poll_status()
+        return self._worker_running and self.process is not None and self.process.is_alive()
+
+    def start(self, source: Union[int, str], timeout: float = 120.0) -> bool:
+        """Spawn the worker process and wait until its source is open."""
+        self.stop()
+        self._frames = SharedFrameRing(
+            slots=3,
+            max_width=self.settings.worker_max_frame_width,
+            max_height=self.settings.worker_max_frame_height,
+            create=True,
+        )
+        self._alert_ring = SharedRecordRing(create=True)
+        self._alert_seq = 0
+        self._control = self._ctx.Queue()
+        # Only the newest status matters; the worker replaces one the parent has not read yet
+        self._status = self._ctx.Queue(maxsize=1)
+        self.process = self._ctx.Process(
+            target=_camera_worker_main,
+            args=(
+                self.camera_id,
+                source,
+                str(self.evidence_manager.base_dir),
+                (self._frames.name, self._frames.slots, self._frames.max_width, self._frames.max_height),
+                self._alert_ring.name,
+                self.settings.worker_threads,
+                self._control,
+                self._status,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+        try:
+            event = self._status.get(timeout=timeout)
+        except queue.Empty:
+            event = {"event": "timeout"}
+        # A status update may already have replaced the "started" event
+        if event.get("event") == "status":
+            self._metrics = event["metrics"]
+        elif event.get("event") != "started":
+            logger.error(f"[{self.camera_id}] Worker failed to start ({event.get('event')})")
+            self.stop()
+            return False
+
+        self.source = source
+        self._worker_running = True
+        if self.signal_state != "green":
+            self._control.put(("signal", self.signal_state))
+        logger.info(f"[{self.camera_id}] Started worker process {self.process.pid} for {source}")
+        return True
+
+    def stop(self):
+        if self.process is not None:
+            if self.process.is_alive() and self._control is not None:
+                self._control.put(("stop", None))
+                self.process.join(timeout=5.0)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=2.0)
+            self.process = None
+            self._sync_alerts()
+        for ring in (self._frames, self._alert_ring):
+            if ring is not None:
+                ring.close()
+                ring.unlink()
+        self._frames = None
+        self._alert_ring = None
+        self._control = None
+        self._status = None
+        self._worker_running = False
+        self.source = None
+
+    def set_signal_state(self, state: str):
+        state = state.lower().strip()
+        if state not in {"red", "green"}:
+            return
+        self.signal_state = state
+        if self._control is not None:
+            self._control.put(("signal", state))
+
+    def get_signal_state(self) -> str:
+        return self.signal_state
+
+    def get_recent_alerts(self) -> Dict:
+        self._sync_alerts()
+        return {"signal": self.signal_state, "alerts": list(self.alerts)}
+
+    def get_metrics(self) -> Dict:
+        self._poll_status()
+        return {**self._metrics, "stream": self.stream.get_stats()}
+
+    def get_status(self) -> Dict:
+        return {
+            "camera_id": self.camera_id,
+            "running": self.running,
+            "source": self.source,
+            "signal": self.signal_state,
+            "pid": self.process.pid if self.process else None,
+        }
+
+    def _sync_alerts(self):
+        if self._alert_ring is None:
+            return
+        records, self._alert_seq = self._alert_ring.read_since(self._alert_seq)
+        for record in records:
+            self.alerts.appendleft(record)
+
+    def _poll_status(self):
+        if self._status is None:
+            return
+        while True:
+            try:
+                event = self._status.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            if event.get("event") == "status":
+                self._worker_running = bool(event["running"])
+                self._metrics = event["metrics"]
+
+    def _read_frame(self, last_seq: int) -> Optional[Tuple[int, np.ndarray]]:
+        ring = self._frames
+        return ring.read(last_seq) if ring is not None else None
+
+    def mjpeg_generator(self):
+        """Async MJPEG stream from the worker's shared frame ring."""
+        return self.stream.aframes()
@@ -0,0 +1,488 @@
+"""Run the violation rules over a recorded video as fast as the CPU allows.
+
+    python -m app.tools.process_file footage/cam1.mp4 --camera-id cam1 --out cam1.jsonl
+    python -m app.tools.process_file footage/cam1.mp4 --evidence violations/backfill --signal red
+    python -m app.tools.process_file footage/8h.mp4 --workers 8 --alerts-only --out audit.jsonl
+
+Writes JSONL: one {"event": "alert", ...} line per violation, one {"event": "frame", ...} line
+per frame (unless --alerts-only) and a final {"event": "summary", ...} line. The summary is
+also printed to stderr. No pacing, overlays or MJPEG; evidence is saved only with --evidence.
+
+With --workers N the file is split into N time segments processed in parallel. Each segment
+also replays --overlap seconds before its start to warm up the tracker; tracks seen in both
+are stitched by box overlap so alerts carry one track id across the whole file, and repeated
+alerts for the same track across a boundary are dropped. Segments save evidence into a
+staging folder; evidence of the kept alerts is then moved to --evidence under the global
+track id (the metadata keeps the segment and its local id).
+Exits with status 1 when the video cannot be opened.
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing as mp
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from app.services.capture import media_timestamp
+from app.services.evidence import EvidenceManager
+from app.services.models import ModelRegistry
+from app.services.processor_v2 import VideoProcessorV2
+from app.utils.roi import camera_config_path, load_roi_config
+
+logger = logging.getLogger(__name__)
+
+# frame number -> [(local track id, xyxy)]
+TrackLog = Dict[int, List[Tuple[int, Tuple[float, float, float, float]]]]
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars in alert info
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _write(out: IO[str], record: Dict):
+    out.write(json.dumps(record, default=_json_default) + "\n")
+
+
+def process_file(
+    video: str,
+    out: IO[str],
+    camera_id: str = "default",
+    roi_path: Optional[Path] = None,
+    evidence_dir: Optional[str] = None,
+    signal: str = "green",
+    max_frames: Optional[int] = None,
+    frame_stats: bool = True,
+    model_registry: Optional[ModelRegistry] = None,
+    start_frame: int = 0,
+    warmup_frames: int = 0,
+    track_log_frames: int = 0,
+    track_log: Optional[TrackLog] = None,
+) -> Optional[Dict]:
+    """Process a video file (or the frame range [start_frame, max_frames)) and write JSONL records to out.
+
+    The warmup_frames before start_frame are processed but produce no output. Frame numbers are
+    1-based positions in the file. With track_log, tracks of the warm-up frames and of the last
+    track_log_frames frames are recorded there for stitching.
+    Returns the summary, or None if the video cannot be opened.
+    """
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        logger.error(f"Failed to open video: {video}")
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    first_frame = max(0, start_frame - warmup_frames)
+    if first_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+
+    roi = load_roi_config(roi_path or camera_config_path(camera_id))
+    registry = model_registry or ModelRegistry()
+    # Nothing is saved without evidence_dir; keep the processor's default folder out of the cwd
+    scratch = None if evidence_dir else tempfile.TemporaryDirectory()
+    proc = VideoProcessorV2(
+        camera_id=camera_id,
+        roi=roi,
+        model_registry=registry,
+        evidence_manager=EvidenceManager(evidence_dir or scratch.name),
+    )
+    proc.annotate = False
+    proc.save_evidence = evidence_dir is not None
+    # Every crop reaches the plate/helmet models, so their alerts do not depend on timing
+    proc.block_secondary = True
+    proc.persist_lane_state = False
+    proc.set_signal_state(signal)
+
+    alert_counts: Counter = Counter()
+
+    def on_alert(alert: Dict):
+        frame_no = first_frame + proc.frame_idx
+        if frame_no <= start_frame:
+            return
+        alert_counts[alert["type"]] += 1
+        _write(out, {"event": "alert", "frame": frame_no, "video_ts": alert["media_ts"], **alert})
+
+    proc.alert_callbacks.append(on_alert)
+    proc.open_pipeline()
+
+    decode_time = 0.0
+    process_time = 0.0
+    started = time.perf_counter()
+    frame = None
+    try:
+        while max_frames is None or first_frame + proc.frame_idx < max_frames:
+            t0 = time.perf_counter()
+            ok, image = cap.read()
+            t1 = time.perf_counter()
+            if not ok:
+                break
+            frame = image
+            stats = proc.process_frame(frame, media_timestamp(cap, first_frame + proc.frame_idx + 1, fps))
+            decode_time += t1 - t0
+            process_time += time.perf_counter() - t1
+
+            frame_no = first_frame + stats["frame"]
+            if track_log is not None and (
+                frame_no <= start_frame or (max_frames is not None and frame_no > max_frames - track_log_frames)
+            ):
+                tracked = proc.tracked
+                if tracked.tracker_id is not None:
+                    track_log[frame_no] = [
+                        (int(tid), tuple(float(v) for v in box)) for tid, box in zip(tracked.tracker_id, tracked.xyxy)
+                    ]
+            if frame_stats and frame_no > start_frame:
+                _write(out, {**stats, "event": "frame", "frame": frame_no, "video_ts": round(proc.media_ts, 3)})
+        if frame is not None:
+            # Results still queued at the end belong to the last frame
+            proc.drain_secondary(frame)
+    finally:
+        proc.close_pipeline()
+        cap.release()
+        if model_registry is None:
+            registry.shutdown()
+        if scratch is not None:
+            scratch.cleanup()
+
+    wall = time.perf_counter() - started
+    frames = max(0, first_frame + proc.frame_idx - start_frame)
+    processed = max(1, proc.frame_idx)
+    summary = {
+        "event": "summary",
+        "video": video,
+        "camera_id": camera_id,
+        "frames": frames,
+        "video_seconds": round(frames / fps, 2),
+        "wall_seconds": round(wall, 2),
+        "fps": round(frames / wall, 1) if wall > 0 else 0.0,
+        "realtime_factor": round(frames / fps / wall, 2) if wall > 0 else 0.0,
+        "decode_ms_per_frame": round(1000 * decode_time / processed, 2),
+        "process_ms_per_frame": round(1000 * process_time / processed, 2),
+        "alerts": dict(alert_counts),
+    }
+    _write(out, summary)
+    return summary
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def stitch_tracks(prev_log: TrackLog, next_log: TrackLog, iou_threshold: float = 0.5, min_frames: int = 3) -> Dict[int, int]:
+    """Match track ids of the next segment to the previous one over their shared frames.
+
+    Each shared frame votes for box pairs with IoU >= iou_threshold (one-to-one, best first);
+    pairs with at least min_frames votes are matched, most votes first.
+    Returns {next local id: previous local id}.
+    """
+    votes: Counter = Counter()
+    for frame_no in prev_log.keys() & next_log.keys():
+        prev, nxt = prev_log[frame_no], next_log[frame_no]
+        if not prev or not nxt:
+            continue
+        iou = _box_iou(np.array([b for _, b in prev]), np.array([b for _, b in nxt]))
+        for _ in range(min(len(prev), len(nxt))):
+            i, j = np.unravel_index(iou.argmax(), iou.shape)
+            if iou[i, j] < iou_threshold:
+                break
+            votes[(prev[i][0], nxt[j][0])] += 1
+            iou[i, :] = 0
+            iou[:, j] = 0
+
+    matches: Dict[int, int] = {}
+    used_prev = set()
+    for (prev_id, next_id), count in votes.most_common():
+        if count < min_frames:
+            break
+        if prev_id in used_prev or next_id in matches:
+            continue
+        matches[next_id] = prev_id
+        used_prev.add(prev_id)
+    return matches
+
+
+class SegmentMerger:
+    """Maps segment-local track ids to global ones and drops alerts repeated across a boundary.
+
+    matches[i] is stitch_tracks() of segment i against segment i - 1 (matches[0] is empty);
+    stitched tracks inherit the global id of their match. An alert is a duplicate when the same
+    track raised the same type in an earlier segment at most dedupe_frames before.
+    """
+
+    def __init__(self, matches: List[Dict[int, int]], dedupe_frames: float):
+        self.matches = matches
+        self.dedupe_frames = dedupe_frames
+        self.duplicates = 0
+        self._global_ids: Dict[Tuple[int, int], int] = {}
+        self._counter = itertools.count(1)
+        # (alert type, global id) -> (frame, segment) of its last kept alert
+        self._last_alert: Dict[Tuple[str, int], Tuple[int, int]] = {}
+
+    def global_id(self, segment: int, local: int) -> int:
+        key = (segment, local)
+        if key not in self._global_ids:
+            prev = self.matches[segment].get(local)
+            self._global_ids[key] = self.global_id(segment - 1, prev) if prev is not None else next(self._counter)
+        return self._global_ids[key]
+
+    def keep(self, segment: int, record: Dict) -> bool:
+        """Rewrite an alert's track id to the global one; False if the record is a duplicate."""
+        local_id = record.get("track_id", -1)
+        if record["event"] != "alert" or local_id < 0:
+            return True
+        record["track_id"] = self.global_id(segment, local_id)
+        key = (record["type"], record["track_id"])
+        prev = self._last_alert.get(key)
+        if prev and prev[1] != segment and record["frame"] - prev[0] <= self.dedupe_frames:
+            self.duplicates += 1
+            return False
+        self._last_alert[key] = (record["frame"], segment)
+        return True
+
+
+def _process_segment(job: Dict) -> Tuple[Optional[Dict], TrackLog]:
+    """Worker entry point: process one segment into its own JSONL file."""
+    logging.basicConfig(level=job["log_level"], stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    track_log: TrackLog = {}
+    with open(job["path"], "w") as out:
+        summary = process_file(
+            job["video"],
+            out,
+            camera_id=job["camera_id"],
+            roi_path=job["roi_path"],
+            evidence_dir=job["evidence_dir"],
+            signal=job["signal"],
+            max_frames=job["end_frame"],
+            frame_stats=job["frame_stats"],
+            model_registry=ModelRegistry(detector_threads=job["threads"]),
+            start_frame=job["start_frame"],
+            warmup_frames=job["warmup_frames"],
+            track_log_frames=job["overlap_frames"],
+            track_log=track_log,
+        )
+    return summary, track_log
+
+
+def _move_evidence(src_dir: Path, dst_dir: Path, evidence_id: str, kind: str,
+                   local_id: int, track_id: int, segment: int) -> str:
+    """Move one segment's evidence files to dst_dir under the global track id; returns the new evidence id."""
+    stamp = evidence_id[len(f"{kind}_{local_id}_"):]
+    new_id = f"{kind}_{track_id}_{stamp}"
+    for folder in ("crops", "fullframes"):
+        src = src_dir / folder / f"{evidence_id}.jpg"
+        if src.exists():
+            shutil.move(str(src), str(dst_dir / folder / f"{new_id}.jpg"))
+
+    meta_path = src_dir / "metadata" / f"{evidence_id}.json"
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        meta.update({
+            "track_id": track_id,
+            "segment": segment,
+            "segment_track_id": local_id,
+            "crop_path": f"crops/{new_id}.jpg",
+            "frame_path": f"fullframes/{new_id}.jpg",
+        })
+        (dst_dir / "metadata" / f"{new_id}.json").write_text(json.dumps(meta, indent=2))
+    return new_id
+
+
+def _init_segment_worker(threads: int):
+    from app.services.worker import limit_process_threads
+    limit_process_threads(threads)
+
+
+def process_file_parallel(
+    video: str,
+    out: IO[str],
+    workers: int,
+    overlap_seconds: float = 5.0,
+    dedupe_seconds: float = 5.0,
+    camera_id: str = "default",
+    roi_path: Optional[Path] = None,
+    evidence_dir: Optional[str] = None,
+    signal: str = "green",
+    max_frames: Optional[int] = None,
+    frame_stats: bool = True,
+    threads_per_worker: int = 1,
+    log_level: str = "WARNING",
+) -> Optional[Dict]:
+    """Split the video into one segment per worker, process them in parallel and merge the timeline."""
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        logger.error(f"Failed to open video: {video}")
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if max_frames is not None:
+        total = min(total, max_frames) if total > 0 else max_frames
+    if total <= 0:
+        logger.warning("Frame count unknown; processing serially")
+        return process_file(video, out, camera_id, roi_path, evidence_dir, signal, max_frames, frame_stats)
+
+    overlap = int(round(overlap_seconds * fps))
+    bounds = np.linspace(0, total, num=max(1, workers) + 1, dtype=int)
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = []
+        for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            last = i == len(bounds) - 2
+            jobs.append({
+                "path": str(Path(tmp) / f"segment_{i}.jsonl"),
+                "video": video,
+                "camera_id": camera_id,
+                "roi_path": roi_path,
+                # Staged per segment, moved under the global track ids when merging
+                "evidence_dir": str(Path(tmp) / f"evidence_{i}") if evidence_dir else None,
+                "signal": signal,
+                "frame_stats": frame_stats,
+                "threads": threads_per_worker,
+                "log_level": log_level,
+                "start_frame": int(start),
+                # The last segment runs to the real end of the file (frame counts can be off)
+                "end_frame": max_frames if last else int(end),
+                "warmup_frames": min(overlap, int(start)),
+                "overlap_frames": overlap,
+            })
+
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(jobs), mp_context=ctx,
+                                 initializer=_init_segment_worker, initargs=(threads_per_worker,)) as pool:
+            results = list(pool.map(_process_segment, jobs))
+        if any(summary is None for summary, _ in results):
+            logger.error("A segment failed to open the video")
+            return None
+
+        matches = [{}] + [stitch_tracks(results[i - 1][1], results[i][1]) for i in range(1, len(results))]
+        merger = SegmentMerger(matches, dedupe_seconds * fps)
+        if evidence_dir:
+            EvidenceManager(evidence_dir)
+
+        alert_counts: Counter = Counter()
+        frames = 0
+        for segment, job in enumerate(jobs):
+            with open(job["path"]) as segment_out:
+                for line in segment_out:
+                    record = json.loads(line)
+                    if record["event"] == "summary":
+                        frames += record["frames"]
+                        continue
+                    local_id = record.get("track_id", -1)
+                    if not merger.keep(segment, record):
+                        continue
+                    if record["event"] == "alert":
+                        alert_counts[record["type"]] += 1
+                        if record.get("evidence_id"):
+                            record["evidence_id"] = _move_evidence(
+                                Path(job["evidence_dir"]), Path(evidence_dir), record["evidence_id"],
+                                record["type"], local_id, record["track_id"], segment,
+                            )
+                    out.write(json.dumps(record) + "\n")
+
+    wall = time.perf_counter() - started
+    summary = {
+        "event": "summary",
+        "video": video,
+        "camera_id": camera_id,
+        "frames": frames,
+        "video_seconds": round(frames / fps, 2),
+        "wall_seconds": round(wall, 2),
+        "fps": round(frames / wall, 1) if wall > 0 else 0.0,
+        "realtime_factor": round(frames / fps / wall, 2) if wall > 0 else 0.0,
+        "decode_ms_per_frame": round(float(np.mean([s["decode_ms_per_frame"] for s, _ in results])), 2),
+        "process_ms_per_frame": round(float(np.mean([s["process_ms_per_frame"] for s, _ in results])), 2),
+        "alerts": dict(alert_counts),
+        "workers": len(jobs),
+        "overlap_frames": overlap,
+        "stitched_tracks": sum(len(m) for m in matches),
+        "duplicate_alerts_dropped": merger.duplicates,
+    }
+    _write(out, summary)
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="video file to process")
+    parser.add_argument("--camera-id", default="default", help="camera whose ROI config to use")
+    parser.add_argument("--roi", type=Path, default=None, help="explicit ROI config file (overrides --camera-id)")
+    parser.add_argument("--out", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--evidence", default=None, help="save violation evidence under this directory")
+    parser.add_argument("--signal", choices=["red", "green"], default="green", help="traffic signal state for the run")
+    parser.add_argument("--max-frames", type=int, default=None, help="stop after this many frames")
+    parser.add_argument("--alerts-only", action="store_true", help="do not write per-frame records")
+    parser.add_argument("--workers", type=int, default=1, help="process time segments in this many worker processes")
+    parser.add_argument("--overlap", type=float, default=5.0, help="seconds replayed before each segment (with --workers)")
+    parser.add_argument("--threads", type=int, default=1, help="CPU threads per worker process (with --workers)")
+    parser.add_argument("--log-level", default="WARNING", help="logging level (logs go to stderr)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    try:
+        if args.workers > 1:
+            summary = process_file_parallel(
+                args.video,
+                out,
+                args.workers,
+                overlap_seconds=args.overlap,
+                camera_id=args.camera_id,
+                roi_path=args.roi,
+                evidence_dir=args.evidence,
+                signal=args.signal,
+                max_frames=args.max_frames,
+                frame_stats=not args.alerts_only,
+                threads_per_worker=args.threads,
+                log_level=args.log_level.upper(),
+            )
+        else:
+            summary = process_file(
+                args.video,
+                out,
+                camera_id=args.camera_id,
+                roi_path=args.roi,
+                evidence_dir=args.evidence,
+                signal=args.signal,
+                max_frames=args.max_frames,
+                frame_stats=not args.alerts_only,
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if summary is None:
+        return 1
+    print(
+        f"{summary['frames']} frames in {summary['wall_seconds']}s "
+        f"({summary['fps']} fps, {summary['realtime_factor']}x real time); "
+        f"decode {summary['decode_ms_per_frame']} ms/frame, pipeline {summary['process_ms_per_frame']} ms/frame; "
+        f"alerts {summary['alerts']}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""INT8 post-training quantization of the YOLO models, with an FP32 vs INT8 report.
+
+Calibrates on frames sampled from recorded footage of the cameras that will run the model:
+
+    python -m app.tools.quantize --model yolov8n.pt --video footage/cam1.mp4 --video footage/cam2.mp4
+    python -m app.tools.quantize --model models/helmet.pt --video footage/cam1.mp4
+
+Writes <name>.onnx (FP32), <name>_int8.onnx and <name>_int8_report.json next to the model
+(or into --out). Point the ROI config at the INT8 file to use it:
+detector_backend="onnx" + detector_model_path for the vehicle detector, or
+helmet_model_path / plate_model_path for the optional models.
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from app.services.detectors import OnnxRuntimeDetector
+from app.utils.letterbox import Letterbox
+
+logger = logging.getLogger(__name__)
+
+
+def sample_frames(videos: Sequence[str], count: int, size: int) -> List[np.ndarray]:
+    """Evenly spaced frames across all videos, letterboxed to size x size."""
+    lengths = []
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video}")
+        lengths.append(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        cap.release()
+
+    total = sum(lengths)
+    if total <= 0:
+        raise ValueError("Videos contain no frames")
+    wanted = set(np.linspace(0, total - 1, num=min(count, total), dtype=int).tolist())
+
+    letterbox = Letterbox(size)
+    frames: List[np.ndarray] = []
+    offset = 0
+    for video, length in zip(videos, lengths):
+        cap = cv2.VideoCapture(video)
+        for idx in sorted(i - offset for i in wanted if offset <= i < offset + length):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ok, frame = cap.read()
+            if ok:
+                frames.append(letterbox.apply(frame).copy())
+        cap.release()
+        offset += length
+    return frames
+
+
+def export_onnx(model_path: str, imgsz: int, out_dir: Path) -> Path:
+    """Export an ultralytics model to a static batch-1 FP32 ONNX graph (with class-name metadata)."""
+    if model_path.endswith(".onnx"):
+        return Path(model_path)
+    from ultralytics import YOLO
+
+    exported = Path(YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True))
+    target = out_dir / exported.name
+    if exported.resolve() != target.resolve():
+        target.write_bytes(exported.read_bytes())
+    return target
+
+
+def _head_nodes(model) -> List[str]:
+    """Nodes of the final detection block (/model.N/...), kept in FP32 for box accuracy."""
+    blocks = {}
+    for node in model.graph.node:
+        parts = node.name.split("/")
+        if len(parts) > 2 and parts[1].startswith("model.") and parts[1][6:].isdigit():
+            blocks.setdefault(int(parts[1][6:]), []).append(node.name)
+    return blocks[max(blocks)] if blocks else []
+
+
+def quantize_onnx(fp32_path: Path, int8_path: Path, frames: List[np.ndarray], keep_head_fp32: bool = True) -> Path:
+    """Static INT8 quantization (QDQ, per-channel weights) calibrated on the given frames."""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    model = onnx.load(str(fp32_path))
+    input_name = model.graph.input[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            blob = frame[..., ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            return {input_name: np.ascontiguousarray(blob)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "prep.onnx"
+        try:
+            quant_pre_process(str(fp32_path), str(source))
+        except Exception as e:
+            logger.warning(f"Pre-processing failed ({e}); quantizing the raw graph")
+            source = fp32_path
+
+        quantize_static(
+            str(source),
+            str(int8_path),
+            FrameReader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=_head_nodes(model) if keep_head_fp32 else [],
+        )
+
+    # Keep the ultralytics metadata (class names, stride, imgsz) so both loaders accept the file
+    quantized = onnx.load(str(int8_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, str(int8_path))
+    return int8_path
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def compare_detectors(fp32_path: Path, int8_path: Path, frames: List[np.ndarray],
+                      conf_threshold: float = 0.25, iou_match: float = 0.5) -> Dict:
+    """Detections/frame and ms/frame for both models, plus how many FP32 boxes INT8 reproduces."""
+    from app.services.processor_v2 import ALLOWED_CLASS_NAMES
+
+    detectors = {}
+    for label, path in (("fp32", fp32_path), ("int8", int8_path)):
+        detector = OnnxRuntimeDetector(str(path), ALLOWED_CLASS_NAMES, conf_threshold=conf_threshold)
+        if detector.allowed_ids.size == 0:
+            # Helmet / plate models: compare every class they have
+            detector.allowed_names = set(detector.names.values())
+            detector._set_names(detector.names)
+        detectors[label] = detector
+
+    report: Dict = {}
+    outputs: Dict[str, list] = {}
+    for label, detector in detectors.items():
+        detector.warmup(detector.input_size)
+        start = time.perf_counter()
+        outputs[label] = [detector.detect_batch([frame])[0] for frame in frames]
+        elapsed = time.perf_counter() - start
+        report[label] = {
+            "model": str(detector.path),
+            "ms_per_frame": round(1000 * elapsed / max(1, len(frames)), 2),
+            "detections_per_frame": round(sum(len(o[0]) for o in outputs[label]) / max(1, len(frames)), 3),
+        }
+
+    matched = fp32_total = int8_total = 0
+    for (b32, _, c32), (b8, _, c8) in zip(outputs["fp32"], outputs["int8"]):
+        fp32_total += len(b32)
+        int8_total += len(b8)
+        if len(b32) and len(b8):
+            iou = _iou(b32, b8) * (c32[:, None] == c8[None, :])
+            # Greedy one-to-one matching
+            for _ in range(min(len(b32), len(b8))):
+                i, j = np.unravel_index(iou.argmax(), iou.shape)
+                if iou[i, j] < iou_match:
+                    break
+                matched += 1
+                iou[i, :] = 0
+                iou[:, j] = 0
+
+    report["agreement"] = {
+        "iou_threshold": iou_match,
+        "recall_vs_fp32": round(matched / fp32_total, 3) if fp32_total else None,
+        "precision_vs_fp32": round(matched / int8_total, 3) if int8_total else None,
+    }
+    report["speedup"] = round(report["fp32"]["ms_per_frame"] / max(report["int8"]["ms_per_frame"], 1e-6), 2)
+    return report
+
+
+def count_violations(model_path: Path, video: str, camera_id: str) -> Dict[str, int]:
+    """Replay a video frame by frame through the full rule pipeline with the given detector and count alerts.
+
+    Frames go straight through process_frame on the media clock, so the counts do not depend on
+    timing, and the camera's learned lane state is neither loaded nor overwritten.
+    """
+    from app.services.capture import media_timestamp
+    from app.services.evidence import EvidenceManager
+    from app.services.models import ModelRegistry
+    from app.services.processor_v2 import VideoProcessorV2
+    from app.utils.roi import camera_config_path, load_roi_config
+
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot process video: {video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    roi = replace(
+        load_roi_config(camera_config_path(camera_id)),
+        detector_backend="onnx",
+        detector_model_path=str(model_path),
+    )
+    registry = ModelRegistry()
+    with tempfile.TemporaryDirectory() as evidence_dir:
+        proc = VideoProcessorV2(
+            camera_id=camera_id,
+            roi=roi,
+            model_registry=registry,
+            evidence_manager=EvidenceManager(evidence_dir),
+        )
+        proc.annotate = False
+        proc.save_evidence = False
+        proc.persist_lane_state = False
+        proc.open_pipeline()
+        try:
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                proc.process_frame(frame, media_timestamp(cap, proc.frame_idx + 1, fps))
+        finally:
+            proc.close_pipeline()
+            cap.release()
+            registry.shutdown()
+        return dict(proc.metrics.get_metrics()["violations"])
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="ultralytics .pt (or FP32 .onnx) model to quantize")
+    parser.add_argument("--video", action="append", required=True, help="recorded footage to sample (repeatable)")
+    parser.add_argument("--frames", type=int, default=200, help="calibration frames (same number held out for the report)")
+    parser.add_argument("--imgsz", type=int, default=640, help="model input size")
+    parser.add_argument("--out", type=Path, default=None, help="output directory (default: next to the model)")
+    parser.add_argument("--quantize-head", action="store_true", help="also quantize the detection head")
+    parser.add_argument("--conf", type=float, default=0.25, help="confidence threshold for the report")
+    parser.add_argument("--rules-video", default=None,
+                        help="also replay this video through the rules with both models and count violations")
+    parser.add_argument("--camera-id", default="default", help="ROI config used with --rules-video")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    out_dir = args.out or Path(args.model).parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Alternate sampled frames between calibration and evaluation so the report uses unseen frames
+    frames = sample_frames(args.video, args.frames * 2, args.imgsz)
+    calibration, evaluation = frames[0::2], frames[1::2]
+    logger.info(f"Sampled {len(calibration)} calibration and {len(evaluation)} evaluation frames")
+
+    fp32_path = export_onnx(args.model, args.imgsz, out_dir)
+    int8_path = out_dir / f"{fp32_path.stem}_int8.onnx"
+    logger.info(f"Quantizing {fp32_path} -> {int8_path}")
+    quantize_onnx(fp32_path, int8_path, calibration, keep_head_fp32=not args.quantize_head)
+
+    report = {
+        "source_model": args.model,
+        "videos": args.video,
+        "imgsz": args.imgsz,
+        "calibration_frames": len(calibration),
+        "evaluation_frames": len(evaluation),
+    }
+    report.update(compare_detectors(fp32_path, int8_path, evaluation, conf_threshold=args.conf))
+    if args.rules_video:
+        report["violations"] = {
+            "video": args.rules_video,
+            "fp32": count_violations(fp32_path, args.rules_video, args.camera_id),
+            "int8": count_violations(int8_path, args.rules_video, args.camera_id),
+        }
+
+    report_path = out_dir / f"{fp32_path.stem}_int8_report.json"
+    report_path.write_text(json.dumps(report, indent=2))
+
+    print(f"{'':12}{'FP32':>12}{'INT8':>12}")
+    print(f"{'ms/frame':12}{report['fp32']['ms_per_frame']:>12}{report['int8']['ms_per_frame']:>12}")
+    print(f"{'dets/frame':12}{report['fp32']['detections_per_frame']:>12}{report['int8']['detections_per_frame']:>12}")
+    if "violations" in report:
+        for kind in sorted(set(report["violations"]["fp32"]) | set(report["violations"]["int8"])):
+            print(f"{kind[:12]:12}{report['violations']['fp32'].get(kind, 0):>12}{report['violations']['int8'].get(kind, 0):>12}")
+    print(f"INT8 reproduces {report['agreement']['recall_vs_fp32']} of FP32 boxes, speedup x{report['speedup']}")
+    print(f"Report: {report_path}")
+    print(f"Vehicle detector: \"detector_backend\": \"onnx\", \"detector_model_path\": \"{int8_path}\"")
+    print(f"Helmet / plate model: \"helmet_model_path\" / \"plate_model_path\": \"{int8_path}\"")
+
+
+if __name__ == "__main__":
+    main()
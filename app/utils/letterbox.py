@@ -0,0 +1,52 @@
+from __future__ import annotations
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def stride_aligned(size: int, stride: int = 32) -> int:
+    """Round a detector input size up to a multiple of the model stride."""
+    return max(stride, int(np.ceil(size / stride)) * stride)
+
+
+class Letterbox:
+    """Resizes frames into a preallocated square buffer and maps boxes back to frame coordinates."""
+
+    def __init__(self, size: int, pad_value: int = 114):
+        self.size = stride_aligned(size)
+        self.pad_value = pad_value
+        self.buffer = np.full((self.size, self.size, 3), pad_value, dtype=np.uint8)
+        self.scale = 1.0
+        self.pad_x = 0
+        self.pad_y = 0
+        self._src_shape: Optional[Tuple[int, int]] = None
+        self._view: Optional[np.ndarray] = None
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        """Letterbox image into the shared buffer (valid until the next call)."""
+        h, w = image.shape[:2]
+        if (h, w) != self._src_shape:
+            self.scale = min(self.size / h, self.size / w)
+            new_w, new_h = max(1, round(w * self.scale)), max(1, round(h * self.scale))
+            self.pad_x = (self.size - new_w) // 2
+            self.pad_y = (self.size - new_h) // 2
+            self.buffer[:] = self.pad_value
+            self._view = self.buffer[self.pad_y:self.pad_y + new_h, self.pad_x:self.pad_x + new_w]
+            self._src_shape = (h, w)
+
+        cv2.resize(image, (self._view.shape[1], self._view.shape[0]), dst=self._view,
+                   interpolation=cv2.INTER_LINEAR)
+        return self.buffer
+
+    def to_source(self, boxes: np.ndarray) -> np.ndarray:
+        """Map xyxy boxes from buffer coordinates back to the last source frame (in place)."""
+        if boxes.size == 0 or self._src_shape is None:
+            return boxes
+        h, w = self._src_shape
+        boxes[:, [0, 2]] -= self.pad_x
+        boxes[:, [1, 3]] -= self.pad_y
+        boxes /= self.scale
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h)
+        return boxes
@@ -2,11 +2,16 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 CONFIG_PATH = Path(__file__).resolve().parents[1] / "config" / "roi_config.json"
 EXAMPLE_PATH = Path(__file__).resolve().parents[1] / "config" / "roi_config.example.json"
+CAMERAS_DIR = Path(__file__).resolve().parents[1] / "config" / "cameras"
+LANE_STATE_DIR = Path(__file__).resolve().parents[1] / "config" / "lane_state"
 
 
 @dataclass
@@ -28,10 +33,52 @@ class ROIConfig:
     # Optional model paths
     helmet_model_path: Optional[str] = None
     plate_model_path: Optional[str] = None
+    # Capture buffering: "latest", "drop_oldest" or "block" (None = pick from source type)
+    capture_policy: Optional[str] = None
+    capture_buffer_size: int = 4
+    stale_frame_seconds: float = 0.5
+    # Detector input size in pixels (letterboxed square); None = pass full frames
+    inference_size: Optional[int] = None
+    # Adaptive quality: hold capture-to-output latency under this target (None = disabled)
+    latency_target_ms: Optional[float] = None
+    quality_min_inference_size: int = 320
+    quality_max_stride: int = 3
+    # Skip the detector while nothing moves inside the lanes
+    motion_gate: bool = False
+    motion_threshold: float = 0.002
+    motion_hold_frames: int = 15
+    # Run the detector only on a padded box around the configured geometry
+    roi_crop: bool = False
+    roi_crop_padding: float = 0.05
+    # Vehicle detector: "pytorch", "onnx" or "openvino" (None path = backend default)
+    detector_backend: str = "pytorch"
+    detector_model_path: Optional[str] = None
+    detector_conf: float = 0.25
+    # Per-track state is dropped this long after a track was last seen, and capped in size
+    track_state_ttl_seconds: float = 30.0
+    track_state_capacity: int = 1024
+    # Plate/OCR and helmet models run on background workers; work beyond the queue is shed
+    secondary_workers: int = 1
+    secondary_queue_size: int = 16
+    secondary_max_batch: int = 8
+    # At most this many plate / helmet model runs per track, on its largest and sharpest crops
+    attribute_budget: int = 3
+    attribute_resolve_confidence: float = 0.8
+
+
+def camera_config_path(camera_id: str) -> Path:
+    """Per-camera ROI config, falling back to the shared roi_config.json."""
+    path = CAMERAS_DIR / f"{camera_id}.json"
+    return path if path.exists() else CONFIG_PATH
+
+
+def lane_state_path(camera_id: str) -> Path:
+    """Learned lane directions of a camera (auto_lane_direction), kept across restarts."""
+    return LANE_STATE_DIR / f"{camera_id}.json"
 
 
-def load_roi_config() -> ROIConfig:
-    path = CONFIG_PATH
+def load_roi_config(path: Optional[Path] = None) -> ROIConfig:
+    path = path or CONFIG_PATH
     if not path.exists():
         # Write example if nothing exists
         EXAMPLE_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -89,6 +136,29 @@ def load_roi_config() -> ROIConfig:
     helmet_model_path = data.get("helmet_model_path")
     plate_model_path = data.get("plate_model_path")
 
+    capture_policy = data.get("capture_policy")
+    capture_buffer_size = int(data.get("capture_buffer_size", 4))
+    stale_frame_seconds = float(data.get("stale_frame_seconds", 0.5))
+    inference_size = int(data.get("inference_size")) if data.get("inference_size") else None
+    latency_target_ms = float(data.get("latency_target_ms")) if data.get("latency_target_ms") else None
+    quality_min_inference_size = int(data.get("quality_min_inference_size", 320))
+    quality_max_stride = int(data.get("quality_max_stride", 3))
+    motion_gate = bool(data.get("motion_gate", False))
+    motion_threshold = float(data.get("motion_threshold", 0.002))
+    motion_hold_frames = int(data.get("motion_hold_frames", 15))
+    roi_crop = bool(data.get("roi_crop", False))
+    roi_crop_padding = float(data.get("roi_crop_padding", 0.05))
+    detector_backend = str(data.get("detector_backend", "pytorch")).lower()
+    detector_model_path = data.get("detector_model_path")
+    detector_conf = float(data.get("detector_conf", 0.25))
+    track_state_ttl_seconds = float(data.get("track_state_ttl_seconds", 30.0))
+    track_state_capacity = int(data.get("track_state_capacity", 1024))
+    secondary_workers = int(data.get("secondary_workers", 1))
+    secondary_queue_size = int(data.get("secondary_queue_size", 16))
+    secondary_max_batch = int(data.get("secondary_max_batch", 8))
+    attribute_budget = int(data.get("attribute_budget", 3))
+    attribute_resolve_confidence = float(data.get("attribute_resolve_confidence", 0.8))
+
     return ROIConfig(
         lanes=lanes,
         stop_line=stop_line,
@@ -101,6 +171,28 @@ def load_roi_config() -> ROIConfig:
         speed_limit_kmh=speed_limit_kmh,
         helmet_model_path=helmet_model_path,
         plate_model_path=plate_model_path,
+        capture_policy=capture_policy,
+        capture_buffer_size=capture_buffer_size,
+        stale_frame_seconds=stale_frame_seconds,
+        inference_size=inference_size,
+        latency_target_ms=latency_target_ms,
+        quality_min_inference_size=quality_min_inference_size,
+        quality_max_stride=quality_max_stride,
+        motion_gate=motion_gate,
+        motion_threshold=motion_threshold,
+        motion_hold_frames=motion_hold_frames,
+        roi_crop=roi_crop,
+        roi_crop_padding=roi_crop_padding,
+        detector_backend=detector_backend,
+        detector_model_path=detector_model_path,
+        detector_conf=detector_conf,
+        track_state_ttl_seconds=track_state_ttl_seconds,
+        track_state_capacity=track_state_capacity,
+        secondary_workers=secondary_workers,
+        secondary_queue_size=secondary_queue_size,
+        secondary_max_batch=secondary_max_batch,
+        attribute_budget=attribute_budget,
+        attribute_resolve_confidence=attribute_resolve_confidence,
     )
 
 
@@ -114,3 +206,66 @@ def denormalize_points(points, width: int, height: int):
     # polygon
     poly = [(int(x * width), int(y * height)) for (x, y) in points]
     return poly
+
+
+def detection_region(roi: ROIConfig, width: int, height: int) -> Optional[Tuple[int, int, int, int]]:
+    """Padded pixel box (x1, y1, x2, y2) around all configured geometry, None if it is the whole frame."""
+    points: List[Tuple[float, float]] = [pt for poly in roi.lanes for pt in poly]
+    for segment in (roi.stop_line, roi.speed_calib_points):
+        if segment:
+            points.extend(segment)
+    for segment in roi.lane_directions:
+        points.extend(segment)
+    if not points:
+        return None
+
+    pad = roi.roi_crop_padding
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    x1 = int(max(0.0, min(xs) - pad) * width)
+    y1 = int(max(0.0, min(ys) - pad) * height)
+    x2 = int(min(1.0, max(xs) + pad) * width)
+    y2 = int(min(1.0, max(ys) + pad) * height)
+    if x2 - x1 < 32 or y2 - y1 < 32:
+        return None
+    # Not worth cropping when the region is (nearly) the full frame
+    if (x2 - x1) * (y2 - y1) >= 0.95 * width * height:
+        return None
+    return x1, y1, x2, y2
+
+
+def rasterize_lanes(lanes: List[List[Tuple[float, float]]], width: int, height: int) -> Optional[np.ndarray]:
+    """Label image for the lane polygons: 0 outside all lanes, i + 1 inside lane i.
+
+    Where lanes overlap the lowest index wins, matching a first-match polygon test.
+    Returns None when no lanes are configured.
+    """
+    if not lanes:
+        return None
+    if len(lanes) > 254:
+        raise ValueError("At most 254 lanes are supported")
+    # Imported here so loading ROI configs stays cheap for the API process
+    import cv2
+    import numpy as np
+
+    raster = np.zeros((height, width), dtype=np.uint8)
+    # Paint in reverse so lower indices overwrite higher ones
+    for idx in range(len(lanes) - 1, -1, -1):
+        poly = np.array(denormalize_points(lanes[idx], width, height), dtype=np.int32)
+        cv2.fillPoly(raster, [poly], idx + 1)
+    return raster
+
+
+def lookup_lanes(raster: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Lane index (-1 for none) of each (x, y) pixel point, in one vectorized lookup."""
+    import numpy as np
+
+    if points.size == 0:
+        return np.zeros((0,), dtype=np.int16)
+    h, w = raster.shape
+    xs = points[:, 0].astype(np.intp)
+    ys = points[:, 1].astype(np.intp)
+    inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    labels = raster[np.clip(ys, 0, h - 1), np.clip(xs, 0, w - 1)].astype(np.int16) - 1
+    labels[~inside] = -1
+    return labels
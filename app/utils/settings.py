@@ -0,0 +1,29 @@
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+
+
+@dataclass
+class AppSettings:
+    """Process-wide settings (per-camera settings live in ROIConfig)."""
+    # Cross-camera micro-batching of detector calls
+    max_batch_size: int = 8
+    batch_wait_ms: float = 5.0
+    # "thread": all cameras in this process; "process": one worker process per camera
+    worker_mode: str = "thread"
+    worker_threads: int = 1
+    worker_max_frame_width: int = 1920
+    worker_max_frame_height: int = 1080
+
+
+def load_settings() -> AppSettings:
+    """Read settings from RT_* environment variables."""
+    env = os.environ
+    return AppSettings(
+        max_batch_size=int(env.get("RT_MAX_BATCH_SIZE", 8)),
+        batch_wait_ms=float(env.get("RT_BATCH_WAIT_MS", 5.0)),
+        worker_mode=env.get("RT_WORKER_MODE", "thread").lower(),
+        worker_threads=int(env.get("RT_WORKER_THREADS", 1)),
+        worker_max_frame_width=int(env.get("RT_WORKER_MAX_FRAME_WIDTH", 1920)),
+        worker_max_frame_height=int(env.get("RT_WORKER_MAX_FRAME_HEIGHT", 1080)),
+    )
@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.capture import (
+    POLICY_BLOCK,
+    POLICY_DROP_OLDEST,
+    POLICY_LATEST,
+    CapturedFrame,
+    FrameBuffer,
+)
+
+
+def frame(index):
+    return CapturedFrame(index, float(index), np.zeros((2, 2, 3), dtype=np.uint8), float(index))
+
+
+def drain(buffer):
+    indices = []
+    while len(buffer):
+        indices.append(buffer.get(timeout=0).index)
+    return indices
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        FrameBuffer(policy="newest")
+
+
+def test_latest_keeps_only_newest_frame():
+    drops = []
+    buffer = FrameBuffer(capacity=8, policy=POLICY_LATEST, on_drop=lambda: drops.append(1))
+    assert buffer.capacity == 1
+    for i in range(5):
+        assert buffer.put(frame(i))
+    assert drain(buffer) == [4]
+    assert buffer.dropped == 4
+    assert len(drops) == 4
+
+
+def test_drop_oldest_keeps_newest_capacity_frames():
+    buffer = FrameBuffer(capacity=3, policy=POLICY_DROP_OLDEST)
+    for i in range(5):
+        assert buffer.put(frame(i))
+    assert drain(buffer) == [2, 3, 4]
+    assert buffer.dropped == 2
+
+
+def test_block_waits_for_consumer_without_dropping():
+    buffer = FrameBuffer(capacity=2, policy=POLICY_BLOCK)
+    received = []
+
+    def consume():
+        while True:
+            item = buffer.get(timeout=2.0)
+            if item is None:
+                return
+            received.append(item.index)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    for i in range(20):
+        assert buffer.put(frame(i))
+    buffer.close()
+    consumer.join(timeout=5.0)
+    assert received == list(range(20))
+    assert buffer.dropped == 0
+
+
+def test_block_put_returns_false_when_closed_while_full():
+    buffer = FrameBuffer(capacity=1, policy=POLICY_BLOCK)
+    assert buffer.put(frame(0))
+    result = []
+    producer = threading.Thread(target=lambda: result.append(buffer.put(frame(1))))
+    producer.start()
+    producer.join(timeout=0.3)
+    assert producer.is_alive()
+    buffer.close()
+    producer.join(timeout=2.0)
+    assert result == [False]
+
+
+def test_get_times_out_and_drains_after_close():
+    buffer = FrameBuffer(capacity=2, policy=POLICY_DROP_OLDEST)
+    assert buffer.get(timeout=0.05) is None
+    buffer.put(frame(7))
+    buffer.close()
+    assert not buffer.put(frame(8))
+    assert buffer.get(timeout=0).index == 7
+    assert buffer.get(timeout=0) is None
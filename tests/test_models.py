@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+import app.services.models as models
+from app.services.models import ModelRegistry
+
+
+class FakeDetector:
+    def __init__(self, path):
+        self.path = path
+
+
+def slow_create_detector(calls, started, release):
+    def create(backend, path, allowed_names, conf_threshold, threads):
+        calls.append(path)
+        started.set()
+        release.wait(5.0)
+        return FakeDetector(path)
+    return create
+
+
+def test_detector_loads_once_outside_the_registry_lock(monkeypatch):
+    calls, started, release = [], threading.Event(), threading.Event()
+    monkeypatch.setattr(models, "create_detector", slow_create_detector(calls, started, release))
+    registry = ModelRegistry()
+    results = []
+
+    def load():
+        results.append(registry.detector("pytorch", "a.pt", ["car"]))
+
+    threads = [threading.Thread(target=load) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5.0)
+
+    # Stats do not wait for the load
+    began = time.perf_counter()
+    assert registry.get_inference_stats() == []
+    assert registry.loaded_paths() == []
+    assert time.perf_counter() - began < 0.5
+
+    release.set()
+    for thread in threads:
+        thread.join(5.0)
+    assert calls == ["a.pt"]
+    assert len(results) == 3 and all(r is results[0] for r in results)
+    assert registry.loaded_paths() == ["a.pt"]
+
+
+def test_failed_load_is_retried(monkeypatch):
+    attempts = []
+
+    def create(backend, path, allowed_names, conf_threshold, threads):
+        attempts.append(path)
+        if len(attempts) == 1:
+            raise RuntimeError("load failed")
+        return FakeDetector(path)
+
+    monkeypatch.setattr(models, "create_detector", create)
+    registry = ModelRegistry()
+    with pytest.raises(RuntimeError):
+        registry.detector("pytorch", "a.pt", ["car"])
+    assert registry.detector("pytorch", "a.pt", ["car"]).path == "a.pt"
+    assert attempts == ["a.pt", "a.pt"]
@@ -0,0 +1,69 @@
+from app.tools.process_file import SegmentMerger, stitch_tracks
+
+
+def box(x, y, size=20.0):
+    return (x, y, x + size, y + size)
+
+
+def test_stitch_tracks_matches_by_overlap():
+    prev_log = {f: [(1, box(0.0 + f, 0.0)), (2, box(100.0 + f, 0.0))] for f in range(10, 15)}
+    next_log = {f: [(7, box(101.0 + f, 0.0)), (8, box(1.0 + f, 0.0)), (9, box(300.0, 300.0))]
+                for f in range(10, 15)}
+    assert stitch_tracks(prev_log, next_log) == {7: 2, 8: 1}
+
+
+def test_stitch_tracks_needs_min_frames_of_shared_overlap():
+    prev_log = {f: [(1, box(0.0, 0.0))] for f in range(10, 20)}
+    next_log = {f: [(5, box(0.0, 0.0))] for f in range(18, 30)}
+    assert stitch_tracks(prev_log, next_log, min_frames=3) == {}
+    assert stitch_tracks(prev_log, next_log, min_frames=2) == {5: 1}
+
+
+def test_stitch_tracks_is_one_to_one():
+    # Two next-segment tracks on the same previous box: only the one with more votes is matched
+    prev_log = {f: [(1, box(0.0, 0.0))] for f in range(10, 16)}
+    next_log = {f: [(5 if f < 14 else 6, box(0.0, 0.0))] for f in range(10, 16)}
+    assert stitch_tracks(prev_log, next_log, min_frames=2) == {5: 1}
+
+
+def test_stitch_tracks_ignores_low_iou():
+    prev_log = {f: [(1, box(0.0, 0.0))] for f in range(5)}
+    next_log = {f: [(2, box(15.0, 0.0))] for f in range(5)}
+    assert stitch_tracks(prev_log, next_log) == {}
+
+
+def alert(kind, track_id, frame):
+    return {"event": "alert", "type": kind, "track_id": track_id, "frame": frame}
+
+
+def test_merger_carries_global_ids_across_segments():
+    merger = SegmentMerger([{}, {4: 1}, {9: 4}], dedupe_frames=0)
+    assert merger.global_id(0, 1) == 1
+    assert merger.global_id(0, 2) == 2
+    assert merger.global_id(1, 4) == 1
+    assert merger.global_id(1, 5) == 3
+    assert merger.global_id(2, 9) == 1
+
+
+def test_merger_drops_repeated_alerts_across_a_boundary():
+    merger = SegmentMerger([{}, {4: 1}], dedupe_frames=50)
+    first = alert("red_light_violation", 1, 100)
+    assert merger.keep(0, first)
+    repeat = alert("red_light_violation", 4, 120)
+    assert not merger.keep(1, repeat)
+    assert repeat["track_id"] == 1
+    assert merger.duplicates == 1
+
+    # Same segment, another type or outside the window is kept
+    assert merger.keep(0, alert("red_light_violation", 1, 110))
+    assert merger.keep(1, alert("speeding", 4, 120))
+    assert merger.keep(1, alert("red_light_violation", 4, 200))
+    assert merger.duplicates == 1
+
+
+def test_merger_leaves_other_records_alone():
+    merger = SegmentMerger([{}, {}], dedupe_frames=50)
+    frame = {"event": "frame", "frame": 3, "tracks": 2}
+    untracked = alert("red_light_violation", -1, 3)
+    assert merger.keep(1, frame) and frame == {"event": "frame", "frame": 3, "tracks": 2}
+    assert merger.keep(1, untracked) and untracked["track_id"] == -1
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from app.services.rules import FrameTracks, evaluate_rules, segment_crossings
+from app.services.track_state import TrackStateStore
+
+M_PER_PX = 0.05
+
+
+def frame_tracks(store, slots, centers, now):
+    """FrameTracks for tracks outside all lanes, stepped the way the processor does it."""
+    n = len(slots)
+    prev_centers = store.last_pos[slots].copy()
+    has_prev = store.has_last[slots].copy()
+    step_dist, step_dt = store.step(slots, centers, now, 0.05)
+    return FrameTracks(
+        centers=centers,
+        prev_centers=prev_centers,
+        has_prev=has_prev,
+        lane_ids=np.full(n, -1),
+        vehicle=np.ones(n, dtype=bool),
+        velocities=np.zeros((n, 2)),
+        velocity_valid=np.zeros(n, dtype=bool),
+        step_dist=step_dist,
+        step_dt=step_dt,
+        wrong_way_counts=np.zeros(n, dtype=np.int32),
+    )
+
+
+def run_speeding(fps, kmh, seconds=2.0, limit_kmh=80.0):
+    store = TrackStateStore(capacity=8)
+    px_per_frame = kmh / 3.6 / M_PER_PX / fps
+    alerts, speeds = 0, []
+    for i in range(int(seconds * fps)):
+        now = i / fps
+        slots = store.touch(np.array([1]), now)
+        tracks = frame_tracks(store, slots, np.array([[100.0 + i * px_per_frame, 200.0]]), now)
+        hits = evaluate_rules(tracks, False, None, False, np.zeros((0, 2)), M_PER_PX, limit_kmh)
+        alerts += int(hits.speeding.sum())
+        speeds.extend(hits.speed_kmh[hits.speed_kmh > 0].tolist())
+    return alerts, speeds
+
+
+@pytest.mark.parametrize("fps", [15, 25, 30, 60])
+def test_speeding_fires_at_common_frame_rates(fps):
+    alerts, speeds = run_speeding(fps, 108.0)
+    assert alerts > 0
+    assert speeds == pytest.approx([108.0] * len(speeds), rel=1e-6)
+
+
+def test_no_speeding_under_limit():
+    alerts, speeds = run_speeding(30, 43.0, limit_kmh=80.0)
+    assert alerts == 0
+    assert speeds == pytest.approx([43.0] * len(speeds), rel=1e-6)
+
+
+# Vertical stop line at x=0; with y pointing down, x < 0 is its positive side
+STOP_LINE = ((0.0, 0.0), (0.0, 100.0))
+
+
+def test_segment_crossings_direction():
+    starts = np.array([[-5.0, 50.0], [5.0, 50.0], [-5.0, 50.0], [5.0, 20.0]])
+    ends = np.array([[5.0, 50.0], [-5.0, 50.0], [-1.0, 60.0], [8.0, 80.0]])
+    np.testing.assert_array_equal(segment_crossings(starts, ends, STOP_LINE), [-1, 1, 0, 0])
+
+
+def test_segment_crossings_tolerance_past_segment_ends():
+    starts = np.array([[-5.0, 103.0], [-5.0, 110.0], [-5.0, -4.0]])
+    ends = np.array([[5.0, 103.0], [5.0, 110.0], [5.0, -4.0]])
+    np.testing.assert_array_equal(segment_crossings(starts, ends, STOP_LINE, 5.0), [-1, 0, -1])
+    np.testing.assert_array_equal(segment_crossings(starts, ends, STOP_LINE, 0.0), [0, 0, 0])
+
+
+def test_segment_crossings_counts_touching_the_line_once():
+    # A track stopping on the line and then moving on crosses once, not twice
+    path = np.array([[-5.0, 50.0], [0.0, 50.0], [5.0, 50.0]])
+    crossings = segment_crossings(path[:-1], path[1:], STOP_LINE)
+    np.testing.assert_array_equal(crossings, [0, -1])
+
+
+def test_segment_crossings_empty():
+    empty = np.zeros((0, 2))
+    assert len(segment_crossings(empty, empty, STOP_LINE)) == 0
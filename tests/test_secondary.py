@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+
+from app.services.secondary import SecondaryWorkerPool, size_buckets
+
+
+def slow_handler(release):
+    def handle(crops):
+        release.wait(5.0)
+        return [crop.shape[0] for crop in crops]
+    return handle
+
+
+def crop(size=8):
+    return np.zeros((size, size, 3), dtype=np.uint8)
+
+
+def test_size_buckets_groups_by_longest_side():
+    crops = [crop(100), crop(200), crop(50), crop(1000)]
+    assert size_buckets(crops) == {160: [0, 2], 320: [1], 640: [3]}
+
+
+def test_full_queue_sheds_without_block():
+    release = threading.Event()
+    pool = SecondaryWorkerPool({"plate": slow_handler(release)}, queue_size=1, max_batch=1)
+    pool.start()
+    try:
+        results = [pool.submit("plate", track_id, crop()) for track_id in range(4)]
+        assert not all(results)
+        assert pool.shed >= 1
+        # Only one pending task per (kind, track)
+        assert not pool.submit("plate", 0, crop())
+    finally:
+        release.set()
+        pool.stop()
+
+
+def test_block_keeps_every_crop_and_drain_waits_for_results():
+    release = threading.Event()
+    pool = SecondaryWorkerPool({"plate": slow_handler(release)}, queue_size=1, max_batch=1, block=True)
+    pool.start()
+    try:
+        submitter = threading.Thread(target=lambda: [pool.submit("plate", i, crop(i + 1)) for i in range(4)])
+        submitter.start()
+        submitter.join(0.2)
+        assert submitter.is_alive()
+        assert not pool.drain(timeout=0.05)
+
+        release.set()
+        submitter.join(5.0)
+        assert pool.drain(timeout=5.0)
+        results = pool.poll()
+        assert sorted((r.track_id, r.value) for r in results) == [(0, 1), (1, 2), (2, 3), (3, 4)]
+        assert pool.shed == 0
+    finally:
+        release.set()
+        pool.stop()
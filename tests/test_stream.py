@@ -0,0 +1,40 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.services.stream import BOUNDARY, MJPEGBroadcaster
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+async def read_frames(broadcaster, viewers, frames):
+    executor = CountingExecutor()
+    asyncio.get_running_loop().set_default_executor(executor)
+    streams = [broadcaster.aframes() for _ in range(viewers)]
+    for i in range(frames):
+        broadcaster.publish(np.full((16, 16, 3), i * 10, dtype=np.uint8))
+        parts = await asyncio.gather(*(stream.__anext__() for stream in streams))
+        assert all(part == parts[0] for part in parts)
+    for stream in streams:
+        await stream.aclose()
+    return parts[0], executor.submitted
+
+
+def test_frames_are_encoded_once_for_all_viewers():
+    broadcaster = MJPEGBroadcaster()
+    part, submitted = asyncio.run(read_frames(broadcaster, viewers=8, frames=3))
+    assert part.startswith(BOUNDARY)
+    assert submitted == 3
+    stats = broadcaster.get_stats()
+    assert stats["encoded"] == 3
+    assert stats["delivered"] == 24
+    assert stats["subscribers"] == 0
@@ -0,0 +1,88 @@
+import numpy as np
+
+from app.services.track_state import TrackStateStore
+
+
+def test_touch_allocates_and_lookup_finds_slots():
+    store = TrackStateStore(capacity=4)
+    slots = store.touch(np.array([30, 10, 20]), 0.0)
+    assert len(set(slots.tolist())) == 3
+    assert len(store) == 3
+    np.testing.assert_array_equal(store.touch(np.array([10, 30]), 1.0), slots[[1, 0]])
+    np.testing.assert_array_equal(store.lookup(np.array([20, 99, 30])), [slots[2], -1, slots[0]])
+    assert store.slot(20, 2.0) == slots[2]
+
+
+def test_expired_tracks_are_freed_and_reset():
+    store = TrackStateStore(capacity=4, ttl_seconds=5.0)
+    slots = store.touch(np.array([1, 2]), 0.0)
+    store.step(slots, np.array([[1.0, 1.0], [2.0, 2.0]]), 0.0)
+    store.touch(np.array([2]), 4.0)
+    assert store.evict_expired(6.0) == 1
+    np.testing.assert_array_equal(store.lookup(np.array([1, 2])), [-1, slots[1]])
+
+    # A reused slot starts without the previous track's state
+    slot = store.slot(3, 6.0)
+    assert not store.has_last[slot] and not store.has_ref[slot]
+    assert store.get_stats()["evicted_expired"] == 1
+
+
+def test_full_store_evicts_least_recently_seen():
+    store = TrackStateStore(capacity=3)
+    store.touch(np.array([1]), 0.0)
+    store.touch(np.array([2]), 1.0)
+    store.touch(np.array([3]), 2.0)
+    store.touch(np.array([1]), 3.0)
+    store.touch(np.array([4]), 4.0)
+    assert store.lookup(np.array([2]))[0] == -1
+    assert (store.lookup(np.array([1, 3, 4])) >= 0).all()
+    assert len(store) == 3
+    assert store.evicted_capacity == 1
+
+
+def test_eviction_spares_tracks_of_the_current_frame():
+    store = TrackStateStore(capacity=2)
+    store.touch(np.array([1, 2]), 0.0)
+    store.touch(np.array([1, 3]), 1.0)
+    assert store.lookup(np.array([2]))[0] == -1
+    assert (store.lookup(np.array([1, 3])) >= 0).all()
+
+
+def test_step_keeps_reference_until_min_seconds():
+    store = TrackStateStore(capacity=2)
+    slots = store.touch(np.array([1]), 0.0)
+    dist, dt = store.step(slots, np.array([[0.0, 0.0]]), 0.0, min_seconds=0.1)
+    assert dist[0] == 0.0 and dt[0] == 0.0
+
+    dist, dt = store.step(slots, np.array([[3.0, 4.0]]), 0.05, min_seconds=0.1)
+    assert dist[0] == 5.0 and dt[0] == 0.05
+    np.testing.assert_array_equal(store.last_pos[slots[0]], [3.0, 4.0])
+
+    # Still measured from the first point, then the reference moves
+    dist, dt = store.step(slots, np.array([[6.0, 8.0]]), 0.1, min_seconds=0.1)
+    assert dist[0] == 10.0 and dt[0] == 0.1
+    dist, dt = store.step(slots, np.array([[6.0, 11.0]]), 0.15, min_seconds=0.1)
+    assert dist[0] == 3.0
+
+
+def test_history_velocity_needs_enough_points():
+    store = TrackStateStore(capacity=2, history=4)
+    slots = store.touch(np.array([1]), 0.0)
+    for i in range(3):
+        store.push_history(slots, np.array([[10.0 * i, 0.0]]), 0.1 * i)
+    _, valid = store.history_velocity(slots)
+    assert not valid[0]
+    for i in range(3, 6):
+        store.push_history(slots, np.array([[10.0 * i, 0.0]]), 0.1 * i)
+    velocities, valid = store.history_velocity(slots)
+    assert valid[0]
+    np.testing.assert_allclose(velocities[0], [100.0, 0.0])
+
+
+def test_cooldown_per_kind_and_slot():
+    store = TrackStateStore(capacity=2)
+    slot = store.slot(1, 0.0)
+    assert store.cooldown_ready(slot, "speeding", 0.0, 5.0)
+    assert not store.cooldown_ready(slot, "speeding", 4.0, 5.0)
+    assert store.cooldown_ready(slot, "wrong_way", 4.0, 5.0)
+    assert store.cooldown_ready(slot, "speeding", 5.0, 5.0)
@@ -0,0 +1,69 @@
+import queue
+
+import numpy as np
+import pytest
+
+from app.services.worker import SharedFrameRing, SharedRecordRing, _put_latest
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(slots=3, max_width=64, max_height=48, create=True)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def test_frame_ring_round_trip(ring):
+    assert ring.read(0) is None
+    image = np.random.default_rng(0).integers(0, 256, (40, 60, 3), dtype=np.uint8)
+    ring.write(image)
+    seq, frame = ring.read(0)
+    assert seq == 1
+    np.testing.assert_array_equal(frame, image)
+    assert ring.read(seq) is None
+
+
+def test_frame_ring_reader_attaches_by_name(ring):
+    reader = SharedFrameRing(ring.name, slots=3, max_width=64, max_height=48)
+    try:
+        for value in range(5):
+            ring.write(np.full((10, 20, 3), value, dtype=np.uint8))
+        seq, frame = reader.read(0)
+        assert seq == ring.latest_seq == 5
+        assert frame.shape == (10, 20, 3)
+        assert (frame == 4).all()
+    finally:
+        reader.close()
+
+
+def test_frame_ring_downscales_oversized_frames(ring):
+    ring.write(np.zeros((96, 256, 3), dtype=np.uint8))
+    _, frame = ring.read(0)
+    assert frame.shape == (24, 64, 3)
+
+
+def test_record_ring_reads_since_cursor():
+    ring = SharedRecordRing(slots=4, slot_size=256, create=True)
+    try:
+        for i in range(3):
+            ring.append({"i": i})
+        records, cursor = ring.read_since(0)
+        assert [r["i"] for r in records] == [0, 1, 2]
+        for i in range(3, 9):
+            ring.append({"i": i})
+        # Only the last `slots` records survive a lagging reader
+        records, cursor = ring.read_since(cursor)
+        assert [r["i"] for r in records] == [5, 6, 7, 8]
+        assert ring.read_since(cursor) == ([], cursor)
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_status_queue_keeps_only_the_newest_event():
+    status = queue.Queue(maxsize=1)
+    for i in range(5):
+        _put_latest(status, {"event": "status", "i": i})
+    assert status.get_nowait() == {"event": "status", "i": 4}
+    assert status.empty()